@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+from collections import deque
+
+from PyQt5.QtCore import QObject, QTimer, QPointF, QPropertyAnimation, QParallelAnimationGroup, QEasingCurve
+
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# если партий анимаций в очереди больше FAST_BACKLOG — ускоряем, больше SKIP_BACKLOG — сразу ставим в конец
+FAST_BACKLOG = 1
+SKIP_BACKLOG = 4
+
+
+class AnimationScheduler(QObject):
+    # перемещения, запрошенные за один проход цикла событий, идут одной параллельной группой;
+    # повторное перемещение того же элемента заменяет предыдущее
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._pending: dict = {}
+        self._batches: deque = deque()
+        self._running = None
+        self._flush_scheduled = False
+        self._skipping = False
+
+    @property
+    def backlog(self) -> int:
+        return len(self._batches) + (1 if self._pending else 0)
+
+    def move(self, item, x, y, duration=500, callback=None):
+        entry = self._pending.get(item)
+        if entry:
+            entry["end"] = QPointF(x, y)
+            entry["duration"] = max(entry["duration"], duration)
+        else:
+            entry = {"end": QPointF(x, y), "duration": duration, "callbacks": []}
+            self._pending[item] = entry
+        if callback:
+            entry["callbacks"].append(callback)
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            QTimer.singleShot(0, self._flush)
+
+    def _flush(self):
+        self._flush_scheduled = False
+        if self._pending:
+            self._batches.append(self._pending)
+            self._pending = {}
+        self._run_next()
+
+    def _run_next(self):
+        while self._running is None and self._batches:
+            batch = self._batches.popleft()
+            backlog = len(self._batches)
+            if self._skipping or backlog >= SKIP_BACKLOG:
+                if not self._skipping:
+                    logger.info("Анимации отстают на %s партий — пропускаем.", backlog)
+                self._finish(batch)
+                continue
+
+            speed = 1 + backlog if backlog >= FAST_BACKLOG else 1
+            group = QParallelAnimationGroup(self)
+            for item, entry in batch.items():
+                anim = QPropertyAnimation(item, b"item_pos")
+                anim.setDuration(max(1, int(entry["duration"] / speed)))
+                anim.setStartValue(item.pos())
+                anim.setEndValue(entry["end"])
+                anim.setEasingCurve(QEasingCurve.OutQuad)
+                group.addAnimation(anim)
+            group.finished.connect(lambda b=batch: self._on_group_finished(b))
+            self._running = group
+            group.start(QParallelAnimationGroup.DeleteWhenStopped)
+
+    def _on_group_finished(self, batch):
+        self._running = None
+        self._run_callbacks(batch)
+        self._run_next()
+
+    def _finish(self, batch):
+        for item, entry in batch.items():
+            item.setPos(entry["end"])
+        self._run_callbacks(batch)
+
+    def _run_callbacks(self, batch):
+        for entry in batch.values():
+            for callback in entry["callbacks"]:
+                try:
+                    callback()
+                except Exception as e:
+                    logger.exception("Ошибка в обработчике анимации: %s", e)
+
+    def fast_forward(self):
+        # доводим всё, что запущено и ждёт, до конечного состояния
+        self._skipping = True
+        try:
+            if self._pending:
+                self._batches.append(self._pending)
+                self._pending = {}
+            if self._running is not None:
+                self._running.setCurrentTime(self._running.totalDuration())
+            self._run_next()
+        finally:
+            self._skipping = False
+
+
+_scheduler: AnimationScheduler | None = None
+
+
+def get_scheduler() -> AnimationScheduler:
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = AnimationScheduler()
+    return _scheduler
@@ -5,6 +5,7 @@ from PyQt5.QtGui import QIcon
 from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QComboBox, QPushButton, QListWidget
 
 from GUI.game_window import GameWindow
+from GUI.qt_bridge import QtBridge
 from GUI.stat_pos import get_nicknames
 from core.server import Server
 from core.setting_deploy import get_resource_path
@@ -14,6 +15,7 @@ class CreateGameWindow(QDialog):
     def __init__(self, parent=None):
         super().__init__(parent)
         self.server = None
+        self.bridge = None
         self.main_window = parent
         self.setWindowTitle("UNO")
         self.setWindowFlags(self.windowFlags() & ~Qt.WindowContextHelpButtonHint)
@@ -65,6 +67,13 @@ class CreateGameWindow(QDialog):
         self.players_list.setVisible(False)
         layout.addWidget(self.players_list)
 
+        self.add_bot_button = QPushButton("Добавить бота")
+        self.add_bot_button.setStyleSheet(
+            "background-color: #3366cc; color: white; font-size: 16px; font-weight: bold; padding: 8px; border-radius: 5px;")
+        self.add_bot_button.setVisible(False)
+        self.add_bot_button.clicked.connect(self.on_add_bot)
+        layout.addWidget(self.add_bot_button)
+
         self.start_game_button = QPushButton("Начать игру")
         self.start_game_button.setStyleSheet(
             "background-color: #28a745; color: white; font-size: 18px; font-weight: bold; padding: 10px; border-radius: 5px;")
@@ -88,25 +97,30 @@ class CreateGameWindow(QDialog):
     def start_server(self):
         self.server = Server(value_players=int(self.players_combo.currentText()) - 1,
                              nickname=self.nickname_combo.currentText())
+        self.bridge = QtBridge()
+        self.bridge.target = self.server
+        self.server.on_state = self.bridge.push
+        # сервер сообщает о входе и выходе игроков из своего потока — сигнал доставит список в поток GUI
+        self.bridge.lobby.connect(self.update_players_list)
+        self.server.on_lobby = self.bridge.lobby.emit
         self.code_label.setText(f"Код доступа: {self.server.session_code}")
         self.code_label.setVisible(True)
         self.players_list.setVisible(True)
         self.generate_button.setVisible(False)
 
+        self.update_players_list(())
+
         threading.Thread(target=self.server.start, daemon=True).start()
-        threading.Thread(target=self.update_players_list, daemon=True).start()
 
-    def update_players_list(self):
-        while True:
-            self.players_list.clear()
-            for nickname in self.server.clients.keys():
-                self.players_list.addItem(nickname)
-            if len(self.server.clients) == self.server.value_players:
-                self.start_game_button.setVisible(True)
+    def update_players_list(self, players):
+        self.players_list.clear()
+        self.players_list.addItems(list(players))
+        full = len(players) == self.server.value_players
+        self.start_game_button.setVisible(full)
+        self.add_bot_button.setVisible(not full)
 
-            else:
-                self.start_game_button.setVisible(False)
-            threading.Event().wait(2)
+    def on_add_bot(self):
+        self.server.add_bot()
 
     def closeEvent(self, event):
         if self.server:
@@ -116,5 +130,5 @@ class CreateGameWindow(QDialog):
         self.server.gui = GameWindow(num_players=self.server.value_players + 1, main_window=self.main_window)
         self.server.gui.show()
         self.server.gui.ctrl = self.server.ctrl
-        self.server.ctrl.new_game([self.server.nickname, *self.server.clients])
+        self.server.new_game()
         self.accept()
@@ -0,0 +1,71 @@
+from PyQt5.QtCore import QRectF
+from PyQt5.QtGui import QPainter
+from PyQt5.QtWidgets import QGraphicsItem
+
+from GUI import svg_cache
+from GUI.draggable_svg_item import DraggableCardItem
+from core.setting_deploy import get_resource_path
+
+BACK_PATH = "assets/cards/back.svg"
+
+
+class DeckStackItem(QGraphicsItem):
+    # колода одним элементом сцены: стопка рубашек рисуется за один paint()
+    STEP = 0.1
+
+    def __init__(self, count, x, y, scale=0.5, parent=None):
+        super().__init__(parent)
+        self._count = count
+        self._card_scale = scale
+        self.svg_path = get_resource_path(BACK_PATH)
+        self._card_size = svg_cache.get_renderer(self.svg_path).defaultSize()
+        self.setPos(x, y)
+        self.setScale(scale)
+
+    @property
+    def count(self):
+        return self._count
+
+    def set_count(self, count):
+        count = max(0, count)
+        if count != self._count:
+            self.prepareGeometryChange()
+            self._count = count
+            self.update()
+
+    def _offset(self, i):
+        # смещение i-й карты в координатах элемента (в сцене — STEP вправо и вверх)
+        return i * self.STEP / self._card_scale
+
+    def top_pos(self):
+        return self.mapToScene(self._offset(self._count - 1), -self._offset(self._count - 1))
+
+    def boundingRect(self):
+        shift = self._offset(max(0, self._count - 1))
+        return QRectF(0, -shift, self._card_size.width() + shift, self._card_size.height() + shift)
+
+    def paint(self, painter, option, widget=None):
+        if not self._count:
+            return
+        rect = QRectF(0, 0, self._card_size.width(), self._card_size.height())
+        if svg_cache.RASTER_CARDS:
+            pixmap = svg_cache.get_pixmap(self.svg_path, option.levelOfDetailFromTransform(painter.worldTransform()))
+            source = QRectF(pixmap.rect())
+            painter.setRenderHint(QPainter.SmoothPixmapTransform)
+            for i in range(self._count):
+                painter.drawPixmap(rect.translated(self._offset(i), -self._offset(i)), pixmap, source)
+        else:
+            renderer = svg_cache.get_renderer(self.svg_path)
+            for i in range(self._count):
+                renderer.render(painter, rect.translated(self._offset(i), -self._offset(i)))
+
+    def take(self):
+        # верхняя карта превращается в отдельный элемент, который можно анимировать
+        if not self._count:
+            return None
+        card = DraggableCardItem(self.svg_path, draggable=False)
+        card.setScale(self._card_scale)
+        card.setPos(self.top_pos())
+        self.scene().addItem(card)
+        self.set_count(self._count - 1)
+        return card
@@ -1,12 +1,19 @@
-from PyQt5.QtGui import QTransform
+from PyQt5.QtGui import QTransform, QPainter
 from PyQt5.QtSvg import QGraphicsSvgItem
-from PyQt5.QtCore import Qt, QPointF, QRectF, QPropertyAnimation, pyqtProperty, QEasingCurve
-from logger import logger
+from PyQt5.QtCore import Qt, QPointF, QRectF, pyqtProperty
+
+from GUI import svg_cache
+from GUI.animation_scheduler import get_scheduler
+from logger import get_logger
+
+logger = get_logger(__name__)
 
 
 class DraggableCardItem(QGraphicsSvgItem):
     def __init__(self, svg_path, draggable=False, card=None, parent=None):
-        super().__init__(svg_path, parent)
+        super().__init__(parent)
+        self.svg_path = svg_path
+        self.setSharedRenderer(svg_cache.get_renderer(svg_path))
 
         self.draggable = draggable
         self.card = card
@@ -23,7 +30,14 @@ class DraggableCardItem(QGraphicsSvgItem):
         self.old_transform = None
         self.old_zvalue = 0
 
-        self.anim = None
+    def paint(self, painter, option, widget=None):
+        if not svg_cache.RASTER_CARDS:
+            super().paint(painter, option, widget)
+            return
+        scale = option.levelOfDetailFromTransform(painter.worldTransform())
+        pixmap = svg_cache.get_pixmap(self.svg_path, scale)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        painter.drawPixmap(self.boundingRect(), pixmap, QRectF(pixmap.rect()))
 
     @pyqtProperty(QPointF)
     def item_pos(self):
@@ -34,19 +48,13 @@ class DraggableCardItem(QGraphicsSvgItem):
         self.setPos(new_pos)
 
     def fly_to_position(self, x, y, duration=500, callback=None):
-        self.anim = QPropertyAnimation(self, b"item_pos")
-        self.anim.setDuration(duration)
-        self.anim.setStartValue(self.pos())
-        self.anim.setEndValue(QPointF(x, y))
-        self.anim.setEasingCurve(QEasingCurve.OutQuad)
-        if callback:
-            self.anim.finished.connect(callback)
-        self.anim.start(QPropertyAnimation.DeleteWhenStopped)
+        get_scheduler().move(self, x, y, duration, callback)
 
     def hoverEnterEvent(self, event):
         if self.draggable and not self.card_is_played:
             self.setScale(self.scale() * 1.2)
-            self.setZValue(10)
+            # в руке z-порядок равен позиции карты, наведённая поднимается над всеми
+            self.setZValue(1000)
         super().hoverEnterEvent(event)
 
     def hoverLeaveEvent(self, event):
@@ -85,7 +93,7 @@ class DraggableCardItem(QGraphicsSvgItem):
                     self.card_is_played = True
                     self.setScale(self.scale() / 1.2)
                     self.setZValue(9999)
-                    logger.info("Карта сыграна!")
+                    logger.debug("Карта сыграна!")
                     if self.card_dropped_in_center:
                         self.card_dropped_in_center()
             else:
@@ -1,27 +1,41 @@
 from __future__ import annotations
 
-import math
 import random
+from functools import lru_cache
 
-from PyQt5.QtCore import Qt, QTimer
+from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QIcon, QPalette, QBrush, QColor, QTransform
 from PyQt5.QtSvg import QGraphicsSvgItem
 from PyQt5.QtWidgets import QGraphicsEllipseItem
 from PyQt5.QtWidgets import QWidget, QGraphicsView, QGraphicsScene, QGraphicsRectItem, QGraphicsSceneMouseEvent, \
     QMessageBox, QGraphicsTextItem
 
+from GUI.animation_scheduler import get_scheduler
+from GUI.deck_stack_item import DeckStackItem
 from GUI.draggable_svg_item import DraggableCardItem
-from GUI.stat_pos import get_name_positions, get_arc_config, get_color_map
+from GUI.svg_cache import get_renderer
+from GUI.stat_pos import get_name_positions, get_arc_config, get_arc_layout, get_color_map
+from core import rules
 from core.card import Card
-from core.game_controller import GameController
+from core.game_controller import GameController, Snapshot
 from core.setting_deploy import get_resource_path
-from logger import logger
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+
+@lru_cache(maxsize=None)
+def _rotation(angle_deg):
+    t = QTransform()
+    t.rotate(angle_deg)
+    return t
 
 
 class GameWindow(QWidget):
     def __init__(self, num_players, ctrl: GameController = None, main_window=None):
         super().__init__()
         self._pending_card: Card | None = None
+        self.state: Snapshot | None = None
         self.color_map = get_color_map()
         self.click_blocker = None
         self.ctrl = ctrl
@@ -53,7 +67,7 @@ class GameWindow(QWidget):
 
         self.arc_config = get_arc_config()
         self.top_card_item = None
-        self.deck_items = []
+        self.deck_stack = None
         self.create_click_blocker()
         self.init_ui()
 
@@ -62,12 +76,8 @@ class GameWindow(QWidget):
         palette.setBrush(QPalette.Background, QBrush(QColor(173, 216, 230)))
         self.setPalette(palette)
 
-        for i in range(108 - self.num_players * 7 - 1):
-            deck = DraggableCardItem(get_resource_path("assets/cards/back.svg"), draggable=False)
-            deck.setScale(0.5)
-            deck.setPos(600 + i * 0.1, 300 - i * 0.1)
-            self.deck_items.append(deck)
-            self.scene.addItem(deck)
+        self.deck_stack = DeckStackItem(108 - self.num_players * 7 - 1, 600, 300)
+        self.scene.addItem(self.deck_stack)
 
         self.add_buttons()
         self._init_color_indicator()
@@ -117,7 +127,8 @@ class GameWindow(QWidget):
             c.setVisible(False)
 
     def add_buttons(self):
-        self.draw_card_btn = QGraphicsSvgItem(get_resource_path("assets/iconTakeCard.svg"))
+        self.draw_card_btn = QGraphicsSvgItem()
+        self.draw_card_btn.setSharedRenderer(get_renderer(get_resource_path("assets/iconTakeCard.svg")))
         self.draw_card_btn.setScale(0.4)
         self.draw_card_btn.setPos(250, 500)
         self.scene.addItem(self.draw_card_btn)
@@ -128,7 +139,9 @@ class GameWindow(QWidget):
     def on_draw_card_click(self, event: QGraphicsSceneMouseEvent):
         self.draw_card_btn.setOpacity(0.6)
         take_card = self.ctrl.draw_one()
-        self.take_card(0, take_card)
+        if take_card:
+            self.take_card(0, take_card)
+            self._refresh()
         self.draw_card_btn.setOpacity(1.0)
         self.update_button_state()
 
@@ -156,105 +169,90 @@ class GameWindow(QWidget):
         self.scene.addItem(new_top)
 
         self.top_card_item = new_top
-        logger.info(f"Новая верхняя карта: {card}")
+        logger.debug("Новая верхняя карта: %s", card)
 
     def update_player_hand(self, player_index):
-        for (card, item) in self.player_hands[player_index]:
-            if item:
-                self.scene.removeItem(item)
-
-        hand_size = len(self.player_hands[player_index])
-        if hand_size == 0:
+        # элементы карт живут, пока карта в руке: здесь только раскладка по дуге и новые карты
+        hand = self.player_hands[player_index]
+        if not hand:
             return
 
-        cfg = self.arc_config[player_index]
-        cx, cy, r = cfg["cx"], cfg["cy"], cfg["r"]
-        start_angle, end_angle = cfg["start_angle"], cfg["end_angle"]
-
-        if hand_size == 1:
-            angle_deg = (start_angle + end_angle) / 2
-            self._place_card(player_index, 0, angle_deg, cx, cy, r)
-            return
-
-        total_angle = end_angle - start_angle
-        step = total_angle / (hand_size - 1) if hand_size > 1 else total_angle
-
-        for i in range(hand_size):
-            angle_deg = start_angle + step * i
-            self._place_card(player_index, i, angle_deg, cx, cy, r)
-
-    def _place_card(self, player_index, i, angle_deg, cx, cy, r):
-        (c, _) = self.player_hands[player_index][i]
-
-        from math import radians
-        a = radians(angle_deg)
-
-        if player_index in [0, 1]:
-            x = cx + r * math.cos(a)
-            y = cy + r * math.sin(a)
-        else:
-            x = cx - r * math.cos(a)
-            y = cy - r * math.sin(a)
-
-        can_drag = (
-                player_index == 0 and
-                c.color != "back" and
-                self.ctrl.is_my_step
-        )
-
-        item = DraggableCardItem(c.image_path,
-                                 draggable=can_drag, card=c)
+        layout = get_arc_layout(player_index, len(hand))
+        my_step = player_index == 0 and self.state is not None and self.state.is_my_step
+        for i, (c, item) in enumerate(hand):
+            if item is None:
+                item = self._create_hand_item(player_index, c)
+                hand[i] = (c, item)
+            x, y, rotation = layout[i]
+            can_drag = my_step and c.color != "back"
+            if item.draggable != can_drag:
+                item.draggable = can_drag
+                item.setAcceptHoverEvents(can_drag)
+            item.setTransform(_rotation(rotation))
+            item.setPos(x, y)
+            item.setZValue(i)
+            item.old_zvalue = i
+
+    def _create_hand_item(self, player_index, c):
+        item = DraggableCardItem(c.image_path, draggable=False, card=c)
         item.setScale(0.5)
 
-        t = QTransform()
-        if player_index in [0, 1]:
-            t.rotate(angle_deg + 90)
-        else:
-            t.rotate(angle_deg - 90)
-        item.setTransform(t)
-
         if player_index == 0 and c.color != "back":
             def dropped():
-                self.remove_card_from_player(0, c)
+                self.remove_card_from_player(0, c, item)
                 self.create_top_card(c)
-                self.update_player_hand(0)
 
                 if c.action in ("draw four", "wild"):
                     self._pending_card = c
                     self.show_color_picker()
                 else:
                     self.ctrl.play_card(card=c)
-                    self.update()
+                    self._refresh()
 
             item.card_dropped_in_center = dropped
 
             def compare_cards(card_obj):
-                logger.info(f"compare_cards {self.top_card_item.card.can_play_on(card_obj)}")
-                return self.top_card_item.card.can_play_on(card_obj)
+                # те же правила, что проверяет сервер: иначе GUI пропустит ход, который будет отклонён
+                playable = rules.can_play(card_obj, self.top_card_item.card)
+                logger.debug("compare_cards %s", playable)
+                return playable
 
             item.compare_cards = compare_cards
 
         self.scene.addItem(item)
-        item.setPos(x, y)
-
-        self.player_hands[player_index][i] = (c, item)
+        return item
 
-    def remove_card_from_player(self, player_index, card_to_remove):
-        new_hand = []
+    def set_hand(self, player_index, cards):
+        # сверяем руку с новым составом: совпавшие карты сохраняют свои элементы сцены
+        spare = {}
         for (c, item) in self.player_hands[player_index]:
-            if c == card_to_remove:
+            spare.setdefault(c, []).append(item)
+        hand = []
+        for c in cards:
+            items = spare.get(c)
+            hand.append((c, items.pop() if items else None))
+        for items in spare.values():
+            for item in items:
                 if item:
                     self.scene.removeItem(item)
-            else:
-                new_hand.append((c, item))
-        self.player_hands[player_index] = new_hand
+        self.player_hands[player_index] = hand
+        self.update_player_hand(player_index)
+
+    def remove_card_from_player(self, player_index, card_to_remove, item_to_remove=None):
+        hand = self.player_hands[player_index]
+        for i, (c, item) in enumerate(hand):
+            matched = item is item_to_remove if item_to_remove else c == card_to_remove
+            if matched:
+                if item:
+                    self.scene.removeItem(item)
+                del hand[i]
+                break
         self.update_player_hand(player_index)
 
     def take_card(self, player_index, card):
-        if not self.deck_items:
+        deck_item = self.deck_stack.take()
+        if deck_item is None:
             return
-
-        deck_item = self.deck_items.pop()
         deck_item.setZValue(500)
 
         if card is None and player_index != 0:
@@ -262,6 +260,10 @@ class GameWindow(QWidget):
 
         def on_finish():
             self.scene.removeItem(deck_item)
+            if card is None:
+                # карту выдал сервер — рука уже обновлена в контроллере
+                self._sync_my_hand()
+                return
             self.player_hands[player_index].append((card, None))
             self.update_player_hand(player_index)
 
@@ -275,12 +277,17 @@ class GameWindow(QWidget):
                 deck_item.setPos(720, 350)
         deck_item.fly_to_position(cfg["cx"], cfg["cy"], 1000, callback=on_finish)
 
+    def _sync_my_hand(self):
+        self.set_hand(0, list(self.state.my_hand))
+
     def animate_opponent_move(self, player_index, card):
         if len(self.player_hands[player_index]) == 0 and not card:
             return
 
         if self.player_hands[player_index]:
-            self.player_hands[player_index].pop(0)
+            (_, back_item) = self.player_hands[player_index].pop(0)
+            if back_item:
+                self.scene.removeItem(back_item)
 
         if card is None:
             (c, item) = self.player_hands[player_index][0]
@@ -311,39 +318,50 @@ class GameWindow(QWidget):
 
         item.fly_to_position(800, 300, 500, callback=on_finish)
 
-    def apply_state(self, command: str):
-        logger.info(f"Обработка команды {command}")
-        if command == "start_game":
-            self.create_top_card(self.ctrl.top_card)
-
-            self.player_hands = {i: [] for i in range(self.num_players)}
-
-            for idx in range(self.num_players):
-                if idx == 0:
-                    cards = list(self.ctrl.my_hands)
-                else:
-                    cards = [Card("back", "back") for _ in range(7)]
-
-                self.player_hands[idx] = [(c, None) for c in cards]
-                self.update_player_hand(idx)
+    def apply_states(self, snapshots: list[Snapshot], resync: bool = False):
+        # всё, что пришло за кадр: события отыгрываются по очереди, перерисовка одна
+        if resync:
+            logger.warning("Очередь событий переполнена — перерисовываем стол по последнему состоянию.")
+            get_scheduler().fast_forward()
+            snapshots = snapshots[-1:]
+        for snapshot in snapshots:
+            if not self.apply_state(snapshot, redraw=False):
+                return
+        if resync:
+            self._resync()
+        self.update()
 
+    def apply_state(self, snapshot: Snapshot, redraw: bool = True) -> bool:
+        command = snapshot.command
+        self.state = snapshot
+        logger.debug("Обработка команды %s", command)
+        if command in ("start_game", "end_game", "error"):
+            # новое состояние важнее недоигранных анимаций
+            get_scheduler().fast_forward()
+        if command == "start_game":
+            self._resync()
         elif command == "step" or command == "wild":
-            self.animate_opponent_move(self.swap_queue().index(self.ctrl.step_player), self.ctrl.top_card)
-            self.create_top_card(self.ctrl.top_card)
+            self.animate_opponent_move(self.swap_queue().index(snapshot.step_player), snapshot.top_card)
+            self.create_top_card(snapshot.top_card)
         elif command == "take_card":
-            self.take_card(self.swap_queue().index(self.ctrl.player_take_card), None)
+            if snapshot.player_take_card == snapshot.my_nickname:
+                self.take_card(0, None)
+            else:
+                self.take_card(self.swap_queue().index(snapshot.player_take_card), None)
         elif command == "draw two":
-            self.animate_opponent_move(self.swap_queue().index(self.ctrl.step_player), self.ctrl.top_card)
-            self.create_top_card(self.ctrl.top_card)
-            self._draw_cards(count=2)
+            self.animate_opponent_move(self.swap_queue().index(snapshot.step_player), snapshot.top_card)
+            self.create_top_card(snapshot.top_card)
+            if not snapshot.authoritative:
+                self._draw_cards(count=2)
         elif command == "draw four":
-            self.animate_opponent_move(self.swap_queue().index(self.ctrl.step_player), self.ctrl.top_card)
-            self.create_top_card(self.ctrl.top_card)
-            self._draw_cards(count=4)
+            self.animate_opponent_move(self.swap_queue().index(snapshot.step_player), snapshot.top_card)
+            self.create_top_card(snapshot.top_card)
+            if not snapshot.authoritative:
+                self._draw_cards(count=4)
         elif command == "end_game":
             msgbox = QMessageBox(self)
             msgbox.setWindowTitle("Игра окончена")
-            msgbox.setText(f"Победил игрок: {self.ctrl.winner_player}")
+            msgbox.setText(f"Победил игрок: {snapshot.winner_player}")
             msgbox.setIcon(QMessageBox.Information)
             msgbox.setStandardButtons(QMessageBox.Ok)
 
@@ -354,22 +372,46 @@ class GameWindow(QWidget):
                     self.main_window.show()
                 self.ctrl.close_game()
                 self.close()
+                return False
         elif command == "error":
             if self.ctrl.is_client:
                 text = "Соединение с сервером потеряно."
             else:
-                text = f"Игрок {self.ctrl.exit_nickname} отключился — игра прервана."
+                text = f"Игрок {snapshot.exit_nickname} отключился — игра прервана."
             QMessageBox.critical(self, "Ошибка", text)
             if self.main_window:
                 self.main_window.show()
             self.ctrl.close_game()
             self.close()
+            return False
+        if redraw:
+            self.update()
+        return True
+
+    def _resync(self):
+        # стол целиком по срезу: своя рука, рубашки соперников и верхняя карта
+        self.create_top_card(self.state.top_card)
+        queue = self.swap_queue()
+        for idx in range(self.num_players):
+            if idx == 0:
+                cards = list(self.state.my_hand)
+            else:
+                nick = queue[idx] if idx < len(queue) else None
+                cards = [Card("back", "back") for _ in range(self.state.hand_counts.get(nick, 7))]
+            self.set_hand(idx, cards)
+
+    def _refresh(self):
+        # после собственного хода берём свежий срез: сервер об этом ходе нам не сообщит.
+        # Ход хоста применяет цикл событий сервера, срез «turn» придёт оттуда
+        if not self.ctrl.is_client:
+            return
+        self.state = self.ctrl.snapshot("local")
         self.update()
 
     def swap_queue(self):
-        full_queue = self.ctrl.queue[:]
-        if self.ctrl.my_nickname in full_queue:
-            start = full_queue.index(self.ctrl.my_nickname)
+        full_queue = list(self.state.queue)
+        if self.state.my_nickname in full_queue:
+            start = full_queue.index(self.state.my_nickname)
             display_queue = full_queue[start:] + full_queue[:start]
         else:
             display_queue = full_queue
@@ -381,13 +423,13 @@ class GameWindow(QWidget):
         self.name_items.clear()
 
         display_queue = self.swap_queue()
-        self.ctrl.is_my_step = self.ctrl.current == self.ctrl.my_nickname
-        self.click_blocker.setVisible(not self.ctrl.is_my_step)
-        logger.info(f"Кто ходит {self.ctrl.current}")
-        logger.info(f"колво карт в деке {len(self.ctrl.deck)}")
-        for i in range(self.ctrl.value_player):
+        is_my_step = self.state.is_my_step
+        self.click_blocker.setVisible(not is_my_step)
+        logger.debug("Кто ходит %s, карт в колоде %d", self.state.current, self.state.deck_size)
+        self.deck_stack.set_count(self.state.deck_size)
+        for i in range(self.state.value_player):
             self.update_player_hand(i)
-        self.take_card_button = self.ctrl.is_my_step
+        self.take_card_button = is_my_step
         self.update_button_state()
 
         for idx, nick in enumerate(display_queue):
@@ -397,7 +439,7 @@ class GameWindow(QWidget):
             text = QGraphicsTextItem(nick)
             text.setPos(x, y)
             text.setRotation(angle)
-            if nick == self.ctrl.current:
+            if nick == self.state.current:
                 text.setDefaultTextColor(Qt.red)
             else:
                 text.setDefaultTextColor(Qt.black)
@@ -417,22 +459,19 @@ class GameWindow(QWidget):
         self.scene.addItem(self.click_blocker)
 
     def _draw_cards(self, count: int = 1):
-        def _draw_one(i):
-            if i >= count:
-                return
+        # все карты штрафа вылетают из колоды одной группой анимаций
+        for _ in range(count):
             card = self.ctrl.draw_one()
-            self.take_card(0, card)
-            QTimer.singleShot(300, lambda: _draw_one(i + 1))
-
-        _draw_one(0)
+            if card:
+                self.take_card(0, card)
 
     def _on_color_chosen(self, color_name: str):
         if not self._pending_card:
             return
-        self._pending_card.color = color_name
+        self._pending_card = self._pending_card.with_color(color_name)
         self.set_color_indicator(color_name)
         self.create_top_card(self._pending_card)
         self.hide_color_picker()
         self.ctrl.play_card(card=self._pending_card)
         self._pending_card = None
-        self.update()
+        self._refresh()
@@ -3,8 +3,9 @@ from PyQt5.QtGui import QIcon
 from PyQt5.QtWidgets import QDialog, QVBoxLayout, QLabel, QComboBox, QPushButton, QLineEdit
 
 from GUI.game_window import GameWindow
+from GUI.qt_bridge import QtBridge
 from GUI.stat_pos import get_nicknames
-from core.client import Client
+from core.client import Client, JoinStage
 from core.setting_deploy import get_resource_path
 
 
@@ -20,6 +21,7 @@ class JoinGameWindow(QDialog):
         self.setModal(True)
 
         self.client = None
+        self.bridge = None
 
         layout = QVBoxLayout()
 
@@ -70,15 +72,39 @@ class JoinGameWindow(QDialog):
             self.nickname_combo.setDisabled(True)
 
     def join_game(self):
+        if self.client and self.client.stage not in (JoinStage.FAILED, JoinStage.CANCELLED):
+            # повторное нажатие во время подключения — отмена
+            self.client.cancel()
+            return
+
         session_code = self.code_input.text().strip()
         if not session_code:
             self.show_error("Введите код!")
             return
 
         self.show_status("Подключение...")
+        self.code_input.setDisabled(True)
+        self.join_button.setText("Отменить")
 
         nickname = self.nickname_combo.currentText()
-        self.client = Client(session_code, nickname, self)
+        self.bridge = QtBridge(on_start=self.start_game)
+        self.client = Client(session_code, nickname,
+                             on_state=self.bridge.push,
+                             on_start=self.bridge.started.emit,
+                             on_progress=self.bridge.progress.emit)
+        self.bridge.target = self.client
+        self.bridge.progress.connect(self.on_progress)
+        self.client.join()
+
+    def on_progress(self, stage, message):
+        if stage in (JoinStage.FAILED, JoinStage.CANCELLED):
+            self.join_button.setText("Присоединиться к игре")
+            self.code_input.setDisabled(False)
+            self.show_error(message)
+        elif stage == JoinStage.WAITING:
+            self.show_success(message)
+        else:
+            self.show_status(message)
 
     def show_error(self, message):
         self.status_label.setText(message)
@@ -98,10 +124,17 @@ class JoinGameWindow(QDialog):
         self.status_label.setStyleSheet("font-size: 18px; color: blue; font-weight: bold;")
         self.status_label.setVisible(True)
 
+    def closeEvent(self, event):
+        # окно закрыли до старта игры — место за столом освобождаем
+        if self.client and not self.client.gui:
+            self.client.cancel()
+        super().closeEvent(event)
+
     def start_game(self, players_number: int):
         self.client.gui = GameWindow(num_players=players_number, main_window=self.main_window)
         self.client.gui.ctrl = self.client.ctrl
-        self.client.gui.apply_state("start_game")
+        # клиент шлёт срез start_game после сигнала started, а оба сигнала моста — очередные: кадр со срезом
+        # запустится уже после создания окна и перерисует стол
         self.client.gui.show()
         self.accept()
 
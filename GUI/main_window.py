@@ -6,7 +6,9 @@ from GUI.create_game_window import CreateGameWindow
 from GUI.join_game_window import JoinGameWindow
 from GUI.rules_window import RulesWindow
 from core.setting_deploy import get_resource_path
-from logger import logger
+from logger import get_logger
+
+logger = get_logger(__name__)
 
 
 class MainWindow(QWidget):
@@ -0,0 +1,55 @@
+import queue
+
+from PyQt5.QtCore import QObject, QTimer, pyqtSignal, Qt
+
+# срезы состояния из сетевого потока копятся в ограниченной очереди и применяются не чаще раза за кадр
+SNAPSHOT_QUEUE_SIZE = 256
+FRAME_MS = 16
+
+
+class QtBridge(QObject):
+    # переносит события контроллера из сетевых потоков в поток GUI
+    wake = pyqtSignal()
+    started = pyqtSignal(int)
+    lobby = pyqtSignal(object)
+    progress = pyqtSignal(object, str)
+
+    def __init__(self, on_start=None):
+        super().__init__()
+        self.target = None
+        self._snapshots = queue.Queue(SNAPSHOT_QUEUE_SIZE)
+        self._latest = None
+        self._overflow = False
+        self._frame = QTimer(self)
+        self._frame.setSingleShot(True)
+        self._frame.setInterval(FRAME_MS)
+        self._frame.timeout.connect(self._on_frame)
+        self.wake.connect(self._schedule, Qt.QueuedConnection)
+        if on_start:
+            self.started.connect(on_start, Qt.QueuedConnection)
+
+    def push(self, snapshot):
+        # вызывается из любого потока; при переполнении GUI пропустит анимации и перерисует всё по последнему срезу
+        self._latest = snapshot
+        try:
+            self._snapshots.put_nowait(snapshot)
+        except queue.Full:
+            self._overflow = True
+        self.wake.emit()
+
+    def _schedule(self):
+        if not self._frame.isActive():
+            self._frame.start()
+
+    def _on_frame(self):
+        snapshots = []
+        while True:
+            try:
+                snapshots.append(self._snapshots.get_nowait())
+            except queue.Empty:
+                break
+        resync, self._overflow = self._overflow, False
+        if resync and self._latest is not None and (not snapshots or snapshots[-1] is not self._latest):
+            snapshots.append(self._latest)
+        if snapshots and self.target:
+            self.target.apply_states(snapshots, resync)
@@ -5,7 +5,9 @@ from PyQt5.QtGui import QIcon
 from PyQt5.QtWidgets import QMainWindow, QVBoxLayout, QWidget, QSplitter, QTextBrowser
 
 from core.setting_deploy import get_resource_path
-from logger import logger
+from logger import get_logger
+
+logger = get_logger(__name__)
 
 
 class RulesWindow(QMainWindow):
@@ -42,4 +44,4 @@ class RulesWindow(QMainWindow):
 
         except FileNotFoundError:
             self.text_browser.setHtml("<h1>404</h1><p>Страница не найдена</p>")
-            logger.error("Страница не найдена: " + file_name)
\ No newline at end of file
+            logger.error("Страница не найдена: %s", file_name)
\ No newline at end of file
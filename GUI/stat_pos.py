@@ -1,4 +1,6 @@
+import math
 import os
+from functools import lru_cache
 
 from core.setting_deploy import get_resource_path
 
@@ -21,6 +23,28 @@ def get_arc_config():
     }
 
 
+@lru_cache(maxsize=None)
+def get_arc_layout(player_index, hand_size):
+    # позиции и повороты карт на дуге для руки заданного размера: (x, y, угол поворота)
+    cfg = get_arc_config()[player_index]
+    cx, cy, r = cfg["cx"], cfg["cy"], cfg["r"]
+    start_angle, end_angle = cfg["start_angle"], cfg["end_angle"]
+    if hand_size == 1:
+        angles = [(start_angle + end_angle) / 2]
+    else:
+        step = (end_angle - start_angle) / (hand_size - 1)
+        angles = [start_angle + step * i for i in range(hand_size)]
+
+    layout = []
+    for angle_deg in angles:
+        a = math.radians(angle_deg)
+        if player_index in [0, 1]:
+            layout.append((cx + r * math.cos(a), cy + r * math.sin(a), angle_deg + 90))
+        else:
+            layout.append((cx - r * math.cos(a), cy - r * math.sin(a), angle_deg - 90))
+    return tuple(layout)
+
+
 def get_color_map():
     return {
         "red": "#ff5555",
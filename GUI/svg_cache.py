@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+from PyQt5.QtCore import Qt, QSize
+from PyQt5.QtGui import QPainter, QPixmap, QPixmapCache
+from PyQt5.QtSvg import QSvgRenderer
+
+# растровые копии карт: рисовать готовый QPixmap дешевле, чем каждый кадр разбирать SVG
+RASTER_CARDS = True
+# масштабы округляются до шага, чтобы при наведении/анимации не плодить почти одинаковые картинки
+SCALE_STEP = 0.05
+PIXMAP_CACHE_KB = 32 * 1024
+
+_renderers: dict[str, QSvgRenderer] = {}
+QPixmapCache.setCacheLimit(max(QPixmapCache.cacheLimit(), PIXMAP_CACHE_KB))
+
+
+def get_renderer(svg_path: str) -> QSvgRenderer:
+    # один разобранный SVG на файл, элементы сцены делят его через setSharedRenderer
+    renderer = _renderers.get(svg_path)
+    if renderer is None:
+        renderer = QSvgRenderer(svg_path)
+        _renderers[svg_path] = renderer
+    return renderer
+
+
+def get_pixmap(svg_path: str, scale: float) -> QPixmap:
+    scale = max(SCALE_STEP, round(scale / SCALE_STEP) * SCALE_STEP)
+    key = f"{svg_path}@{scale:.2f}"
+    pixmap = QPixmapCache.find(key)
+    if pixmap is None or pixmap.isNull():
+        renderer = get_renderer(svg_path)
+        size = renderer.defaultSize()
+        pixmap = QPixmap(QSize(max(1, round(size.width() * scale)), max(1, round(size.height() * scale))))
+        pixmap.fill(Qt.transparent)
+        painter = QPainter(pixmap)
+        painter.setRenderHint(QPainter.Antialiasing)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform)
+        renderer.render(painter)
+        painter.end()
+        QPixmapCache.insert(key, pixmap)
+    return pixmap
@@ -1,14 +1,29 @@
 import sys
-from PyQt5.QtWidgets import QApplication
-from GUI.main_window import MainWindow
-from logger import logger
+from logger import get_logger
+
+logger = get_logger("app")
 
 
 def main():
-    logger.info("Start app")
     import multiprocessing
+    # нужно для процессов симуляции в собранном .exe
+    multiprocessing.freeze_support()
+
+    if len(sys.argv) > 1 and sys.argv[1] == "server":
+        from core.server import main as server_main
+        server_main(sys.argv[2:])
+        return
+    if len(sys.argv) > 1 and sys.argv[1] == "simulate":
+        from core.batch import main as batch_main
+        batch_main(sys.argv[2:])
+        return
+
+    logger.info("Start app")
     multiprocessing.set_start_method('spawn')
 
+    from PyQt5.QtWidgets import QApplication
+    from GUI.main_window import MainWindow
+
     try:
         app = QApplication(sys.argv)
         window = MainWindow()
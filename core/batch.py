@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import argparse
+import multiprocessing
+import os
+import random
+import time
+from collections import Counter
+from typing import List, Sequence
+
+from core.card import CARD_ACTIONS
+from core.simulator import BatchStats, MAX_TURNS, STRATEGIES, play_game
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+CHUNK_SIZE = 2000
+
+# раскладка общего массива счётчиков: [игры, ничьи, взятые карты, action-карты..., победы по местам..., длины партий...]
+GAMES, STALEMATES, DRAWS = range(3)
+ACTIONS = 3
+WINS = ACTIONS + len(CARD_ACTIONS)
+
+# у каждого процесса пула свои ссылки на общий массив и замок (передаются через initializer)
+_counters = None
+_lock = None
+
+
+def _lengths_at(seats: int) -> int:
+    return WINS + seats
+
+
+def _size(seats: int, max_turns: int) -> int:
+    return _lengths_at(seats) + max_turns + 1
+
+
+def _init_worker(counters, lock):
+    global _counters, _lock
+    _counters, _lock = counters, lock
+
+
+def _run_chunk(task) -> int:
+    names, seed, chunk, games, max_turns = task
+    seats = len(names)
+    strategies = [STRATEGIES[name] for name in names]
+    # сид партии зависит только от общего сида и номера чанка — результат не зависит от числа процессов
+    rng = random.Random(f"{seed}:{chunk}")
+    lengths_at = _lengths_at(seats)
+    local = [0] * _size(seats, max_turns)
+    actions = Counter()
+    for _ in range(games):
+        result = play_game(strategies, rng=rng, max_turns=max_turns)
+        local[GAMES] += 1
+        local[DRAWS] += result.draws
+        local[lengths_at + result.turns] += 1
+        if result.winner is None:
+            local[STALEMATES] += 1
+        else:
+            local[WINS + result.winner] += 1
+        actions.update(result.actions)
+    for i, action in enumerate(CARD_ACTIONS):
+        local[ACTIONS + i] = actions[action]
+
+    # один раз за чанк сливаем локальные счётчики в общую память
+    with _lock:
+        for i, value in enumerate(local):
+            if value:
+                _counters[i] += value
+    return games
+
+
+def _collect(counters, seats: int, max_turns: int) -> BatchStats:
+    lengths_at = _lengths_at(seats)
+    stats = BatchStats(wins=list(counters[WINS:WINS + seats]))
+    stats.games = counters[GAMES]
+    stats.stalemates = counters[STALEMATES]
+    stats.draws = counters[DRAWS]
+    stats.actions = Counter({a: counters[ACTIONS + i] for i, a in enumerate(CARD_ACTIONS) if counters[ACTIONS + i]})
+    stats.lengths = Counter({t: c for t, c in enumerate(counters[lengths_at:lengths_at + max_turns + 1]) if c})
+    return stats
+
+
+def run_batch(names: Sequence[str], games: int, seed: int | None = None, workers: int | None = None,
+              chunk_size: int = CHUNK_SIZE, max_turns: int = MAX_TURNS) -> BatchStats:
+    # стратегии передаются по именам из STRATEGIES: процессы запускаются через spawn, как и в app.py
+    for name in names:
+        if name not in STRATEGIES:
+            raise ValueError(f"Неизвестная стратегия {name}, доступны: {', '.join(STRATEGIES)}")
+    if seed is None:
+        seed = random.randrange(2 ** 32)
+    workers = workers or os.cpu_count() or 1
+    seats = len(names)
+
+    ctx = multiprocessing.get_context("spawn")
+    counters = ctx.RawArray("q", _size(seats, max_turns))
+    lock = ctx.Lock()
+    tasks = []
+    for chunk, start in enumerate(range(0, games, chunk_size)):
+        tasks.append((tuple(names), seed, chunk, min(chunk_size, games - start), max_turns))
+
+    started = time.perf_counter()
+    if workers == 1:
+        _init_worker(counters, lock)
+        for task in tasks:
+            _run_chunk(task)
+    else:
+        with ctx.Pool(workers, initializer=_init_worker, initargs=(counters, lock)) as pool:
+            for _ in pool.imap_unordered(_run_chunk, tasks):
+                pass
+    stats = _collect(counters, seats, max_turns)
+    stats.seconds = time.perf_counter() - started
+    logger.info("Сыграно %d партий за %.1f с (%.0f партий/с), процессов: %d, сид: %s",
+                stats.games, stats.seconds, stats.games_per_second, workers, seed)
+    return stats
+
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(prog="python -m core.batch", description="Массовая симуляция партий UNO")
+    parser.add_argument("strategies", nargs="+", choices=sorted(STRATEGIES), help="стратегии игроков по местам")
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=None, help="число процессов, по умолчанию — по ядрам")
+    parser.add_argument("--chunk", type=int, default=CHUNK_SIZE, help="партий в одном задании")
+    args = parser.parse_args(argv)
+    if not 2 <= len(args.strategies) <= 4:
+        parser.error("нужно от 2 до 4 стратегий")
+
+    stats = run_batch(args.strategies, args.games, seed=args.seed, workers=args.workers, chunk_size=args.chunk)
+    for seat, (name, rate) in enumerate(zip(args.strategies, stats.win_rates)):
+        print(f"место {seat} ({name}): {rate:.2%}")
+    print(f"ничьи (в доли побед не входят): {stats.stalemate_rate:.2%}, ходов в среднем: {stats.mean_turns:.1f}")
+    print("action-карты: " + ", ".join(f"{a} {c / stats.games:.2f}" for a, c in stats.actions.most_common()))
+    print(f"{stats.games_per_second:.0f} партий/с")
+
+
+if __name__ == "__main__":
+    main()
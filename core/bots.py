@@ -0,0 +1,254 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import Callable, Dict, Iterable, List, Optional
+
+from core import protocol as proto
+from core.card import Card
+from core.deck import build_ids
+from core.game_controller import GameController
+from core.hand import Hand
+from core.rules import DRAW_PENALTY
+from core.simulator import STRATEGIES, Strategy, best_color, draw_card, greedy_strategy, run_game
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+MOVE_BUDGET = 0.05
+EXPLORATION = 1.4
+
+_FULL_DECK = Counter(build_ids())
+
+
+@dataclass
+class Seen:
+    # всё, что бот знает о партии в момент своего хода
+    hand: Hand
+    top: Card
+    others: List[int]   # размеры рук соперников в порядке хода
+    unseen: List[int]   # id карт, которых бот не видел: чужие руки и колода
+    deck_size: int
+
+
+Policy = Callable[[Seen, random.Random], Optional[Card]]
+
+
+def heuristic(strategy: Strategy) -> Policy:
+    def policy(seen: Seen, rng: random.Random) -> Card | None:
+        return strategy(seen.hand, seen.top, seen.others, rng)
+
+    policy.__name__ = strategy.__name__
+    return policy
+
+
+class MctsPolicy:
+    # детерминизированный поиск: каждая итерация заново раздаёт невидимые карты, ход в корне выбирается по UCB1,
+    # партия доигрывается быстрой стратегией на состоянии симулятора
+    def __init__(self, budget: float = MOVE_BUDGET, rollout: Strategy = greedy_strategy,
+                 exploration: float = EXPLORATION):
+        self.budget = budget
+        self.rollout = rollout
+        self.exploration = exploration
+        self.iterations = 0
+
+    def __call__(self, seen: Seen, rng: random.Random) -> Card | None:
+        moves = seen.hand.playable(seen.top)
+        if len(moves) <= 1:
+            return moves[0] if moves else None
+
+        visits = [0] * len(moves)
+        wins = [0.0] * len(moves)
+        deadline = time.perf_counter() + self.budget
+        total = 0
+        while total < len(moves) or time.perf_counter() < deadline:
+            if total < len(moves):
+                idx = total
+            else:
+                log_total = math.log(total)
+                idx = max(range(len(moves)), key=lambda i: wins[i] / visits[i]
+                          + self.exploration * math.sqrt(log_total / visits[i]))
+            wins[idx] += self._playout(seen, moves[idx], rng)
+            visits[idx] += 1
+            total += 1
+        self.iterations = total
+        return moves[max(range(len(moves)), key=visits.__getitem__)]
+
+    def _playout(self, seen: Seen, move: Card, rng: random.Random) -> float:
+        unseen = seen.unseen[:]
+        rand = rng.random
+        hands = [Hand(seen.hand)]
+        for size in seen.others:
+            hands.append(Hand(draw_card(unseen, rand) for _ in range(min(size, len(unseen)))))
+        first = [move]
+
+        def me(hand: Hand, top: Card, others: List[int], rng: random.Random) -> Card | None:
+            return first.pop() if first else self.rollout(hand, top, others, rng)
+
+        strategies = [me] + [self.rollout] * len(seen.others)
+        result = run_game(strategies, hands, unseen, seen.top, 0, rng)
+        return 1.0 if result.winner == 0 else 0.0
+
+
+POLICIES: Dict[str, Callable[[], Policy]] = {
+    **{name: (lambda s=strategy: heuristic(s)) for name, strategy in STRATEGIES.items()},
+    "mcts": MctsPolicy,
+}
+
+
+def make_policy(kind: str) -> Policy:
+    if kind not in POLICIES:
+        raise ValueError(f"Неизвестный тип бота {kind}, доступны: {', '.join(POLICIES)}")
+    return POLICIES[kind]()
+
+
+def bot_name(taken: Iterable[str]) -> str:
+    taken = set(taken)
+    num = 1
+    while f"Бот {num}" in taken:
+        num += 1
+    return f"Бот {num}"
+
+
+class BotPeer:
+    # место за столом без сокета: для сервера выглядит как Peer, внутри — клиентский контроллер и стратегия.
+    # Сообщения и намерения ходят через цикл событий сервера, поиск хода — в пуле потоков.
+    is_bot = True
+    writer = None
+
+    def __init__(self, nickname: str, deliver: Callable[[dict], None], policy: Policy, seed: int | None = None):
+        self.nickname = nickname
+        self.codec = proto.Codec(binary=True)
+        self.policy = policy
+        self.rng = random.Random(seed)
+        self.messages_out = 0
+        self.bytes_out = 0
+        self._deliver = deliver
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._closed = False
+        self._finished = False
+        self._busy = False
+        self._penalty = 0
+        self._order: List[str] = []
+        self._discard: Counter = Counter()
+        self.ctrl = GameController(value_player=0, nickname=nickname, is_client=True, on_send=self._submit)
+        self.ctrl.state_ready = self._on_state
+
+    def send(self, msg: dict) -> bool:
+        if self._closed:
+            return True
+        self._loop = asyncio.get_running_loop()
+        self.messages_out += 1
+        self._loop.call_soon(self._receive, proto.view_for(msg, self.nickname))
+        return True
+
+    def close(self):
+        self._closed = True
+
+    def _submit(self, msg: dict):
+        # намерение бота уходит серверу так же, как от сетевого клиента, но уже после текущей рассылки
+        self._loop.call_soon(self._forward, msg)
+
+    def _forward(self, msg: dict):
+        # пока намерение ждало очереди, партия могла закончиться
+        if self._closed or (self._finished and msg["command"] in proto.INTENTS):
+            return
+        self._deliver(msg)
+
+    def _on_state(self, cmd: str):
+        if cmd in ("end_game", "error"):
+            self._finished = True
+
+    def _receive(self, msg: dict):
+        if self._closed:
+            return
+        command = msg["command"]
+        deck_size = self.ctrl.deck_size
+        try:
+            self.ctrl.handle_command(msg)
+        except Exception as e:
+            logger.error("%s: %s", self.nickname, e)
+            return
+
+        if command == "start_game":
+            self._finished = self._busy = False
+            self._penalty = 0
+            self._order = list(self.ctrl.queue)
+            self._discard = Counter([self.ctrl.top_card.base.id])
+        elif command == "step":
+            if msg.get("player") == self.nickname:
+                self._busy = False
+            else:
+                self._seen_play(self.ctrl.top_card)
+                penalty = DRAW_PENALTY.get(self.ctrl.top_card.value, 0)
+                if penalty and not self.ctrl.authoritative and self.ctrl.current == self.nickname:
+                    # в старом протоколе штрафные карты берёт сам пострадавший
+                    self._penalty = penalty
+        elif command == "take_card":
+            if self.ctrl.deck_size >= deck_size:
+                # сервер замешал сброс в колоду — всё сыгранное, кроме верхней карты, снова невидимо
+                self._discard = Counter([self.ctrl.top_card.base.id])
+            if msg.get("player") == self.nickname:
+                self._busy = False
+                if self._penalty:
+                    self._penalty -= 1
+        self._think()
+
+    def _seen_play(self, card: Card):
+        self._discard[card.base.id] += 1
+        if card.action == "reverse" and len(self._order) > 2:
+            self._order.reverse()
+
+    def _seen(self) -> Seen:
+        hand = Hand(self.ctrl.my_hands)
+        unseen = _FULL_DECK - self._discard - Counter(card.id for card in hand)
+        me = self._order.index(self.nickname)
+        order = self._order[me + 1:] + self._order[:me]
+        others = [self.ctrl.hand_counts.get(nickname, 0) for nickname in order]
+        return Seen(hand, self.ctrl.top_card, others, list(unseen.elements()), self.ctrl.deck_size)
+
+    def _think(self):
+        if self._busy or self._finished or self._closed or self.ctrl.current != self.nickname:
+            return
+        if not self.ctrl.my_hands:
+            return
+        if self._penalty or not self.ctrl.my_hands.has_playable(self.ctrl.top_card):
+            self._draw()
+            return
+        self._busy = True
+        seen = self._seen()
+        future = self._loop.run_in_executor(None, self.policy, seen, self.rng)
+        future.add_done_callback(self._on_choice)
+
+    def _draw(self):
+        # пустую колоду сервер пополнит из сброса; брать нечего, только если все карты уже на руках
+        if self.ctrl.deck_size == 0 and sum(self.ctrl.hand_counts.values()) + 1 >= sum(_FULL_DECK.values()):
+            logger.warning("%s: все карты на руках, взять нечего.", self.nickname)
+            return
+        self._busy = True
+        self.ctrl.draw_one()
+
+    def _on_choice(self, future: asyncio.Future):
+        self._busy = False
+        if self._closed or self._finished or self.ctrl.current != self.nickname:
+            return
+        try:
+            card = future.result()
+        except Exception as e:
+            logger.error("%s: ошибка выбора хода: %s", self.nickname, e)
+            card = None
+        if card is None:
+            self._draw()
+            return
+        if card.color == "black":
+            card = card.with_color(best_color(self.ctrl.my_hands))
+        self._seen_play(card)
+        self._busy = self.ctrl.authoritative
+        self.ctrl.play_card(card)
+        if not self._busy:
+            # без авторитетного сервера подтверждения не будет — после reverse/skip ход может снова быть нашим
+            self._loop.call_soon(self._think)
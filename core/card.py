@@ -1,45 +1,75 @@
 from __future__ import annotations
 
 import os
-from dataclasses import dataclass, field
 from typing import Optional
 
 from core.setting_deploy import get_resource_path
 
+CARD_COLORS = ("red", "blue", "green", "yellow")
+CARD_VALUES = tuple(str(i) for i in range(10)) + ("skip", "reverse", "draw two", "wild", "draw four")
+CARD_ACTIONS = ("skip", "reverse", "draw two", "draw four", "wild")
+WILD_VALUES = ("wild", "draw four")
+
+# id = color_idx * len(CARD_VALUES) + value_idx для цветных карт (включая wild с выбранным цветом),
+# затем чёрные wild / draw four и рубашка. Все id помещаются в один байт.
+BLACK_WILD_ID = len(CARD_COLORS) * len(CARD_VALUES)
+BLACK_DRAW_FOUR_ID = BLACK_WILD_ID + 1
+BACK_ID = BLACK_WILD_ID + 2
+CARD_COUNT = BACK_ID + 1
+
+
+def _image_path(color: str, value: str) -> str:
+    file_name = f"{value}.svg".replace(" ", "-")
+    return get_resource_path(os.path.join("assets/cards", color, file_name))
+
 
-@dataclass
 class Card:
+    __slots__ = ("id", "color", "value", "action", "image_path", "base")
+
+    id: int
     color: str
     value: str
-    action: Optional[str] = None
-    image_path: str = field(init=False, repr=False)
-
-    def __post_init__(self):
-        self.color = self.color.lower()
-        self.value = self.value.lower()
-        if self.value in ("skip", "reverse", "draw two", "draw four", "wild"):
-            self.action = self.value
-        else:
-            self.action = None
-        self.image_path = get_resource_path(self._compute_image_path())
-
-    def _compute_image_path(self) -> str:
-        base = "assets/cards"
-        file_name = f"{self.value}.svg"
-        if " " in file_name:
-            file_name = file_name.replace(" ", "-")
-        if self.color == "black":
-            return os.path.join(base, "black", file_name)
-        return os.path.join(base, self.color, file_name)
+    action: Optional[str]
+    image_path: str
+    # физическая карта колоды: у wild с выбранным цветом это чёрная карта
+    base: "Card"
+
+    def __new__(cls, color: str, value: str, action: Optional[str] = None) -> "Card":
+        try:
+            return _BY_KEY[(color.lower(), value.lower())]
+        except (KeyError, AttributeError):
+            raise ValueError(f"Неизвестная карта: {color!r} {value!r}") from None
+
+    @classmethod
+    def _make(cls, card_id: int, color: str, value: str) -> "Card":
+        card = object.__new__(cls)
+        object.__setattr__(card, "id", card_id)
+        object.__setattr__(card, "color", color)
+        object.__setattr__(card, "value", value)
+        object.__setattr__(card, "action", value if value in CARD_ACTIONS else None)
+        object.__setattr__(card, "image_path", _image_path(color, value))
+        return card
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Card is immutable")
+
+    def __reduce__(self):
+        return Card.from_id, (self.id,)
+
+    def __repr__(self) -> str:
+        return f"Card(color={self.color!r}, value={self.value!r}, action={self.action!r})"
 
     @property
     def as_dict(self) -> dict:
         return {"color": self.color, "value": self.value, "action": self.action}
 
+    def with_color(self, color: str) -> "Card":
+        return Card(color, self.value)
+
     def can_play_on(self, other: "Card | None") -> bool:  # пригодится позже
         if other is None:
             return False
-        if other.action in ["draw four", "wild"]:
+        if other.action in WILD_VALUES:
             return True
         return (
                 self.color == "black"
@@ -48,12 +78,34 @@ class Card:
         )
 
     def __hash__(self) -> int:
-        return hash((self.color, self.value, self.action))
+        return self.id
+
+    @classmethod
+    def from_id(cls, card_id: int) -> "Card":
+        return _BY_ID[card_id]
 
     @classmethod
     def from_dict(cls, data: dict) -> "Card":
-        return cls(
-            color=data.get("color"),
-            value=data.get("value"),
-            action=data.get("action"),
-        )
+        try:
+            return _BY_KEY[(data.get("color"), data.get("value"))]
+        except KeyError:
+            return cls(data.get("color"), data.get("value"))
+
+
+def _build_table() -> tuple:
+    cards = [Card._make(ci * len(CARD_VALUES) + vi, color, value)
+             for ci, color in enumerate(CARD_COLORS)
+             for vi, value in enumerate(CARD_VALUES)]
+    cards.append(Card._make(BLACK_WILD_ID, "black", "wild"))
+    cards.append(Card._make(BLACK_DRAW_FOUR_ID, "black", "draw four"))
+    cards.append(Card._make(BACK_ID, "back", "back"))
+    for card in cards:
+        base = card
+        if card.action in WILD_VALUES and card.color != "black":
+            base = cards[BLACK_WILD_ID if card.value == "wild" else BLACK_DRAW_FOUR_ID]
+        object.__setattr__(card, "base", base)
+    return tuple(cards)
+
+
+_BY_ID: tuple = _build_table()
+_BY_KEY: dict = {(c.color, c.value): c for c in _BY_ID}
@@ -0,0 +1,257 @@
+from __future__ import annotations
+
+import json
+import os
+import struct
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Dict, List, Tuple
+
+from core import protocol as proto
+from core.card import Card
+from core.game_controller import GameController
+from core.hand import Hand
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# контрольная точка партии — полное состояние стола в виде кадра start_game (колода и все руки).
+# Снимается после каждого события (это копия нескольких десятков байт), игроку, вернувшемуся после обрыва,
+# отдаётся целиком вместе со всем, что он пропустил. На диск точки пишет фоновый поток не чаще SAVE_INTERVAL:
+# временный файл, fsync, атомарная замена.
+MAGIC = b"UNOS\x01"
+HEADER = struct.Struct("!IdIH")   # номер события, время, CRC32 остатка, длина описания стола
+SAVE_INTERVAL = 0.25
+SUFFIX = ".snap"
+# столько сервер держит место за отключившимся игроком, клиент столько же пытается вернуться
+RECONNECT_GRACE = 30.0
+
+_frames = proto.FrameDecoder()
+
+
+def _ids(cards) -> bytes:
+    return bytes(card.id for card in cards)
+
+
+def _cards(ids: bytes) -> List[Dict]:
+    return [Card.from_id(i).as_dict for i in ids]
+
+
+@dataclass(frozen=True)
+class Checkpoint:
+    # снимается в потоке игры за микросекунды: только неизменяемые копии id карт, без сериализации
+    seq: int
+    queue: Tuple[str, ...]
+    current: str
+    top: int
+    deck: bytes
+    hands: Tuple[Tuple[str, bytes], ...]
+    nicknames: Tuple[str, ...]
+    authoritative: bool
+
+    @classmethod
+    def capture(cls, ctrl: GameController, seq: int) -> Checkpoint:
+        return cls(
+            seq=seq,
+            queue=tuple(ctrl.queue),
+            current=ctrl.current,
+            top=ctrl.top_card.id,
+            deck=_ids(ctrl.deck.cards),
+            hands=tuple((nickname, _ids(hand)) for nickname, hand in ctrl.hands.items()),
+            nicknames=tuple(ctrl.nicknames or ctrl.queue),
+            authoritative=ctrl.authoritative,
+        )
+
+    @classmethod
+    def from_message(cls, msg: dict, seq: int) -> Checkpoint:
+        return cls(
+            seq=seq,
+            queue=tuple(msg["queue_players"]),
+            current=msg["current_player"],
+            top=Card.from_dict(msg["top_card"]).id,
+            deck=_ids(map(Card.from_dict, msg["deck"])),
+            hands=tuple((nickname, _ids(map(Card.from_dict, cards))) for nickname, cards in msg["players"].items()),
+            nicknames=tuple(msg["nicknames"]),
+            authoritative=msg.get("authoritative", False),
+        )
+
+    def start_message(self) -> dict:
+        # тот же start_game, что и в начале партии: Peer.send сам урежет его до руки получателя
+        return {
+            "command": "start_game",
+            "authoritative": self.authoritative,
+            "value_numbers": len(self.queue),
+            "queue_players": list(self.queue),
+            "current_player": self.current,
+            "top_card": Card.from_id(self.top).as_dict,
+            "deck": _cards(self.deck),
+            "players": {nickname: _cards(ids) for nickname, ids in self.hands},
+            "nicknames": list(self.nicknames),
+        }
+
+
+def restore(ctrl: GameController, msg: dict):
+    # полный start_game → контроллер со всеми руками (серверный или наблюдатель)
+    ctrl.handle_start_game(msg)
+    ctrl.hands = {nickname: Hand(Card.from_dict(c) for c in cards) for nickname, cards in msg["players"].items()}
+    ctrl.hand_counts = {nickname: len(hand) for nickname, hand in ctrl.hands.items()}
+    # у хоста рука — та же запись, что и в ctrl.hands
+    ctrl.my_hands = ctrl.hands.get(ctrl.my_nickname, Hand())
+    ctrl.winner_player = None
+
+
+class Checkpointer:
+    # пропущенные события не пересылаются по одному: свои ходы клиент применяет сам ещё до ответа сервера,
+    # и повтор поверх старой точки снял бы карту из руки второй раз — поэтому точка всегда последняя
+    def __init__(self, ctrl: GameController, key: str, store: CheckpointStore | None = None,
+                 meta: dict | None = None):
+        self.ctrl = ctrl
+        self.key = key
+        self.store = store
+        self.meta = meta or {}
+        self.checkpoint: Checkpoint | None = None
+        self.seq = 0
+
+    def record(self, msg: dict):
+        command = msg["command"]
+        if command == "start_game":
+            self.seq = 0
+            self._take()
+        elif command == "end_game":
+            self._drop()
+        elif command in ("step", "take_card") and self.checkpoint:
+            self.seq += 1
+            self._take()
+
+    def _take(self):
+        self.checkpoint = Checkpoint.capture(self.ctrl, self.seq)
+        if self.store:
+            self.store.save(self.key, self.checkpoint, self.meta)
+
+    def _drop(self):
+        self.checkpoint = None
+        if self.store:
+            self.store.discard(self.key)
+
+    def discard(self):
+        self._drop()
+
+    def restore(self, checkpoint: Checkpoint):
+        restore(self.ctrl, checkpoint.start_message())
+        self.checkpoint = checkpoint
+        self.seq = checkpoint.seq
+
+    def catch_up(self) -> List[dict]:
+        return [self.checkpoint.start_message()] if self.checkpoint else []
+
+
+class CheckpointStore:
+    # каталог с файлом на стол; save только запоминает последнюю точку, пишет её фоновый поток —
+    # всё, что стол успел сходить за SAVE_INTERVAL, попадёт на диск одной записью
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self._pending: Dict[str, Tuple[Checkpoint, dict] | None] = {}
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._closed = False
+        self._thread = threading.Thread(target=self._writer, name="checkpoints", daemon=True)
+        self._thread.start()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def save(self, key: str, checkpoint: Checkpoint, meta: dict):
+        with self._lock:
+            self._pending[key] = (checkpoint, meta)
+        self._wake.set()
+
+    def discard(self, key: str):
+        with self._lock:
+            self._pending[key] = None
+        self._wake.set()
+
+    def _writer(self):
+        while not self._closed:
+            self._wake.wait()
+            self._wake.clear()
+            self.flush()
+            self._stop.wait(SAVE_INTERVAL)
+
+    def flush(self):
+        with self._io_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            for key, entry in pending.items():
+                try:
+                    if entry is None:
+                        self._remove(key)
+                    else:
+                        self._write(key, *entry)
+                except OSError as e:
+                    logger.error("Не удалось сохранить стол %s: %s", key, e)
+
+    def _write(self, key: str, checkpoint: Checkpoint, meta: dict):
+        path = self._path(key)
+        tmp = path + ".tmp"
+        meta_raw = json.dumps(meta, ensure_ascii=False).encode()
+        body = meta_raw + proto.encode_frame(checkpoint.start_message())
+        with open(tmp, "wb") as f:
+            f.write(MAGIC + HEADER.pack(checkpoint.seq, time.time(), zlib.crc32(body), len(meta_raw)) + body)
+            f.flush()
+            os.fsync(f.fileno())
+        # после замены в файле либо старая, либо новая точка целиком
+        os.replace(tmp, path)
+        if hasattr(os, "O_DIRECTORY"):
+            fd = os.open(self.directory, os.O_RDONLY | os.O_DIRECTORY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+
+    def _remove(self, key: str):
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def load(self) -> List[Tuple[dict, Checkpoint]]:
+        saved = []
+        for name in sorted(os.listdir(self.directory)):
+            if not name.endswith(SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                saved.append(self._read(path))
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning("Пропущен повреждённый файл стола %s: %s", path, e)
+        return saved
+
+    @staticmethod
+    def _read(path: str) -> Tuple[dict, Checkpoint]:
+        with open(path, "rb") as f:
+            raw = f.read()
+        if not raw.startswith(MAGIC) or len(raw) < len(MAGIC) + HEADER.size:
+            raise ValueError("это не файл стола")
+        seq, _, crc, meta_size = HEADER.unpack_from(raw, len(MAGIC))
+        body = memoryview(raw)[len(MAGIC) + HEADER.size:]
+        if zlib.crc32(body) != crc:
+            raise ValueError("не сходится контрольная сумма")
+        meta = json.loads(bytes(body[:meta_size]).decode())
+        messages, _ = _frames.decode(body[meta_size:])
+        if not messages:
+            raise ValueError("обрезанный кадр")
+        return meta, Checkpoint.from_message(messages[0], seq)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self.flush()
@@ -1,90 +1,289 @@
-import json
+from __future__ import annotations
+
+import asyncio
 import socket
 import threading
+import time
+from enum import Enum
+from typing import Callable, List, Tuple
+
+from core import discovery
+from core import protocol as proto
+from core.checkpoint import RECONNECT_GRACE
+from core.connection import SocketConnection
+from core.game_controller import GameController, Snapshot
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+CONNECT_TIMEOUT = 3.0
+HANDSHAKE_TIMEOUT = 3.0
+# следующий сервер с тем же кодом пробуем, если предыдущий не ответил за это время (или сразу после отказа)
+ATTEMPT_STAGGER = 0.3
+NICKNAME_TAKEN = "Никнейм уже занят!"
+# пауза между попытками вернуться за стол после обрыва
+RECONNECT_DELAY = 1.0
 
-from PyQt5.QtCore import QObject, pyqtSignal, Qt
 
-from core.game_controller import GameController
-from core.network_utils import find_server_by_port
-from logger import logger
+class JoinStage(str, Enum):
+    DISCOVER = "discover"
+    CONNECT = "connect"
+    HANDSHAKE = "handshake"
+    WAITING = "waiting"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
 
 
-class Client(QObject):
-    gui_cmd = pyqtSignal(str)
-    gui_requested = pyqtSignal(int)
+class JoinError(Exception):
+    pass
 
-    def __init__(self, session_code, nickname, join_window):
-        super().__init__()
+
+class Client:
+    # подключение идёт в своём потоке: поиск → подключение → рукопожатие → ожидание старта;
+    # о каждом шаге сообщает on_progress(stage, message), GUI при этом не блокируется
+    def __init__(self, session_code, nickname,
+                 on_state: Callable[[Snapshot], None] | None = None,
+                 on_start: Callable[[int], None] | None = None,
+                 on_progress: Callable[[JoinStage, str], None] | None = None):
         self.gui = None
-        self.join_window = join_window
+        self.on_state = on_state or self.apply_state
+        self.on_start = on_start
+        self.on_progress = on_progress
+        self.session_code = str(session_code)
         self.nickname = nickname
+        self.codec = None
+        self.conn: SocketConnection | None = None
+        self.sock: socket.socket | None = None
+        self.server_ip = None
+        self.server_port = None
+        self.stage: JoinStage | None = None
+        self._join_loop: asyncio.AbstractEventLoop | None = None
+        self._join_task: asyncio.Task | None = None
+        self._cancelled = False
+        self._closed = False
+        self.started = False
+        # ключ места от сервера: с ним можно вернуться за стол после обрыва
+        self.token = ""
 
         self.ctrl = GameController(
             value_player=0,
             nickname=nickname,
             on_send=self._send_to_srv,
-            on_close=self.close
+            on_close=self.shutdown
         )
 
-        self.gui_requested.connect(self.join_window.start_game)
-        self.ctrl.state_ready = self.gui_cmd.emit
-        self.gui_cmd.connect(self._apply_state, Qt.QueuedConnection)
+        self.ctrl.state_ready = self._notify
+
+    def join(self):
+        threading.Thread(target=self._run, daemon=True).start()
 
-        self.server_ip, self.server_port = find_server_by_port(int(session_code))
-        if not self.server_ip:
-            return self.join_window.show_error("Ошибка: сервер не найден!")
+    def cancel(self):
+        # можно звать из любого потока и на любом шаге
+        self._cancelled = True
+        loop, task = self._join_loop, self._join_task
+        if loop and task:
+            try:
+                loop.call_soon_threadsafe(task.cancel)
+            except RuntimeError:
+                pass
+        elif self.conn:
+            self.close()
+            self._progress(JoinStage.CANCELLED, "Подключение отменено.")
 
-        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    def _progress(self, stage: JoinStage, message: str):
+        self.stage = stage
+        logger.info("Подключение: %s — %s", stage.value, message)
+        if self.on_progress:
+            self.on_progress(stage, message)
+
+    def _run(self):
+        if asyncio.run(self._join()):
+            self._recv_loop()
+
+    async def _join(self) -> bool:
+        loop = asyncio.get_running_loop()
+        self._join_loop = loop
+        self._join_task = asyncio.current_task()
         try:
-            self.sock.connect((self.server_ip, self.server_port))
-            self.join_window.show_status("Подключение установлено...")
-        except Exception:
-            return self.join_window.show_error("Ошибка подключения к серверу!")
+            if self._cancelled:
+                raise asyncio.CancelledError
+            self._progress(JoinStage.DISCOVER, "Поиск сервера...")
+            sessions = await loop.run_in_executor(None, discovery.find_sessions, self.session_code)
+            if not sessions:
+                raise JoinError("Ошибка: сервер не найден!")
+            self._progress(JoinStage.CONNECT, "Подключение...")
+            conn, version, session, token = await self._race(sessions)
+        except asyncio.CancelledError:
+            self._progress(JoinStage.CANCELLED, "Подключение отменено.")
+            return False
+        except JoinError as e:
+            self._progress(JoinStage.FAILED, str(e))
+            return False
+        finally:
+            self._join_task = None
 
-        self.send_message(nickname)
-        resp = self.sock.recv(1024).decode("utf-8")
-        if resp == "INVALID_NICKNAME":
-            return self.join_window.show_error("Никнейм уже занят!")
+        self.conn, self.sock = conn, conn.sock
+        self.server_ip, self.server_port = session
+        self.token = token
+        self.codec = proto.Codec(binary=version >= proto.PROTOCOL_VERSION)
+        if self._cancelled:
+            self.close()
+            self._progress(JoinStage.CANCELLED, "Подключение отменено.")
+            return False
+        self._progress(JoinStage.WAITING, "Вы успешно подключились! Ожидайте начала игры.")
+        return True
 
-        self.join_window.show_success("Вы успешно подключились! Ожидайте начала игры.")
+    async def _race(self, sessions: List[Tuple[str, int]], resume: bool = False):
+        # попытки к нескольким серверам с одним кодом стартуют с небольшим сдвигом, выигрывает первая удачная
+        waiting = list(sessions)
+        running: set[asyncio.Task] = set()
+        errors: List[JoinError] = []
+        try:
+            while waiting or running:
+                if waiting:
+                    running.add(asyncio.create_task(self._attempt(waiting.pop(0), resume)))
+                done, running = await asyncio.wait(running, timeout=ATTEMPT_STAGGER if waiting else None,
+                                                   return_when=asyncio.FIRST_COMPLETED)
+                winner = None
+                for task in done:
+                    if task.exception() is not None:
+                        errors.append(task.exception())
+                    elif winner is None:
+                        winner = task.result()
+                    else:
+                        task.result()[0].close()
+                if winner:
+                    return winner
+        finally:
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+        # отказ по нику понятнее пользователю, чем сетевая ошибка соседнего сервера
+        raise next((e for e in errors if str(e) == NICKNAME_TAKEN), errors[-1])
 
-        threading.Thread(target=self._recv_loop, daemon=True).start()
+    async def _attempt(self, session: Tuple[str, int], resume: bool = False):
+        loop = asyncio.get_running_loop()
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        try:
+            try:
+                await asyncio.wait_for(loop.sock_connect(sock, session), CONNECT_TIMEOUT)
+            except (OSError, asyncio.TimeoutError):
+                discovery.forget(self.session_code, session)
+                raise JoinError("Ошибка подключения к серверу!")
+
+            if not resume:
+                self._progress(JoinStage.HANDSHAKE, "Подключение установлено...")
+            conn = SocketConnection(sock)
+            try:
+                await loop.sock_sendall(sock, proto.hello(self.nickname, self.session_code,
+                                                          self.token if resume else None))
+                raw = bytes(await asyncio.wait_for(conn.peek_async(), HANDSHAKE_TIMEOUT))
+            except (OSError, asyncio.TimeoutError):
+                raise JoinError("Сервер не ответил на приветствие!")
+            accepted, version, token, pending = proto.parse_welcome(raw)
+            if not accepted:
+                raise JoinError(NICKNAME_TAKEN)
+            # всё, что пришло в том же пакете после приветствия, остаётся в буфере до цикла приёма
+            conn.consume(len(raw) - len(pending))
+            sock.setblocking(True)
+            return conn, version, session, token
+        except BaseException:
+            sock.close()
+            raise
 
     def send_message(self, msg: str):
-        self.sock.send(msg.encode("utf-8"))
+        self.conn.send(msg.encode("utf-8"))
 
     def _recv_loop(self):
         while True:
             try:
-                raw = self.sock.recv(8192)
-                if not raw:
-                    self.ctrl.handle_error()
+                messages = self.conn.receive(self.codec)
+            except proto.ProtocolError as e:
+                logger.error("Ошибка протокола: %s", e)
+                self.ctrl.handle_error()
+                break
+            except OSError:
+                messages = []
+            if not messages:
+                if self._cancelled or self._closed:
                     break
-            except ConnectionResetError:
-
+                if self.started and not self.ctrl.winner_player and self._reconnect():
+                    continue
                 self.ctrl.handle_error()
                 break
 
+            for data in messages:
+                logger.debug("Команда %s", data)
+                players = self.ctrl.handle_command(data)
+                if not players:
+                    continue
+                if not self.started:
+                    # первый start_game открывает окно игры; повторный после переподключения — только сверка состояния
+                    self.started = True
+                    if self.on_start:
+                        self.on_start(players)
+                # срез уходит после on_start: мост Qt применит его уже к созданному окну
+                self._notify("start_game")
+
+    def _reconnect(self) -> bool:
+        # обрыв посреди партии: сервер держит место RECONNECT_GRACE секунд и после возврата
+        # пришлёт состояние стола со всем, что мы пропустили
+        self.close()
+        if not self.token:
+            # старый сервер ключей не выдаёт и места не держит
+            return False
+        logger.warning("Соединение с сервером потеряно, пытаемся вернуться за стол...")
+        deadline = time.monotonic() + RECONNECT_GRACE
+        while time.monotonic() < deadline and not self._closed:
             try:
-                data = json.loads(raw.decode("utf-8"))
-                logger.info(f"Команда {data}")
-            except Exception:
+                conn, version, _, _ = asyncio.run(self._race([(self.server_ip, self.server_port)], resume=True))
+            except JoinError as e:
+                if str(e) == NICKNAME_TAKEN:
+                    # место уже не наше: партия закончилась или прервана
+                    logger.warning("Сервер не вернул место за столом.")
+                    return False
+                time.sleep(RECONNECT_DELAY)
                 continue
+            self.conn, self.sock = conn, conn.sock
+            self.codec = proto.Codec(binary=version >= proto.PROTOCOL_VERSION)
+            logger.info("Соединение восстановлено.")
+            return True
+        return False
 
-            players = self.ctrl.handle_command(data)
-            if players:
-                self.gui_requested.emit(players)
+    def _send_to_srv(self, msg: dict):
+        try:
+            self.conn.send(self.codec.encode(msg))
+        except OSError as e:
+            # пока идёт переподключение, ход теряется — после сверки состояния его можно повторить
+            logger.warning("Не удалось отправить ход: %s", e)
 
-    def _send_to_srv(self, raw: bytes):
-        self.sock.sendall(raw)
+    def shutdown(self):
+        # выход из игры: соединение закрывается без попыток вернуться
+        self._closed = True
+        self.close()
 
     def close(self):
+        if not self.sock:
+            return
         try:
-            self.sock.close()
+            # shutdown будит поток, который висит в recv_into; один close этого не делает
+            self.sock.shutdown(socket.SHUT_RDWR)
         except OSError:
-            logger.error("Error on close sock", OSError)
+            pass
+        try:
+            self.sock.close()
+        except OSError as e:
+            logger.error("Ошибка при закрытии сокета: %s", e)
+
+    def _notify(self, cmd: str):
+        # срез снимается в сетевом потоке сразу после команды, дальше его можно читать откуда угодно
+        self.on_state(self.ctrl.snapshot(cmd))
+
+    def apply_state(self, snapshot: Snapshot):
+        self.apply_states([snapshot])
 
-    def _apply_state(self, cmd: str):
+    def apply_states(self, snapshots: list[Snapshot], resync: bool = False):
         if not self.gui:
             return
-        self.gui.apply_state(cmd)
+        self.gui.apply_states(snapshots, resync)
@@ -0,0 +1,225 @@
+from __future__ import annotations
+
+import asyncio
+import socket
+from typing import Awaitable, Callable, Dict, List
+
+from core import protocol as proto
+
+RECV_BUFFER_SIZE = 64 * 1024
+# меньше этого свободного хвоста recv_into не отдаём — сначала сдвигаем недочитанный кадр в начало
+MIN_RECV = 4096
+MAX_BUFFER_SIZE = proto.HEADER.size + proto.MAX_FRAME
+
+
+class RecvBuffer:
+    # один переиспользуемый буфер на соединение: recv_into пишет в свободный хвост, кадры разбираются
+    # прямо из заполненной части, а копируется только хвост недочитанного кадра при сдвиге
+    __slots__ = ("_buf", "_view", "start", "end")
+
+    def __init__(self, size: int = RECV_BUFFER_SIZE):
+        self._buf = bytearray(size)
+        self._view = memoryview(self._buf)
+        self.start = 0
+        self.end = 0
+
+    def __len__(self) -> int:
+        return self.end - self.start
+
+    @property
+    def capacity(self) -> int:
+        return len(self._buf)
+
+    def data(self) -> memoryview:
+        return self._view[self.start:self.end]
+
+    def consume(self, size: int):
+        self.start += size
+        if self.start >= self.end:
+            self.start = self.end = 0
+
+    def free(self) -> memoryview:
+        if len(self._buf) - self.end < MIN_RECV:
+            self._make_room()
+        return self._view[self.end:]
+
+    def commit(self, size: int):
+        self.end += size
+
+    def decode(self, codec: proto.Codec) -> List[Dict]:
+        messages, used = codec.decode(self.data())
+        self.consume(used)
+        return messages
+
+    def _make_room(self):
+        pending = self.end - self.start
+        if self.start:
+            self._view[:pending] = self._view[self.start:self.end]
+            self.start, self.end = 0, pending
+        if len(self._buf) - self.end >= MIN_RECV:
+            return
+        # буфер занят одним большим кадром — заводим вдвое больший
+        if len(self._buf) >= MAX_BUFFER_SIZE:
+            raise proto.ProtocolError("Переполнен буфер приёма")
+        buf = bytearray(min(len(self._buf) * 2, MAX_BUFFER_SIZE))
+        buf[:pending] = self._view[:pending]
+        self._buf = buf
+        self._view = memoryview(buf)
+
+
+class StreamConnection(asyncio.BufferedProtocol):
+    # серверная сторона: цикл событий читает сокет прямо в RecvBuffer через get_buffer/buffer_updated.
+    # Для Peer выглядит как StreamWriter: write, drain, close, get_extra_info.
+    def __init__(self, handler: Callable[[StreamConnection], Awaitable[None]]):
+        self.buffer = RecvBuffer()
+        self.transport: asyncio.Transport | None = None
+        self._handler = handler
+        self._waiter: asyncio.Future | None = None
+        self._drain_waiter: asyncio.Future | None = None
+        self._reading_paused = False
+        self._eof = False
+
+    # ---------- asyncio.BufferedProtocol ----------
+
+    def connection_made(self, transport: asyncio.Transport):
+        self.transport = transport
+        asyncio.get_running_loop().create_task(self._handler(self))
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        return self.buffer.free()
+
+    def buffer_updated(self, nbytes: int):
+        self.buffer.commit(nbytes)
+        if len(self.buffer) >= self.buffer.capacity // 2 and not self._reading_paused:
+            # обработчик не успевает — пусть данные подождут в ядре
+            self._reading_paused = True
+            self.transport.pause_reading()
+        self._wake()
+
+    def eof_received(self):
+        self._eof = True
+        self._wake()
+        return False
+
+    def connection_lost(self, exc: Exception | None):
+        self._eof = True
+        self._wake()
+        self.resume_writing()
+
+    def pause_writing(self):
+        if self._drain_waiter is None or self._drain_waiter.done():
+            self._drain_waiter = asyncio.get_running_loop().create_future()
+
+    def resume_writing(self):
+        if self._drain_waiter and not self._drain_waiter.done():
+            self._drain_waiter.set_result(None)
+
+    # ---------- чтение ----------
+
+    def _wake(self):
+        if self._waiter and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def _wait(self):
+        self._waiter = asyncio.get_running_loop().create_future()
+        try:
+            await self._waiter
+        finally:
+            self._waiter = None
+
+    def _resume_reading(self):
+        # вызывается после разбора: в буфере остался только недочитанный кадр, и ему нужны новые байты
+        if self._reading_paused:
+            self._reading_paused = False
+            self.transport.resume_reading()
+
+    async def peek(self) -> memoryview:
+        # рукопожатие идёт до выбора формата: отдаём всё, что пришло, без разбора на кадры
+        while not len(self.buffer) and not self._eof:
+            await self._wait()
+        return self.buffer.data()
+
+    def consume(self, size: int):
+        self.buffer.consume(size)
+        self._resume_reading()
+
+    async def receive(self, codec: proto.Codec) -> List[Dict]:
+        # хотя бы одно целое сообщение; пустой список — соединение закрыто
+        while True:
+            messages = self.buffer.decode(codec) if len(self.buffer) else []
+            self._resume_reading()
+            if messages:
+                return messages
+            if self._eof:
+                return []
+            await self._wait()
+
+    # ---------- запись ----------
+
+    def write(self, data: bytes):
+        self.transport.write(data)
+
+    async def drain(self):
+        if self.transport.is_closing():
+            raise ConnectionResetError("Соединение закрыто")
+        if self._drain_waiter is not None:
+            await self._drain_waiter
+            if self.transport.is_closing():
+                raise ConnectionResetError("Соединение закрыто")
+
+    def close(self):
+        if self.transport:
+            self.transport.close()
+
+    def get_extra_info(self, name: str, default=None):
+        return self.transport.get_extra_info(name, default)
+
+
+async def start_server(handler: Callable[[StreamConnection], Awaitable[None]], host=None, port=None, **kwargs):
+    loop = asyncio.get_running_loop()
+    return await loop.create_server(lambda: StreamConnection(handler), host, port, **kwargs)
+
+
+class SocketConnection:
+    # клиентская сторона: блокирующий сокет в своём потоке, recv_into в тот же RecvBuffer
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.buffer = RecvBuffer()
+
+    def _fill(self) -> bool:
+        size = self.sock.recv_into(self.buffer.free())
+        if not size:
+            return False
+        self.buffer.commit(size)
+        return True
+
+    def peek(self) -> memoryview:
+        if not len(self.buffer):
+            self._fill()
+        return self.buffer.data()
+
+    async def peek_async(self) -> memoryview:
+        # то же на неблокирующем сокете в цикле событий — так рукопожатие можно прервать и ограничить по времени
+        loop = asyncio.get_running_loop()
+        if not len(self.buffer):
+            size = await loop.sock_recv_into(self.sock, self.buffer.free())
+            self.buffer.commit(size)
+        return self.buffer.data()
+
+    def consume(self, size: int):
+        self.buffer.consume(size)
+
+    def receive(self, codec: proto.Codec) -> List[Dict]:
+        while True:
+            if len(self.buffer):
+                messages = self.buffer.decode(codec)
+                if messages:
+                    return messages
+            if not self._fill():
+                return []
+
+    def send(self, data: bytes):
+        self.sock.sendall(data)
+
+    def close(self):
+        self.sock.close()
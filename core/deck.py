@@ -1,8 +1,11 @@
 import random
-from typing import List
+from array import array
+from typing import Iterable, List
 
-from core.card import Card
-from logger import logger
+from core.card import Card, CARD_COUNT
+from logger import get_logger
+
+logger = get_logger(__name__)
 
 COLORS = ["red", "blue", "green", "yellow"]
 NUMBERS = [str(i) for i in range(10)]
@@ -10,52 +13,145 @@ ACTIONS_COLOR = ["skip", "reverse", "draw two"]
 ACTIONS_WILD = ["wild", "draw four"]
 
 
-class Deck:
+def build_ids() -> List[int]:
+    ids: List[int] = []
 
-    def __init__(self) -> None:
-        self.cards: List[Card] = self._build()
+    for col in COLORS:
+        ids.append(Card(col, "0").id)
+        for num in NUMBERS[1:]:
+            ids.extend([Card(col, num).id] * 2)
+
+        for act in ACTIONS_COLOR:
+            ids.extend([Card(col, act).id] * 2)
+
+    for _ in range(4):
+        ids.append(Card("black", "wild").id)
+        ids.append(Card("black", "draw four").id)
+
+    return ids
 
-    def _build(self) -> List[Card]:
-        deck: List[Card] = []
 
-        for col in COLORS:
-            deck.append(Card(col, "0"))
-            for num in NUMBERS[1:]:
-                deck.extend([Card(col, num)] * 2)
+START_IDS = frozenset(Card(col, num).id for col in COLORS for num in NUMBERS)
+
+
+class _CardsView:
+    # список-подобный вид на колоду: поддерживает len/итерацию/индексацию и random.shuffle
+    __slots__ = ("_deck",)
+
+    def __init__(self, deck: "Deck") -> None:
+        self._deck = deck
+
+    def __len__(self) -> int:
+        return len(self._deck._ids)
 
-            for act in ACTIONS_COLOR:
-                deck.extend([Card(col, act, act)] * 2)
+    def __iter__(self):
+        return map(Card.from_id, self._deck._ids)
 
-        for _ in range(4):
-            deck.append(Card("black", "wild", "wild"))
-            deck.append(Card("black", "draw four", "draw four"))
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [Card.from_id(i) for i in self._deck._ids[idx]]
+        return Card.from_id(self._deck._ids[idx])
 
-        random.shuffle(deck)
-        return deck
+    def __setitem__(self, idx: int, card: Card) -> None:
+        self._deck._set(idx, card.id)
+
+    def __eq__(self, other) -> bool:
+        return list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+
+class Deck:
+
+    def __init__(self) -> None:
+        self._ids = array("B")
+        self._where: List[List[int]] = [[] for _ in range(CARD_COUNT)]
+        self._load(build_ids())
+        self.shuffle()
+
+    @property
+    def cards(self) -> _CardsView:
+        return _CardsView(self)
+
+    @cards.setter
+    def cards(self, cards: Iterable[Card]) -> None:
+        self._load(c.id for c in cards)
+
+    @property
+    def ids(self) -> array:
+        return self._ids
+
+    def _load(self, ids: Iterable[int]) -> None:
+        self._ids = array("B", ids)
+        self._reindex()
+
+    def _reindex(self) -> None:
+        self._where = [[] for _ in range(CARD_COUNT)]
+        for pos, cid in enumerate(self._ids):
+            self._where[cid].append(pos)
+
+    def _set(self, pos: int, cid: int) -> None:
+        pos %= len(self._ids)
+        old = self._ids[pos]
+        if old == cid:
+            return
+        self._where[old].remove(pos)
+        self._where[cid].append(pos)
+        self._ids[pos] = cid
+
+    def _take(self, pos: int) -> int:
+        # O(1): на место pos переносится верхняя карта колоды
+        last = len(self._ids) - 1
+        cid = self._ids[pos]
+        self._where[cid].remove(pos)
+        if pos != last:
+            top = self._ids[last]
+            self._where[top].remove(last)
+            self._where[top].append(pos)
+            self._ids[pos] = top
+        self._ids.pop()
+        return cid
 
     def draw_card(self) -> Card:
-        card = self.cards.pop()
-        logger.info(f"Карта из колоды {card}")
-        logger.info(f"Колво карт в колоде {len(self.cards)}")
+        card = Card.from_id(self._take(len(self._ids) - 1))
+        logger.debug("Карта из колоды %s, осталось %d", card, len(self._ids))
         return card
 
     def pop_card(self, card: Card):
-        for idx, c in enumerate(self.cards):
-            if (c.color, c.value, c.action) == (card.color, card.value, card.action):
-                return self.cards.pop(idx)
-        logger.error(f"Не удалось найти карту в колоде: {card}")
+        cid = card.base.id
+        if self._ids and self._ids[-1] == cid:
+            return Card.from_id(self._take(len(self._ids) - 1))
+        if self._where[cid]:
+            return Card.from_id(self._take(self._where[cid][-1]))
+        logger.error("Не удалось найти карту в колоде: %s", card)
+
+    def count(self, card: Card) -> int:
+        return len(self._where[card.base.id])
+
+    def __contains__(self, card: Card) -> bool:
+        return bool(self._where[card.base.id])
 
     def shuffle(self):
-        random.shuffle(self.cards)
+        random.shuffle(self._ids)
+        self._reindex()
+
+    def refill(self, cards: Iterable[Card]) -> None:
+        # сброс возвращается в колоду и перемешивается на месте
+        for card in cards:
+            cid = card.base.id
+            self._where[cid].append(len(self._ids))
+            self._ids.append(cid)
+        self.shuffle()
 
     def deal_cards(self, nicknames: list[str], hand_size: int = 7) -> dict[str, list[Card]]:
         return {nickname: [self.draw_card() for _ in range(hand_size)] for nickname in nicknames}
 
     def pick_start_card(self) -> Card:
-        for idx, c in enumerate(self.cards):
-            if c.color != "black" and c.value.isdigit():
-                return self.cards.pop(idx)
+        for pos in range(len(self._ids) - 1, -1, -1):
+            if self._ids[pos] in START_IDS:
+                return Card.from_id(self._take(pos))
         return self.draw_card()
 
     def __len__(self) -> int:
-        return len(self.cards)
+        return len(self._ids)
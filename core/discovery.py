@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import asyncio
+import socket
+import struct
+import sys
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from core.network_utils import find_server_by_port, local_addresses
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# клиент сам спрашивает «кто здесь?», серверы отвечают сразу — не нужно ждать очередного анонса
+MULTICAST_GROUP = "239.255.42.99"
+DISCOVERY_PORT = 60321   # вне диапазона кодов столов, на которых слушают старые клиенты
+MULTICAST_TTL = 1
+QUERY = b"UNO?"
+REPLY = b"UNO!"
+QUERY_INTERVAL = 0.15
+DISCOVERY_TIMEOUT = 1.0
+# сколько ещё ждать ответов других серверов с тем же кодом после первого
+SETTLE = 0.05
+CACHE_TTL = 10.0
+# старые серверы не отвечают на запросы — после опроса ещё слушаем их анонсы
+LEGACY_TIMEOUT = 6
+
+Session = Tuple[str, int]
+
+_cache: Dict[str, Tuple[List[Session], float]] = {}
+_cache_lock = threading.Lock()
+
+
+def _interfaces() -> List[bytes]:
+    # значения для IP_MULTICAST_IF / IP_ADD_MEMBERSHIP: адреса интерфейсов, а в Linux ещё и индексы (ip_mreqn),
+    # чтобы запрос уходил во все сети даже без маршрута по умолчанию
+    options = [socket.inet_aton(addr) for addr in local_addresses()]
+    if sys.platform.startswith("linux"):
+        options += [struct.pack("=4s4si", bytes(4), bytes(4), index) for index, _ in socket.if_nameindex()]
+    return options
+
+
+def _membership(interface: bytes) -> bytes:
+    group = socket.inet_aton(MULTICAST_GROUP)
+    if len(interface) == 4:
+        return group + interface
+    return group + interface[4:]
+
+
+# ---------- сервер ----------
+
+class DiscoveryResponder(asyncio.DatagramProtocol):
+    def __init__(self, sessions: Callable[[], Iterable[Session]]):
+        self.sessions = sessions
+        self.transport: asyncio.DatagramTransport | None = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data: bytes, addr):
+        if not data.startswith(QUERY):
+            return
+        wanted = data[len(QUERY):].decode("ascii", "ignore")
+        for code, port in self.sessions():
+            if not wanted or wanted == code:
+                # адрес сервера клиент берёт из источника ответа — свой IP узнавать не нужно
+                self.transport.sendto(REPLY + f"{code}:{port}".encode("ascii"), addr)
+
+    def error_received(self, exc):
+        logger.error("Ошибка обнаружения: %s", exc)
+
+
+def _responder_socket() -> socket.socket:
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, "SO_REUSEPORT"):
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+    sock.bind(("", DISCOVERY_PORT))
+    joined = 0
+    for interface in _interfaces():
+        try:
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, _membership(interface))
+            joined += 1
+        except OSError:
+            pass
+    if not joined:
+        logger.warning("Не удалось войти в multicast-группу — отвечаем только на локальные запросы.")
+    sock.setblocking(False)
+    return sock
+
+
+async def serve_discovery(sessions: Callable[[], Iterable[Session]]) -> asyncio.DatagramTransport | None:
+    try:
+        sock = _responder_socket()
+    except OSError as e:
+        logger.error("Не удалось открыть порт обнаружения %s: %s", DISCOVERY_PORT, e)
+        return None
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(lambda: DiscoveryResponder(sessions), sock=sock)
+    return transport
+
+
+# ---------- клиент ----------
+
+def _send_query(udp: socket.socket, query: bytes, interfaces: List[bytes]):
+    for interface in interfaces:
+        try:
+            udp.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_IF, interface)
+            udp.sendto(query, (MULTICAST_GROUP, DISCOVERY_PORT))
+        except OSError:
+            pass
+    # сервер на этой же машине отвечает и без multicast
+    try:
+        udp.sendto(query, ("127.0.0.1", DISCOVERY_PORT))
+    except OSError:
+        pass
+
+
+def _remember(code: str, sessions: List[Session]):
+    with _cache_lock:
+        _cache[code] = (sessions, time.monotonic() + CACHE_TTL)
+
+
+def cached(code: str) -> List[Session]:
+    with _cache_lock:
+        entry = _cache.get(code)
+        if entry and entry[1] > time.monotonic():
+            return list(entry[0])
+        _cache.pop(code, None)
+    return []
+
+
+def forget(code: str, session: Session | None = None):
+    # сервер из кэша не ответил на подключение — в следующий раз спросим заново
+    with _cache_lock:
+        entry = _cache.get(code)
+        if entry and session is not None and session in entry[0] and len(entry[0]) > 1:
+            entry[0].remove(session)
+        else:
+            _cache.pop(code, None)
+
+
+def discover(code: str | None = None, timeout: float = DISCOVERY_TIMEOUT,
+             settle: float = SETTLE) -> Dict[str, List[Session]]:
+    # опрашивает сеть; без кода собирает всё за timeout, с кодом ждёт после первого ответа ещё settle —
+    # одинаковый код может быть у нескольких серверов, а один сервер может ответить с разных адресов
+    found: Dict[str, List[Session]] = {}
+    query = QUERY + (code or "").encode("ascii")
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as udp:
+        udp.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, MULTICAST_TTL)
+        udp.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_LOOP, 1)
+        udp.bind(("", 0))
+        interfaces = _interfaces()
+        deadline = time.monotonic() + timeout
+        next_query = 0.0
+        while True:
+            now = time.monotonic()
+            if now >= deadline:
+                break
+            if now >= next_query:
+                _send_query(udp, query, interfaces)
+                next_query = now + QUERY_INTERVAL
+            udp.settimeout(max(0.001, min(deadline, next_query) - now))
+            try:
+                data, addr = udp.recvfrom(1024)
+            except socket.timeout:
+                continue
+            except OSError as e:
+                logger.error("Ошибка обнаружения: %s", e)
+                break
+            if not data.startswith(REPLY):
+                continue
+            try:
+                session_code, port = data[len(REPLY):].decode("ascii").split(":")
+                session = (addr[0], int(port))
+            except ValueError:
+                continue
+            sessions = found.setdefault(session_code, [])
+            if session not in sessions:
+                sessions.append(session)
+            if code and session_code == code and len(sessions) == 1:
+                deadline = min(deadline, time.monotonic() + settle)
+    for session_code, sessions in found.items():
+        _remember(session_code, sessions)
+    return found
+
+
+def find_sessions(code: str, timeout: float = DISCOVERY_TIMEOUT) -> List[Session]:
+    sessions = cached(code) or discover(code, timeout).get(code, [])
+    if sessions:
+        return sessions
+    logger.info("Сервер %s не ответил на запрос, ждём анонса старого формата.", code)
+    ip, port = find_server_by_port(int(code), LEGACY_TIMEOUT)
+    if not ip:
+        return []
+    _remember(code, [(ip, port)])
+    return [(ip, port)]
+
+
+def find_session(code: str, timeout: float = DISCOVERY_TIMEOUT) -> Tuple[str | None, int | None]:
+    sessions = find_sessions(code, timeout)
+    return sessions[0] if sessions else (None, None)
@@ -1,13 +1,46 @@
 from __future__ import annotations
 
-from typing import Callable
+from collections import Counter
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Callable, Mapping, Tuple
 
-from core.deck import Deck
+from core.deck import Deck, build_ids
 from core.card import Card
+from core.hand import Hand
 from core import protocol as proto
+from core import rules
 import random
 
-from logger import logger
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+_FULL_DECK = Counter(build_ids())
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    # неизменяемый срез состояния после команды: GUI читает его в своём потоке, пока сеть меняет контроллер
+    command: str
+    my_nickname: str | None
+    queue: Tuple[str, ...]
+    current: str | None
+    top_card: Card | None
+    my_hand: Tuple[Card, ...]
+    hand_counts: Mapping[str, int]
+    deck_size: int
+    value_player: int
+    authoritative: bool
+    step_player: str | None
+    player_take_card: str | None
+    taken_card: Card | None
+    winner_player: str | None
+    exit_nickname: str | None
+
+    @property
+    def is_my_step(self) -> bool:
+        return self.current == self.my_nickname
 
 
 class GameController:
@@ -15,22 +48,32 @@ class GameController:
                  value_player: int,
                  nickname: str,
                  is_client: bool = True,
-                 on_send: Callable[[bytes], None] | None = None,
-                 on_close: Callable[[], None] | None = None):
+                 on_send: Callable[[dict], None] | None = None,
+                 on_close: Callable[[], None] | None = None,
+                 on_send_to: Callable[[str, dict], None] | None = None):
         self.exit_nickname = None
         self._send = on_send
+        # адресное сообщение одному игроку, мимо общей рассылки (и журнала)
+        self._send_to = on_send_to
         self._close_net = on_close
         self.state_ready: Callable[[str], None] | None = None
+        # хост: ходы из потока GUI переносятся в цикл событий, где идёт и обработка сообщений клиентов
+        self.run_in_loop: Callable[..., None] | None = None
         self.player_take_card = None
+        self.taken_card: Card | None = None
         self.winner_player = None
         self.step_player = None
         self.nicknames = None
         self.my_nickname = nickname
         self.is_client = is_client
-        self.my_hands = {}
+        # сервер сам проверяет ходы и считает их последствия; клиенты шлют только намерения
+        self.authoritative = False
+        self.my_hands = Hand()
         self.is_my_step = False
         self.deck = Deck()
-        self.hands = {}
+        self.hands: dict[str, Hand] = {}
+        self.hand_counts: dict[str, int] = {}
+        self._deck_size = 0
         self.queue = []
         self.top_card = self.deck.pick_start_card()
         self.current = ""
@@ -38,6 +81,30 @@ class GameController:
         if not self.is_client:
             self.value_player += 1
 
+    @property
+    def deck_size(self) -> int:
+        # у клиента в delta-режиме колоды нет, известен только её размер
+        return len(self.deck) if self.deck is not None else self._deck_size
+
+    def snapshot(self, command: str) -> Snapshot:
+        return Snapshot(
+            command=command,
+            my_nickname=self.my_nickname,
+            queue=tuple(self.queue or ()),
+            current=self.current,
+            top_card=self.top_card,
+            my_hand=tuple(self.my_hands),
+            hand_counts=MappingProxyType(dict(self.hand_counts)),
+            deck_size=self.deck_size,
+            value_player=self.value_player,
+            authoritative=self.authoritative,
+            step_player=self.step_player,
+            player_take_card=self.player_take_card,
+            taken_card=self.taken_card,
+            winner_player=self.winner_player,
+            exit_nickname=self.exit_nickname,
+        )
+
     def _dispatch(self, cmd: str) -> None:
         if self.state_ready:
             self.state_ready(cmd)
@@ -45,7 +112,8 @@ class GameController:
     def new_game(self, nicknames):
         random.shuffle(self.deck.cards)
         self.nicknames = nicknames
-        self.hands = self.deck.deal_cards(nicknames)
+        self.hands = {nickname: Hand(cards) for nickname, cards in self.deck.deal_cards(nicknames).items()}
+        self.hand_counts = {nickname: len(hand) for nickname, hand in self.hands.items()}
 
         self.queue = nicknames[:]
         random.shuffle(self.queue)
@@ -56,23 +124,43 @@ class GameController:
             queue=self.queue,
             hands=self.hands,
             deck=self.deck.cards,
-            nicknames=self.nicknames
+            nicknames=self.nicknames,
+            authoritative=self.authoritative
         )
 
-        self.my_hands = {
-            nickname: [Card.from_dict(c) for c in cards]
-            for nickname, cards in msg.get("players", {}).items()
-        }.get(self.my_nickname, [])
+        # у хоста рука — та же запись, что и в self.hands
+        self.my_hands = self.hands.get(self.my_nickname, Hand())
 
         if self._send:
-            self._send(proto.dumps(msg))
+            self._send(msg)
 
         self._dispatch("start_game")
 
     def play_card(self, card: Card):
-        if card in self.my_hands:
-            self.my_hands.remove(card)
+        if self.run_in_loop:
+            self.run_in_loop(self._play_card, card)
+            return
+        self._play_card(card)
+
+    def _play_card(self, card: Card):
+        if self.authoritative:
+            if not self.is_client:
+                self._apply_play(self.my_nickname, card)
+                return
+            if card.base in self.my_hands:
+                self.my_hands.remove(card.base)
+            self.top_card = card
+            self._count_card(self.my_nickname, -1)
+            # следующего игрока назовёт сервер
+            self.current = None
+            if self._send:
+                self._send(proto.play(self.my_nickname, card))
+            return
+
+        if card.base in self.my_hands:
+            self.my_hands.remove(card.base)
         self.top_card = card
+        self._count_card(self.my_nickname, -1)
 
         if card.action == "reverse":
             if len(self.queue) == 2:
@@ -87,22 +175,126 @@ class GameController:
             self.current = self._next_player()
 
         if self._send:
-            self._send(proto.dumps(proto.step(self.my_nickname, card, self.current)))
+            self._send(proto.step(self.my_nickname, card, self.current))
+        if not self.is_client:
+            self._dispatch("turn")
         if len(self.my_hands) == 0:
             self.win()
 
+    def _apply_play(self, player: str, card: Card) -> bool:
+        hand = self.hands.get(player) if self.hands else None
+        error = rules.check_play(player, card, self.current, self.top_card, hand)
+        if error:
+            self._reject(player, error)
+            return False
+
+        hand.remove(card.base)
+        self._count_card(player, -1)
+        turn = rules.resolve(self.queue, player, card)
+        self.queue = turn.queue
+        self.top_card = card
+        self.current = turn.next_player
+        self.is_my_step = self.my_nickname == self.current
+        self.step_player = player
+        if self._send:
+            self._send(proto.step(player, card, self.current))
+        self._dispatch("turn" if player == self.my_nickname else "step" if not card.action else card.action)
+
+        for _ in range(turn.penalty):
+            if not self._deal(turn.victim):
+                break
+
+        if not hand:
+            if self._send:
+                self._send(proto.end_game(player))
+            self.end_game(proto.end_game(player))
+        return True
+
+    def _reject(self, player: str | None, error: str):
+        logger.warning("Ход %s отклонён: %s", player, error)
+        # клиент уже убрал карту из руки и ждёт ответа сервера — возвращаем ему состояние стола
+        if player == self.my_nickname:
+            self._dispatch("start_game")
+        elif player and self._send_to:
+            self._send_to(player, self.state_message())
+
+    def state_message(self) -> dict:
+        # полный start_game с текущим ходом; Peer.send урежет его до руки получателя
+        msg = proto.start_game(
+            top=self.top_card,
+            queue=self.queue,
+            hands=self.hands,
+            deck=self.deck.cards,
+            nicknames=self.nicknames or self.queue,
+            authoritative=self.authoritative
+        )
+        msg["current_player"] = self.current
+        return msg
+
+    def _refill_deck(self):
+        # колода кончилась — сброс (всё, чего нет ни в колоде, ни на руках, ни наверху) замешивается обратно.
+        # Нужны все руки: это сервер или наблюдатель журнала; клиенты узнают новый размер колоды из take_card
+        if self.deck is None or len(self.deck) or not self.hands:
+            return
+        used = Counter(card.id for hand in self.hands.values() for card in hand)
+        used[self.top_card.base.id] += 1
+        pile = _FULL_DECK - used
+        if pile:
+            self.deck.refill(map(Card.from_id, pile.elements()))
+            logger.info("Колода закончилась — сброс замешан обратно, карт в колоде: %d", len(self.deck))
+
+    def _deal(self, player: str) -> Card | None:
+        self._refill_deck()
+        if len(self.deck) == 0:
+            return None
+        card = self.deck.draw_card()
+        if self.hands and player in self.hands:
+            self.hands[player].append(card)
+        self.player_take_card = player
+        self.taken_card = card if player == self.my_nickname else None
+        self._count_card(player, 1)
+        if self._send:
+            self._send(proto.take_card(player, card, len(self.deck)))
+        self._dispatch("take_card")
+        return card
+
     def win(self):
         if self._send:
-            self._send(proto.dumps(proto.end_game(self.my_nickname)))
+            self._send(proto.end_game(self.my_nickname))
         self.end_game(proto.end_game(self.my_nickname))
 
     def draw_one(self):
+        # карта хоста приходит в GUI срезом take_card, как и карта клиента
+        if self.run_in_loop:
+            self.run_in_loop(self._draw_one)
+            return None
+        return self._draw_one()
+
+    def _draw_one(self):
+        self._refill_deck()
+        if not self.is_client:
+            if self.authoritative:
+                error = rules.check_draw(self.my_nickname, self.current, len(self.deck))
+                if error:
+                    logger.warning("Взятие карты отклонено: %s", error)
+                    return None
+            return self._deal(self.my_nickname)
+        if self.deck is None:
+            # колода на сервере: карта придёт адресным take_card
+            if self._send:
+                self._send(proto.draw(self.my_nickname))
+            return None
         card = self.deck.draw_card()
         self.my_hands.append(card)
+        self._count_card(self.my_nickname, 1)
         if self._send:
-            self._send(proto.dumps(proto.take_card(self.my_nickname, card)))
+            self._send(proto.take_card(self.my_nickname, card, len(self.deck)))
         return card
 
+    def _count_card(self, nickname: str, delta: int) -> None:
+        if nickname in self.hand_counts:
+            self.hand_counts[nickname] += delta
+
     def _next_player(self):
         idx = (self.queue.index(self.current) + 1) % len(self.queue)
         return self.queue[idx]
@@ -115,6 +307,10 @@ class GameController:
             self.handle_step(data)
         elif data["command"] == "take_card":
             self.handle_take_card(data)
+        elif data["command"] == "draw":
+            self.handle_draw(data)
+        elif data["command"] == "play":
+            self.handle_play(data)
         elif data["command"] == "end_game":
             self.end_game(data)
 
@@ -123,17 +319,23 @@ class GameController:
         self.queue = data.get("queue_players")
         self.current = data.get("current_player")
         self.top_card = Card.from_dict(data.get("top_card"))
-        logger.info(self.my_nickname)
+        logger.debug("Начало партии, игрок %s", self.my_nickname)
         self.is_my_step = self.my_nickname == self.current
-        self.deck = Deck()
-        self.deck.cards = [Card.from_dict(c) for c in data.get("deck", [])]
+        self.authoritative = data.get("authoritative", False)
+        if "deck" in data:
+            self.deck = Deck()
+            self.deck.cards = [Card.from_dict(c) for c in data["deck"]]
+        else:
+            self.deck = None
+            self._deck_size = data.get("deck_size", 0)
 
         self.hands = None
         self.nicknames = data.get("nicknames")
-        self.my_hands = {
-            nickname: [Card.from_dict(c) for c in cards]
-            for nickname, cards in data.get("players", {}).items()
-        }.get(self.my_nickname, [])
+        players = data.get("players", {})
+        self.hand_counts = data.get("hand_counts") or {
+            nickname: len(cards) for nickname, cards in players.items()
+        }
+        self.my_hands = Hand(Card.from_dict(c) for c in players.get(self.my_nickname, []))
 
     def __str__(self) -> str:
         return (
@@ -145,7 +347,7 @@ class GameController:
             f"  Queue: {self.queue}\n"
             f"  Top Card: {self.top_card}\n"
             f"  my_hands:\n{self.my_hands}\n"
-            f"  Deck: {len(self.deck.cards)} cards remaining"
+            f"  Deck: {self.deck_size} cards remaining"
         )
 
     def handle_step(self, data):
@@ -153,6 +355,13 @@ class GameController:
         self.current = data.get("next_player")
         self.is_my_step = self.my_nickname == self.current
         self.step_player = data.get("player")
+        if self.step_player == self.my_nickname:
+            # сервер подтвердил наш ход — карта уже на столе
+            self._dispatch("turn")
+            return
+        self._count_card(self.step_player, -1)
+        if self.hands and self.step_player in self.hands and self.top_card.base in self.hands[self.step_player]:
+            self.hands[self.step_player].remove(self.top_card.base)
         result_command = "step" if not self.top_card.action else self.top_card.action
         self._dispatch(result_command)
 
@@ -162,11 +371,37 @@ class GameController:
 
     def handle_take_card(self, data):
         self.player_take_card = data.get("player")
-        card_dict = data["card"]
-        card = Card.from_dict(card_dict)
-        self.deck.pop_card(card)
+        self._count_card(self.player_take_card, 1)
+        card_dict = data.get("card")
+        self.taken_card = Card.from_dict(card_dict) if card_dict else None
+        if self.deck is not None:
+            if self.taken_card:
+                self._refill_deck()
+                self.deck.pop_card(self.taken_card)
+                if self.hands and self.player_take_card in self.hands:
+                    self.hands[self.player_take_card].append(self.taken_card)
+        else:
+            self._deck_size = data.get("deck_size", self._deck_size - 1)
+            if self.taken_card and self.player_take_card == self.my_nickname:
+                self.my_hands.append(self.taken_card)
         self._dispatch("take_card")
 
+    def handle_draw(self, data):
+        player = data.get("player")
+        self._refill_deck()
+        if self.authoritative:
+            error = rules.check_draw(player, self.current, len(self.deck))
+            if error:
+                self._reject(player, error)
+                return
+        self._deal(player)
+
+    def handle_play(self, data):
+        if not data.get("card"):
+            self._reject(data.get("player"), "в ходе нет карты")
+            return
+        self._apply_play(data.get("player"), Card.from_dict(data["card"]))
+
     def close_game(self):
         if self._close_net:
             self._close_net()
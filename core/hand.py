@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+from typing import Iterable, Iterator, List
+
+from core.card import Card, CARD_COLORS, CARD_VALUES, CARD_COUNT, WILD_VALUES
+
+
+def _mask(predicate) -> int:
+    mask = 0
+    for card_id in range(CARD_COUNT):
+        if predicate(Card.from_id(card_id)):
+            mask |= 1 << card_id
+    return mask
+
+
+# битовые маски по id карт: какие карты подходят к цвету / значению верхней карты
+COLOR_MASKS = {color: _mask(lambda c: c.color == color) for color in CARD_COLORS + ("black",)}
+VALUE_MASKS = {value: _mask(lambda c: c.value == value) for value in CARD_VALUES}
+WILD_MASK = _mask(lambda c: c.action in WILD_VALUES)
+ALL_MASK = (1 << CARD_COUNT) - 1
+
+
+def _accept_mask(top: Card) -> int:
+    if top.color in ("black", "back"):
+        return ALL_MASK
+    return COLOR_MASKS[top.color] | VALUE_MASKS[top.value] | WILD_MASK
+
+
+# ACCEPT_MASKS[top.id] — какие id можно положить на верхнюю карту
+ACCEPT_MASKS = tuple(_accept_mask(Card.from_id(card_id)) for card_id in range(CARD_COUNT))
+
+
+def iter_ids(mask: int) -> Iterator[int]:
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class Hand:
+    # рука игрока: порядок карт для отрисовки плюс счётчики для быстрых запросов
+    __slots__ = ("_cards", "_counts", "_mask", "_colors", "_values")
+
+    def __init__(self, cards: Iterable[Card] = ()) -> None:
+        self._cards: List[Card] = []
+        self._counts = [0] * CARD_COUNT
+        self._mask = 0
+        self._colors = dict.fromkeys(COLOR_MASKS, 0)
+        self._values = dict.fromkeys(VALUE_MASKS, 0)
+        for card in cards:
+            self.append(card)
+
+    def append(self, card: Card) -> None:
+        card = card.base
+        self._cards.append(card)
+        self._counts[card.id] += 1
+        self._mask |= 1 << card.id
+        self._colors[card.color] += 1
+        self._values[card.value] += 1
+
+    def remove(self, card: Card) -> None:
+        card = card.base
+        if not self._counts[card.id]:
+            raise ValueError(f"Карты {card} нет в руке")
+        self._cards.remove(card)
+        self._counts[card.id] -= 1
+        if not self._counts[card.id]:
+            self._mask &= ~(1 << card.id)
+        self._colors[card.color] -= 1
+        self._values[card.value] -= 1
+
+    def count(self, card: Card) -> int:
+        return self._counts[card.base.id]
+
+    def count_color(self, color: str) -> int:
+        return self._colors.get(color, 0)
+
+    def count_value(self, value: str) -> int:
+        return self._values.get(value, 0)
+
+    @property
+    def mask(self) -> int:
+        return self._mask
+
+    def playable_mask(self, top: Card | None) -> int:
+        if top is None:
+            return self._mask
+        return self._mask & ACCEPT_MASKS[top.id]
+
+    def has_playable(self, top: Card | None) -> bool:
+        return top is None or bool(self._mask & ACCEPT_MASKS[top.id])
+
+    def playable(self, top: Card | None) -> List[Card]:
+        # по одной карте каждого подходящего вида
+        return [Card.from_id(card_id) for card_id in iter_ids(self.playable_mask(top))]
+
+    def __contains__(self, card: Card) -> bool:
+        return bool(self._counts[card.base.id])
+
+    def __len__(self) -> int:
+        return len(self._cards)
+
+    def __iter__(self) -> Iterator[Card]:
+        return iter(self._cards)
+
+    def __getitem__(self, idx):
+        return self._cards[idx]
+
+    def __repr__(self) -> str:
+        return f"Hand({self._cards!r})"
@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import argparse
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import Dict, Iterator, List
+
+from core import protocol as proto
+from core.checkpoint import restore
+from core.game_controller import GameController
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+# журнал партий: файл только дописывается, запись = заголовок + кадр протокола v2 (тот же формат, что по сети).
+# Заголовок записи: номер партии, номер события в партии, время, CRC32 кадра — по нему отбрасывается
+# недописанный хвост после аварии.
+MAGIC = b"UNOJ\x01"
+RECORD = struct.Struct("!IIdI")
+EVENTS = ("start_game", "step", "take_card", "end_game")
+FLUSH_INTERVAL = 0.5
+FLUSH_BYTES = 64 * 1024
+
+_frames = proto.FrameDecoder()
+
+
+@dataclass(frozen=True)
+class Event:
+    game: int
+    turn: int      # 0 — start_game, дальше по порядку событий партии
+    time: float
+    msg: dict
+
+
+class Journal:
+    # запись с живого сервера только кладёт байты в буфер; на диск их пишет и fsync делает фоновый поток пачками
+    def __init__(self, path: str, flush_interval: float = FLUSH_INTERVAL, flush_bytes: int = FLUSH_BYTES,
+                 fsync: bool = True):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.fsync = fsync
+        self.records = 0
+        self._games: Dict[str, List[int]] = {}
+        self._next_game = self._recover(path) + 1
+        self._buf = bytearray()
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._closed = False
+
+        self._file = open(path, "ab", buffering=0)
+        if self._file.tell() == 0:
+            self._file.write(MAGIC)
+        self._thread = threading.Thread(target=self._flusher, name="journal", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _recover(path: str) -> int:
+        # номер последней партии в файле; недописанный при аварии хвост отрезаем, иначе новые записи окажутся за ним
+        if not os.path.exists(path) or os.path.getsize(path) <= len(MAGIC):
+            return 0
+        with JournalReader(path) as reader:
+            last = max(reader.games(), default=0)
+            torn, end = reader.torn, reader.end
+        if torn:
+            logger.warning("Журнал %s: отброшен повреждённый хвост с байта %d.", path, end)
+            os.truncate(path, end)
+        return last
+
+    def record(self, source: str, msg: dict):
+        # source — стол или сессия: у каждого своя текущая партия
+        command = msg.get("command")
+        if command not in EVENTS or self._closed:
+            return
+        frame = proto.encode_frame(msg)
+        with self._lock:
+            if command == "start_game":
+                self._games[source] = [self._next_game, 0]
+                self._next_game += 1
+            entry = self._games.get(source)
+            if entry is None:
+                return
+            game, turn = entry
+            entry[1] += 1
+            if command == "end_game":
+                del self._games[source]
+            self._buf += RECORD.pack(game, turn, time.time(), zlib.crc32(frame))
+            self._buf += frame
+            self.records += 1
+            full = len(self._buf) >= self.flush_bytes
+        if full:
+            self._wake.set()
+
+    def _flusher(self):
+        while not self._closed:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except OSError as e:
+                logger.error("Ошибка записи журнала %s: %s", self.path, e)
+
+    def flush(self):
+        with self._io_lock:
+            with self._lock:
+                if not self._buf:
+                    return
+                data, self._buf = self._buf, bytearray()
+            self._file.write(data)
+            if self.fsync:
+                os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._wake.set()
+        self._thread.join()
+        self.flush()
+        self._file.close()
+
+
+class JournalReader:
+    # чтение через mmap: заголовки пробегаются без копирования, кадр разбирается только у нужных событий
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._view = memoryview(self._map) if self._map else memoryview(b"")
+        if size and self._view[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{path}: это не журнал партий")
+        self._index: Dict[int, List[int]] | None = None
+        self.torn = False
+        self.end = len(MAGIC)
+
+    def __enter__(self) -> JournalReader:
+        return self
+
+    def __exit__(self, *_):
+        self.close()
+
+    def close(self):
+        self._view.release()
+        if self._map:
+            self._map.close()
+        self._file.close()
+
+    def _offsets(self) -> Iterator[int]:
+        view = self._view
+        pos = len(MAGIC)
+        while pos + RECORD.size + proto.HEADER.size <= len(view):
+            size = proto.HEADER.unpack_from(view, pos + RECORD.size)[0]
+            end = pos + RECORD.size + proto.HEADER.size + size
+            if end > len(view):
+                break
+            crc = RECORD.unpack_from(view, pos)[3]
+            if zlib.crc32(view[pos + RECORD.size:end]) != crc:
+                break
+            yield pos
+            pos = end
+        self.end = pos
+        self.torn = pos < len(view)
+
+    def _event(self, pos: int) -> Event:
+        game, turn, stamp, _ = RECORD.unpack_from(self._view, pos)
+        size = proto.HEADER.unpack_from(self._view, pos + RECORD.size)[0]
+        start = pos + RECORD.size
+        messages, _ = _frames.decode(self._view[start:start + proto.HEADER.size + size])
+        return Event(game, turn, stamp, messages[0])
+
+    def index(self) -> Dict[int, List[int]]:
+        if self._index is None:
+            self._index = {}
+            for pos in self._offsets():
+                self._index.setdefault(RECORD.unpack_from(self._view, pos)[0], []).append(pos)
+        return self._index
+
+    def games(self) -> List[int]:
+        return list(self.index())
+
+    def __iter__(self) -> Iterator[Event]:
+        for pos in self._offsets():
+            yield self._event(pos)
+
+    def events(self, game: int) -> List[Event]:
+        return [self._event(pos) for pos in self.index().get(game, [])]
+
+    def replay(self, game: int, turn: int | None = None) -> GameController:
+        # контроллер-наблюдатель: видит колоду и все руки, состояние — после события с номером turn
+        ctrl = GameController(value_player=0, nickname=None, is_client=True)
+        for pos in self.index().get(game, []):
+            event = self._event(pos)
+            if turn is not None and event.turn > turn:
+                break
+            if event.msg["command"] == "start_game":
+                restore(ctrl, event.msg)
+            else:
+                ctrl.handle_command(event.msg)
+        return ctrl
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m core.journal", description="Просмотр журнала партий")
+    parser.add_argument("path")
+    parser.add_argument("--game", type=int, help="номер партии для восстановления")
+    parser.add_argument("--turn", type=int, help="номер события, по умолчанию — конец партии")
+    args = parser.parse_args(argv)
+
+    with JournalReader(args.path) as reader:
+        if args.game is None:
+            index = reader.index()
+            finished = sum(1 for game in index if reader._event(index[game][-1]).msg["command"] == "end_game")
+            print(f"партий: {len(index)}, завершено: {finished}, записей: {sum(map(len, index.values()))}"
+                  + (", хвост файла повреждён" if reader.torn else ""))
+            return
+        ctrl = reader.replay(args.game, args.turn)
+        print(f"ходит: {ctrl.current}, верхняя карта: {ctrl.top_card}, в колоде: {ctrl.deck_size}")
+        for nickname, hand in (ctrl.hands or {}).items():
+            print(f"  {nickname}: {', '.join(map(str, hand))}")
+        if ctrl.winner_player:
+            print(f"победитель: {ctrl.winner_player}")
+
+
+if __name__ == "__main__":
+    main()
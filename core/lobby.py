@@ -0,0 +1,417 @@
+from __future__ import annotations
+
+import asyncio
+import random
+import secrets
+import socket
+
+from core import bots
+from core import protocol as proto
+from core.checkpoint import RECONNECT_GRACE, Checkpoint, CheckpointStore, Checkpointer
+from core.connection import StreamConnection, start_server
+from core.discovery import serve_discovery
+from core.game_controller import GameController
+from core.journal import Journal
+from core.network_utils import get_local_ip, broadcast_address
+from core.peer import Peer
+from logger import get_logger
+
+logger = get_logger(__name__)
+
+DEFAULT_PORT = 8080
+ANNOUNCE_INTERVAL = 5
+# код сессии одновременно служит UDP-портом, на который анонсируется стол
+CODE_RANGE = (10000, 60000)
+
+
+class Table:
+    def __init__(self, code: str, seats: int, bot_seats: int = 0, bot_kind: str = "greedy",
+                 journal: Journal | None = None, store: CheckpointStore | None = None,
+                 bot_names: list[str] | None = None):
+        self.code = code
+        self.seats = seats
+        self.journal = journal
+        self.clients: dict[str, Peer | bots.BotPeer] = {}
+        # отключившиеся посреди партии: место ждёт их RECONNECT_GRACE секунд
+        self.away: dict[str, asyncio.TimerHandle | None] = {}
+        # ключи мест людей: выдаются при входе, нужны для возврата после обрыва
+        self.tokens: dict[str, str] = {}
+        self.restored = False
+        self.game_started = False
+        self.finished = False
+        self.messages_in = 0
+        self.games_played = 0
+        self.ctrl = GameController(
+            value_player=seats,
+            nickname=None,
+            is_client=False,
+            on_send=self.broadcast,
+            on_close=self.close,
+            on_send_to=self.send_to
+        )
+        self.ctrl.state_ready = self._on_state
+        if bot_names is None:
+            # имя следующего бота зависит от уже посаженных — добавляем по одному
+            for _ in range(bot_seats):
+                self._add_bot(bots.bot_name(self.clients), bot_kind)
+        else:
+            for nickname in bot_names:
+                self._add_bot(nickname, bot_kind)
+        self.checkpoints = Checkpointer(self.ctrl, code, store, {
+            "code": code, "seats": seats, "bot_kind": bot_kind, "bots": list(self.clients),
+        })
+
+    def _add_bot(self, nickname: str, kind: str):
+        self.clients[nickname] = bots.BotPeer(nickname, lambda data: self.handle(nickname, data),
+                                              bots.make_policy(kind))
+
+    @property
+    def is_open(self) -> bool:
+        return not self.game_started and len(self.clients) < self.seats
+
+    @property
+    def humans(self) -> int:
+        return sum(1 for p in self.clients.values() if not p.is_bot) + len(self.away)
+
+    @property
+    def is_done(self) -> bool:
+        return (self.game_started or self.finished) and not self.humans
+
+    def join(self, peer: Peer) -> bool:
+        if not self.is_open or peer.nickname in self.clients:
+            return False
+        self.clients[peer.nickname] = peer
+        self.tokens[peer.nickname] = proto.new_token()
+        logger.info("[%s] %s сел за стол (%s/%s)", self.code, peer.nickname, len(self.clients), self.seats)
+        return True
+
+    def start(self):
+        logger.info("[%s] Все места заняты — начинаем игру.", self.code)
+        # ключи сохраняются вместе со столом, иначе после перезапуска сервера вернуться будет нельзя
+        self.checkpoints.meta["tokens"] = dict(self.tokens)
+        self.ctrl.authoritative = all(p.codec.binary for p in self.clients.values())
+        self.ctrl.new_game(list(self.clients))
+
+    def handle(self, nickname: str, data: dict):
+        self.messages_in += 1
+        if not self.game_started:
+            logger.warning("[%s] %s прислал %s до начала игры — отклонено.", self.code, nickname, data["command"])
+            return
+        if self.ctrl.authoritative and data["command"] not in proto.INTENTS:
+            # ход и его последствия считает сервер: клиенту разрешено только заявить, что он кладёт или берёт
+            logger.warning("[%s] %s прислал %s — от клиента принимаются только намерения, отклонено.", self.code,
+                           nickname, data["command"])
+            return
+        if proto.forged(data, nickname):
+            logger.warning("[%s] %s прислал %s от имени %s — отклонено.", self.code, nickname, data["command"],
+                           data.get("player"))
+            return
+        self.ctrl.handle_command(data)
+        if data["command"] in proto.INTENTS:
+            return
+        if data["command"] == "take_card":
+            data = {**data, "deck_size": self.ctrl.deck_size}
+        self.broadcast(data, exclude=nickname)
+
+    def broadcast(self, msg: dict, exclude: str | None = None):
+        if self.journal:
+            self.journal.record(self.code, msg)
+        self.checkpoints.record(msg)
+        for nickname, peer in list(self.clients.items()):
+            if nickname == exclude:
+                continue
+            if not peer.send(msg):
+                logger.warning("[%s] Клиент %s не успевает читать — отключаем.", self.code, nickname)
+                peer.close()
+
+    def send_to(self, nickname: str, msg: dict):
+        peer = self.clients.get(nickname)
+        if peer and not peer.send(msg):
+            logger.warning("[%s] Клиент %s не успевает читать — отключаем.", self.code, nickname)
+            peer.close()
+
+    def leave(self, nickname: str | None, conn: StreamConnection) -> bool:
+        # True — партия идёт и место остаётся за игроком до переподключения
+        peer = self.clients.get(nickname)
+        if not peer or peer.writer is not conn:
+            return False
+        del self.clients[nickname]
+        if self.game_started and not self.finished:
+            logger.info("[%s] %s отключился — ждём переподключения %s с.", self.code, nickname, RECONNECT_GRACE)
+            self.away[nickname] = None
+            return True
+        self.tokens.pop(nickname, None)
+        logger.info("[%s] %s покинул стол.", self.code, nickname)
+        return False
+
+    def resume(self, peer: Peer, token: str) -> bool:
+        # игрок вернулся после обрыва: только на место, которое числится свободным, и только с ключом этого места
+        nickname = peer.nickname
+        if self.finished or nickname not in self.away:
+            return False
+        if not secrets.compare_digest(token, self.tokens.get(nickname, "")):
+            logger.warning("[%s] Попытка занять место %s с чужим ключом.", self.code, nickname)
+            return False
+        handle = self.away.pop(nickname)
+        if handle:
+            handle.cancel()
+        self.clients[nickname] = peer
+        for msg in self.checkpoints.catch_up():
+            peer.send(msg)
+        logger.info("[%s] %s вернулся за стол.", self.code, nickname)
+        return True
+
+    def abandon(self, nickname: str):
+        if nickname not in self.away:
+            return
+        del self.away[nickname]
+        if self.game_started and not self.finished:
+            logger.info("[%s] %s не вернулся.", self.code, nickname)
+            self.ctrl.handle_error(nickname)
+
+    def restore(self, checkpoint: Checkpoint, tokens: dict[str, str]):
+        # стол из сохранённой точки после перезапуска сервера: люди пока числятся отключившимися
+        self.tokens = dict(tokens)
+        self.checkpoints.meta["tokens"] = dict(tokens)
+        self.checkpoints.restore(checkpoint)
+        self.game_started = True
+        self.restored = True
+        for nickname in checkpoint.queue:
+            if nickname not in self.clients:
+                self.away[nickname] = None
+
+    def wake_bots(self):
+        # боты восстановленного стола получают то же, что и вернувшийся игрок
+        for peer in list(self.clients.values()):
+            if peer.is_bot:
+                for msg in self.checkpoints.catch_up():
+                    peer.send(msg)
+
+    def close(self):
+        for peer in list(self.clients.values()):
+            peer.close()
+
+    def _on_state(self, cmd: str):
+        if cmd == "start_game":
+            self.game_started = True
+        elif cmd == "end_game":
+            self.finished = True
+            self.games_played += 1
+        elif cmd == "error":
+            logger.info("[%s] Игрок %s отключился — стол закрывается.", self.code, self.ctrl.exit_nickname)
+            self.finished = True
+            self.checkpoints.discard()
+            self.close()
+
+    def stats(self) -> dict:
+        return {
+            "code": self.code,
+            "players": len(self.clients),
+            "bots": len(self.clients) - self.humans,
+            "seats": self.seats,
+            "started": self.game_started,
+            "finished": self.finished,
+            "deck": self.ctrl.deck_size,
+            "messages_in": self.messages_in,
+            "messages_out": sum(p.messages_out for p in self.clients.values()),
+            "bytes_out": sum(p.bytes_out for p in self.clients.values()),
+        }
+
+
+class LobbyServer:
+    def __init__(self, tables: int = 1, seats: int = 2, host: str = "", port: int = DEFAULT_PORT,
+                 stats_interval: float = 0, bot_seats: int = 0, bot_kind: str = "greedy",
+                 journal: Journal | None = None, state_dir: str | None = None):
+        self.host = host
+        self.port = port
+        self.seats = seats
+        self.bot_seats = bot_seats
+        self.bot_kind = bot_kind
+        self.journal = journal
+        self.store = CheckpointStore(state_dir) if state_dir else None
+        self.table_count = tables
+        self.stats_interval = stats_interval
+        self.tables: dict[str, Table] = {}
+        self.connections = 0
+        self.games_finished = 0
+        if self.store:
+            self._restore_tables()
+        for _ in range(tables):
+            self._open_table()
+        self._stop: asyncio.Event | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._tasks: set[asyncio.Task] = set()
+
+    def _new_code(self) -> str:
+        while True:
+            code = str(random.randrange(*CODE_RANGE))
+            if code not in self.tables:
+                return code
+
+    def _open_table(self) -> Table:
+        table = Table(self._new_code(), self.seats, self.bot_seats, self.bot_kind, self.journal, self.store)
+        self.tables[table.code] = table
+        return table
+
+    def _restore_tables(self):
+        for meta, checkpoint in self.store.load():
+            table = Table(meta["code"], meta["seats"], bot_kind=meta["bot_kind"], journal=self.journal,
+                          store=self.store, bot_names=meta["bots"])
+            table.restore(checkpoint, meta.get("tokens", {}))
+            self.tables[table.code] = table
+        if self.tables:
+            logger.info("Восстановлено столов с незаконченными партиями: %d (%s)",
+                        len(self.tables), ", ".join(self.tables))
+
+    def _recycle(self, table: Table):
+        if table.is_done and self.tables.get(table.code) is table:
+            del self.tables[table.code]
+            self.games_finished += table.games_played
+            # восстановленные после перезапуска столы сверх --tables не заменяем
+            if len(self.tables) < self.table_count:
+                new = self._open_table()
+                logger.info("Стол %s освобождён, открыт новый стол %s.", table.code, new.code)
+
+    def _hold(self, table: Table, nickname: str):
+        table.away[nickname] = self._loop.call_later(RECONNECT_GRACE, self._abandon, table, nickname)
+
+    def _abandon(self, table: Table, nickname: str):
+        table.abandon(nickname)
+        self._recycle(table)
+
+    def _route(self, code: str | None) -> Table | None:
+        if code:
+            return self.tables.get(code)
+        # старые клиенты не передают код — сажаем за первый свободный стол
+        return next((t for t in self.tables.values() if t.is_open), None)
+
+    async def handle_client(self, conn: StreamConnection):
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        self.connections += 1
+        table = None
+        nickname = None
+        write_task = None
+        try:
+            raw = bytes(await conn.peek())
+            conn.consume(len(raw))
+            nickname, version, code, token = proto.parse_hello(raw)
+            resume = token is not None
+            table = self._route(code)
+            peer = Peer(nickname, conn, proto.Codec(binary=version >= proto.PROTOCOL_VERSION))
+            if table is None or not (table.resume(peer, token) if resume else table.join(peer)):
+                conn.write(proto.INVALID_NICKNAME)
+                await conn.drain()
+                nickname = None
+                return
+
+            # догоняющие сообщения вернувшегося игрока уже в очереди Peer и уйдут после приветствия
+            conn.write(proto.welcome(version, table.tokens.get(nickname, "")))
+            write_task = asyncio.create_task(peer.write_loop())
+            if not resume and len(table.clients) == table.seats:
+                table.start()
+
+            while True:
+                messages = await conn.receive(peer.codec)
+                if not messages:
+                    break
+                for data in messages:
+                    try:
+                        table.handle(nickname, data)
+                    except Exception as e:
+                        logger.error("[%s] %s", table.code, e)
+        except asyncio.CancelledError:
+            pass
+        except Exception as e:
+            logger.error("Ошибка соединения с %s: %s", nickname, e)
+        finally:
+            if write_task:
+                write_task.cancel()
+            self._tasks.discard(task)
+            self.connections -= 1
+            conn.close()
+            if table is not None:
+                if table.leave(nickname, conn):
+                    self._hold(table, nickname)
+                self._recycle(table)
+
+    def _sessions(self):
+        return [(table.code, self.port) for table in self.tables.values() if table.is_open]
+
+    async def _announce(self):
+        try:
+            ip = get_local_ip()
+        except OSError:
+            ip = "127.0.0.1"
+        bcast = broadcast_address(ip)
+        udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        udp.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        udp.setblocking(False)
+        try:
+            while True:
+                for table in list(self.tables.values()):
+                    if table.is_open:
+                        try:
+                            udp.sendto(f"{table.code}:{ip}:{self.port}".encode(), (bcast, int(table.code)))
+                        except OSError as e:
+                            logger.error("Ошибка отправки broadcast: %s", e)
+                await asyncio.sleep(ANNOUNCE_INTERVAL)
+        finally:
+            udp.close()
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(self.stats_interval)
+            stats = self.stats()
+            logger.info("Столов: %(tables)d (свободно %(open)d, идёт игр %(playing)d), соединений: %(connections)d, "
+                        "сыграно: %(games_finished)d, сообщений: %(messages_in)d / %(messages_out)d", stats)
+
+    def stats(self) -> dict:
+        tables = [t.stats() for t in self.tables.values()]
+        return {
+            "tables": len(tables),
+            "open": sum(1 for t in self.tables.values() if t.is_open),
+            "playing": sum(1 for t in tables if t["started"] and not t["finished"]),
+            "connections": self.connections,
+            "games_finished": self.games_finished + sum(t.games_played for t in self.tables.values()),
+            "messages_in": sum(t["messages_in"] for t in tables),
+            "messages_out": sum(t["messages_out"] for t in tables),
+            "bytes_out": sum(t["bytes_out"] for t in tables),
+            "per_table": tables,
+        }
+
+    async def serve(self):
+        self._stop = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        server = await start_server(self.handle_client, self.host, self.port)
+        responder = await serve_discovery(self._sessions)
+        for table in self.tables.values():
+            for nickname, handle in list(table.away.items()):
+                if handle is None:
+                    self._hold(table, nickname)
+            if table.restored:
+                table.restored = False
+                table.wake_bots()
+        logger.info("Лобби запущено на порту %s, столов: %d, коды: %s", self.port, len(self.tables), ", ".join(self.tables))
+        background = [asyncio.create_task(self._announce())]
+        if self.stats_interval > 0:
+            background.append(asyncio.create_task(self._report()))
+        try:
+            await self._stop.wait()
+        finally:
+            if responder:
+                responder.close()
+            server.close()
+            tasks = background + list(self._tasks)
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await server.wait_closed()
+
+    def start(self):
+        asyncio.run(self.serve())
+
+    def shutdown(self):
+        logger.info("Завершаем лобби...")
+        if self._loop and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._stop.set)
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import argparse
+import time
+from dataclasses import dataclass
+from typing import List
+
+import numpy as np
+
+from core.card import CARD_COUNT, BLACK_WILD_ID, BLACK_DRAW_FOUR_ID
+from core.deck import build_ids, START_IDS
+from core.hand import ACCEPT_MASKS
+
+HAND_SIZE = 7
+
+# состав колоды берём из core.deck, как и у Deck(); колода — строка из 108 id, позиция 0 — верх колоды
+DECK_IDS = np.array(build_ids(), dtype=np.uint8)
+IS_START = np.zeros(CARD_COUNT, dtype=bool)
+IS_START[list(START_IDS)] = True
+IS_WILD = np.zeros(CARD_COUNT, dtype=bool)
+IS_WILD[[BLACK_WILD_ID, BLACK_DRAW_FOUR_ID]] = True
+# ACCEPT[top, card] — можно ли положить card на top
+ACCEPT = np.array([[mask >> card_id & 1 for card_id in range(CARD_COUNT)] for mask in ACCEPT_MASKS], dtype=bool)
+
+
+@dataclass
+class Deal:
+    decks: np.ndarray   # (n, 108) перетасованные колоды до выбора стартовой карты
+    start: np.ndarray   # (n,) стартовая карта, как в Deck.pick_start_card
+    hands: np.ndarray   # (n, players, hand_size)
+    pile: np.ndarray    # (n, остаток) колода после раздачи, сверху вниз
+
+
+def shuffle_decks(n: int, rng: np.random.Generator) -> np.ndarray:
+    return rng.permuted(np.tile(DECK_IDS, (n, 1)), axis=1)
+
+
+def deal(n: int, players: int = 2, hand_size: int = HAND_SIZE, rng: np.random.Generator | None = None,
+         seed: int | None = None) -> Deal:
+    rng = rng or np.random.default_rng(seed)
+    decks = shuffle_decks(n, rng)
+    # стартовая карта — первая числовая сверху; она уходит из колоды, остальные сдвигаются
+    start_pos = IS_START[decks].argmax(axis=1)
+    start = decks[np.arange(n), start_pos]
+    keep = np.arange(DECK_IDS.size) != start_pos[:, None]
+    rest = decks[keep].reshape(n, DECK_IDS.size - 1)
+    dealt = players * hand_size
+    hands = rest[:, :dealt].reshape(n, players, hand_size)
+    return Deal(decks, start, hands, rest[:, dealt:])
+
+
+def start_action_probability(d: Deal) -> float:
+    # верхняя карта перетасованной колоды не годится для старта (action или wild)
+    return float((~IS_START[d.decks[:, 0]]).mean())
+
+
+def wilds_per_hand(d: Deal) -> np.ndarray:
+    counts = IS_WILD[d.hands].sum(axis=2).ravel()
+    return np.bincount(counts, minlength=d.hands.shape[2] + 1) / counts.size
+
+
+def draws_until_playable(d: Deal) -> np.ndarray:
+    # сколько карт возьмёт первый игрок, пока не сможет сходить (0 — может сразу); колода кончилась — берёт всю
+    top = d.start[:, None]
+    can_play = ACCEPT[top, d.hands[:, 0]].any(axis=1)
+    playable = ACCEPT[top, d.pile]
+    first = np.where(playable.any(axis=1), playable.argmax(axis=1) + 1, d.pile.shape[1])
+    draws = np.where(can_play, 0, first)
+    return np.bincount(draws) / draws.size
+
+
+def report(n: int = 100000, players: int = 2, seed: int | None = None) -> dict:
+    started = time.perf_counter()
+    d = deal(n, players=players, seed=seed)
+    draws = draws_until_playable(d)
+    return {
+        "decks": n,
+        "start_action": start_action_probability(d),
+        "wilds_per_hand": wilds_per_hand(d),
+        "draws_until_playable": draws,
+        "expected_draws": float(np.arange(draws.size) @ draws),
+        "ms": (time.perf_counter() - started) * 1000,
+    }
+
+
+def main(argv: List[str] | None = None):
+    parser = argparse.ArgumentParser(prog="python -m core.montecarlo", description="Статистика раздач UNO")
+    parser.add_argument("--decks", type=int, default=100000)
+    parser.add_argument("--players", type=int, default=2, choices=(2, 3, 4))
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args(argv)
+
+    stats = report(args.decks, args.players, args.seed)
+    print(f"колод: {stats['decks']}, {stats['ms']:.0f} мс")
+    print(f"верхняя карта не подходит для старта: {stats['start_action']:.2%}")
+    print("wild в руке из 7: " + ", ".join(f"{k}: {p:.2%}" for k, p in enumerate(stats["wilds_per_hand"]) if p))
+    print(f"сразу есть ход: {stats['draws_until_playable'][0]:.2%}, "
+          f"карт до подходящей в среднем: {stats['expected_draws']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,37 @@
 import socket
 import time
 
-from logger import logger
+from logger import get_logger
+
+logger = get_logger(__name__)
 
 
 def get_local_ip():
-    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
-        s.connect(("8.8.8.8", 80))
-        return s.getsockname()[0]
+    # connect у UDP ничего не отправляет, но без маршрута наружу (сеть без интернета) падает
+    try:
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as s:
+            s.connect(("8.8.8.8", 80))
+            return s.getsockname()[0]
+    except OSError:
+        pass
+    try:
+        return socket.gethostbyname(socket.gethostname())
+    except OSError:
+        return "127.0.0.1"
+
+
+def local_addresses():
+    addresses = {"127.0.0.1", get_local_ip()}
+    try:
+        addresses.update(socket.gethostbyname_ex(socket.gethostname())[2])
+    except OSError:
+        pass
+    return sorted(addresses)
+
+
+def broadcast_address(ip):
+    parts = ip.split(".")
+    return ".".join(parts[:3] + ["255"])
 
 
 def get_free_port():
@@ -16,19 +40,19 @@ def get_free_port():
         return s.getsockname()[1]
 
 
-def find_server_by_port(port):
+def find_server_by_port(port, timeout=15):
     udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     udp.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
     try:
         udp.bind(("", port))
     except OSError as e:
-        logger.error(f"Ошибка при привязке к порту {port}: {e}")
+        logger.error("Ошибка при привязке к порту %s: %s", port, e)
         return None, None
 
-    timeout = time.time() + 15
-    while time.time() < timeout:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
         try:
-            udp.settimeout(5)
+            udp.settimeout(max(0.1, min(5, deadline - time.time())))
             data, addr = udp.recvfrom(1024)
             code, ip, srv_port = data.decode().split(":")
             if code == str(port):
@@ -0,0 +1,40 @@
+from __future__ import annotations
+
+import asyncio
+
+from core import protocol as proto
+from core.connection import StreamConnection
+
+WRITE_QUEUE_SIZE = 64
+
+
+class Peer:
+    is_bot = False
+
+    def __init__(self, nickname: str, writer: StreamConnection, codec: proto.Codec):
+        self.nickname = nickname
+        self.writer = writer
+        self.codec = codec
+        self.queue: asyncio.Queue[bytes] = asyncio.Queue(WRITE_QUEUE_SIZE)
+        self.messages_out = 0
+        self.bytes_out = 0
+
+    def send(self, msg: dict) -> bool:
+        # новые клиенты не зеркалят колоду и получают только свою часть состояния
+        data = self.codec.encode(proto.view_for(msg, self.nickname) if self.codec.binary else msg)
+        try:
+            self.queue.put_nowait(data)
+        except asyncio.QueueFull:
+            return False
+        self.messages_out += 1
+        self.bytes_out += len(data)
+        return True
+
+    async def write_loop(self):
+        while True:
+            data = await self.queue.get()
+            self.writer.write(data)
+            await self.writer.drain()
+
+    def close(self):
+        self.writer.close()
@@ -1,7 +1,43 @@
+from __future__ import annotations
+
+import codecs
 import json
-from typing import Dict, List
+import secrets
+import struct
+from enum import IntEnum
+from typing import Dict, List, Tuple
+
 from core.card import Card
 
+PROTOCOL_VERSION = 2
+LEGACY_VERSION = 1
+HELLO_MAGIC = b"UNO"
+WELCOME = b"WELCOME"
+INVALID_NICKNAME = b"INVALID_NICKNAME"
+RESUME = b"RESUME"
+# ключ места: сервер выдаёт его в приветствии, без него вернуться за стол после обрыва нельзя
+TOKEN_SIZE = 16
+
+# кадр: длина полезной нагрузки (uint32), версия (uint8), опкод (uint8)
+HEADER = struct.Struct("!IBB")
+MAX_FRAME = 1 << 20
+HIDDEN = 0xFF
+FLAG_AUTHORITATIVE = 0x01
+
+
+class Op(IntEnum):
+    START_GAME = 1
+    STEP = 2
+    TAKE_CARD = 3
+    END_GAME = 4
+    START_HAND = 5
+    DRAW = 6
+    PLAY = 7
+
+
+class ProtocolError(ValueError):
+    pass
+
 
 def _card_dict(c: Card) -> Dict:
     return {"color": c.color, "value": c.value, "action": c.action}
@@ -11,9 +47,11 @@ def start_game(top: Card,
                queue: List[str],
                hands: Dict[str, List[Card]],
                deck: List[Card],
-               nicknames: List[str]) -> Dict:
+               nicknames: List[str],
+               authoritative: bool = False) -> Dict:
     return {
         "command": "start_game",
+        "authoritative": authoritative,
         "value_numbers": len(queue),
         "queue_players": queue,
         "current_player": queue[0],
@@ -35,12 +73,61 @@ def step(player: str, card: Card, next_player: str) -> Dict:
     }
 
 
-def take_card(player: str, card: Card) -> Dict:
-    return {
+def take_card(player: str, card: Card, deck_size: int | None = None) -> Dict:
+    msg = {
         "command": "take_card",
         "player": player,
         "card": _card_dict(card),
     }
+    if deck_size is not None:
+        msg["deck_size"] = deck_size
+    return msg
+
+
+def draw(player: str) -> Dict:
+    return {"command": "draw", "player": player}
+
+
+def play(player: str, card: Card) -> Dict:
+    return {"command": "play", "player": player, "card": _card_dict(card)}
+
+
+# намерения игроков: сервер отвечает на них сам и не пересылает остальным
+INTENTS = ("draw", "play")
+
+
+def forged(msg: Dict, nickname: str) -> bool:
+    # игрок говорит только за себя: ник в сообщении должен совпадать с ником соединения, с которого оно пришло
+    if msg["command"] in INTENTS:
+        return msg.get("player") != nickname
+    # старый клиент сам объявляет победу — но только свою
+    return msg.get("player", msg.get("winner", nickname)) != nickname
+
+
+def start_hand(full: Dict, nickname: str) -> Dict:
+    # delta-версия start_game: своя рука, размеры чужих рук и размер колоды
+    return {
+        "command": "start_game",
+        "authoritative": full.get("authoritative", False),
+        "value_numbers": full["value_numbers"],
+        "queue_players": full["queue_players"],
+        "current_player": full["current_player"],
+        "top_card": full["top_card"],
+        "players": {nickname: full["players"].get(nickname, [])},
+        "hand_counts": {n: len(hand) for n, hand in full["players"].items()},
+        "deck_size": len(full["deck"]),
+        "nicknames": full["nicknames"],
+    }
+
+
+def view_for(msg: Dict, nickname: str) -> Dict:
+    # что из серверного сообщения положено видеть игроку nickname
+    command = msg["command"]
+    if command == "start_game" and "deck" in msg:
+        return start_hand(msg, nickname)
+    if command == "take_card" and msg.get("card") and msg.get("player") != nickname:
+        return {**msg, "card": None}
+    return msg
 
 
 def end_game(winner: str) -> Dict:
@@ -53,3 +140,292 @@ def dumps(msg: Dict) -> bytes:
 
 def loads(raw: bytes) -> Dict:
     return json.loads(raw.decode())
+
+
+# ---------- бинарный формат ----------
+
+class _Writer:
+    __slots__ = ("buf",)
+
+    def __init__(self) -> None:
+        self.buf = bytearray()
+
+    def byte(self, value: int) -> None:
+        self.buf.append(value)
+
+    def text(self, value: str) -> None:
+        raw = value.encode("utf-8")
+        if len(raw) > 255:
+            raise ProtocolError(f"Слишком длинная строка: {value[:16]}...")
+        self.buf.append(len(raw))
+        self.buf += raw
+
+    def texts(self, values: List[str]) -> None:
+        self.buf.append(len(values))
+        for value in values:
+            self.text(value)
+
+    def card(self, data: Dict | None) -> None:
+        self.buf.append(Card.from_dict(data).id if data else HIDDEN)
+
+    def cards(self, items: List[Dict]) -> None:
+        self.buf += struct.pack("!H", len(items))
+        self.buf += bytes(Card.from_dict(c).id for c in items)
+
+
+class _Reader:
+    __slots__ = ("view", "pos")
+
+    def __init__(self, payload) -> None:
+        self.view = memoryview(payload)
+        self.pos = 0
+
+    def _take(self, size: int) -> memoryview:
+        end = self.pos + size
+        if end > len(self.view):
+            raise ProtocolError("Обрезанный кадр")
+        chunk = self.view[self.pos:end]
+        self.pos = end
+        return chunk
+
+    def byte(self) -> int:
+        return self._take(1)[0]
+
+    def text(self) -> str:
+        return str(self._take(self.byte()), "utf-8")
+
+    def texts(self) -> List[str]:
+        return [self.text() for _ in range(self.byte())]
+
+    def card(self) -> Dict | None:
+        card_id = self.byte()
+        return None if card_id == HIDDEN else _card_dict(Card.from_id(card_id))
+
+    def cards(self) -> List[Dict]:
+        (size,) = struct.unpack("!H", self._take(2))
+        return [_card_dict(Card.from_id(i)) for i in self._take(size)]
+
+
+def _encode_payload(msg: Dict) -> Tuple[Op, bytes]:
+    w = _Writer()
+    command = msg["command"]
+    if command == "start_game" and "deck" not in msg:
+        w.texts(msg["queue_players"])
+        w.text(msg["current_player"])
+        w.card(msg["top_card"])
+        ((nickname, hand),) = msg["players"].items()
+        w.text(nickname)
+        w.cards(hand)
+        for player in msg["queue_players"]:
+            w.byte(msg["hand_counts"].get(player, 0))
+        w.byte(msg["deck_size"])
+        w.texts(msg["nicknames"])
+        w.byte(FLAG_AUTHORITATIVE if msg.get("authoritative") else 0)
+        return Op.START_HAND, bytes(w.buf)
+    if command == "start_game":
+        w.texts(msg["queue_players"])
+        w.text(msg["current_player"])
+        w.card(msg["top_card"])
+        w.cards(msg["deck"])
+        w.byte(len(msg["players"]))
+        for nickname, hand in msg["players"].items():
+            w.text(nickname)
+            w.cards(hand)
+        w.texts(msg["nicknames"])
+        w.byte(FLAG_AUTHORITATIVE if msg.get("authoritative") else 0)
+        return Op.START_GAME, bytes(w.buf)
+    if command == "step":
+        w.text(msg["player"])
+        w.card(msg["top_card"])
+        w.text(msg["next_player"])
+        return Op.STEP, bytes(w.buf)
+    if command == "take_card":
+        w.text(msg["player"])
+        w.card(msg["card"])
+        w.byte(msg.get("deck_size", HIDDEN))
+        return Op.TAKE_CARD, bytes(w.buf)
+    if command == "draw":
+        w.text(msg["player"])
+        return Op.DRAW, bytes(w.buf)
+    if command == "play":
+        w.text(msg["player"])
+        w.card(msg["card"])
+        return Op.PLAY, bytes(w.buf)
+    if command == "end_game":
+        w.text(msg["winner"])
+        return Op.END_GAME, bytes(w.buf)
+    raise ProtocolError(f"Неизвестная команда: {command}")
+
+
+def _decode_payload(op: int, payload) -> Dict:
+    r = _Reader(payload)
+    if op == Op.START_GAME:
+        queue = r.texts()
+        msg = {
+            "command": "start_game",
+            "value_numbers": len(queue),
+            "queue_players": queue,
+            "current_player": r.text(),
+            "top_card": r.card(),
+            "deck": r.cards(),
+        }
+        msg["players"] = {r.text(): r.cards() for _ in range(r.byte())}
+        msg["nicknames"] = r.texts()
+        msg["authoritative"] = bool(r.byte() & FLAG_AUTHORITATIVE)
+        return msg
+    if op == Op.STEP:
+        return {"command": "step", "player": r.text(), "top_card": r.card(), "next_player": r.text()}
+    if op == Op.START_HAND:
+        queue = r.texts()
+        msg = {
+            "command": "start_game",
+            "value_numbers": len(queue),
+            "queue_players": queue,
+            "current_player": r.text(),
+            "top_card": r.card(),
+        }
+        msg["players"] = {r.text(): r.cards()}
+        msg["hand_counts"] = {player: r.byte() for player in queue}
+        msg["deck_size"] = r.byte()
+        msg["nicknames"] = r.texts()
+        msg["authoritative"] = bool(r.byte() & FLAG_AUTHORITATIVE)
+        return msg
+    if op == Op.TAKE_CARD:
+        msg = {"command": "take_card", "player": r.text(), "card": r.card()}
+        deck_size = r.byte()
+        if deck_size != HIDDEN:
+            msg["deck_size"] = deck_size
+        return msg
+    if op == Op.DRAW:
+        return {"command": "draw", "player": r.text()}
+    if op == Op.PLAY:
+        return {"command": "play", "player": r.text(), "card": r.card()}
+    if op == Op.END_GAME:
+        return {"command": "end_game", "winner": r.text()}
+    raise ProtocolError(f"Неизвестный опкод: {op}")
+
+
+def encode_frame(msg: Dict) -> bytes:
+    op, payload = _encode_payload(msg)
+    return HEADER.pack(len(payload), PROTOCOL_VERSION, op) + payload
+
+
+class FrameDecoder:
+    # потоковый декодер: принимает произвольные куски байт, отдаёт только целые кадры
+    def __init__(self) -> None:
+        self._buf = bytearray()
+
+    def feed(self, data: bytes) -> List[Dict]:
+        self._buf += data
+        messages, used = self.decode(memoryview(self._buf))
+        if used:
+            del self._buf[:used]
+        return messages
+
+    def decode(self, view: memoryview) -> Tuple[List[Dict], int]:
+        # разбирает кадры прямо в чужом буфере; возвращает сообщения и число использованных байт
+        messages = []
+        pos = 0
+        while len(view) - pos >= HEADER.size:
+            size, version, op = HEADER.unpack_from(view, pos)
+            if version != PROTOCOL_VERSION:
+                raise ProtocolError(f"Неподдерживаемая версия протокола: {version}")
+            if size > MAX_FRAME:
+                raise ProtocolError(f"Слишком большой кадр: {size}")
+            end = pos + HEADER.size + size
+            if end > len(view):
+                break
+            messages.append(_decode_payload(op, view[pos + HEADER.size:end]))
+            pos = end
+        return messages, pos
+
+
+class JsonStreamDecoder:
+    # старый формат: JSON-объекты подряд без разделителей
+    def __init__(self) -> None:
+        self._utf8 = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self._buf = ""
+
+    def feed(self, data: bytes) -> List[Dict]:
+        self._buf += self._utf8.decode(data)
+        messages = []
+        pos = 0
+        while True:
+            while pos < len(self._buf) and self._buf[pos].isspace():
+                pos += 1
+            if pos >= len(self._buf):
+                break
+            try:
+                msg, pos = self._json.raw_decode(self._buf, pos)
+            except json.JSONDecodeError:
+                break
+            messages.append(msg)
+        self._buf = self._buf[pos:]
+        return messages
+
+    def decode(self, view: memoryview) -> Tuple[List[Dict], int]:
+        # незаконченный JSON копится внутри декодера, поэтому буфер всегда забирается целиком
+        return self.feed(view), len(view)
+
+
+class Codec:
+    def __init__(self, binary: bool) -> None:
+        self.binary = binary
+        self.decoder = FrameDecoder() if binary else JsonStreamDecoder()
+
+    def encode(self, msg: Dict) -> bytes:
+        return encode_frame(msg) if self.binary else dumps(msg)
+
+    def feed(self, data: bytes) -> List[Dict]:
+        return self.decoder.feed(data)
+
+    def decode(self, view: memoryview) -> Tuple[List[Dict], int]:
+        return self.decoder.decode(view)
+
+
+# ---------- рукопожатие ----------
+
+def new_token() -> str:
+    return secrets.token_hex(TOKEN_SIZE // 2)
+
+
+def hello(nickname: str, session_code: str | None = None, token: str | None = None) -> bytes:
+    # token — ключ места из прошлого приветствия: клиент возвращается за стол после обрыва
+    # разделитель после ника есть всегда, даже без кода сессии: по нему сервер отличает приветствие v2 от старого ника
+    raw = HELLO_MAGIC + bytes([PROTOCOL_VERSION]) + nickname.encode("utf-8")
+    raw += b"\0" + (session_code or "").encode("ascii")
+    if token:
+        raw += b"\0" + RESUME + token.encode("ascii")
+    return raw
+
+
+def parse_hello(raw: bytes) -> Tuple[str, int, str | None, str | None]:
+    # (ник, согласованная версия, код сессии — для сервера со многими столами, ключ места при возврате после обрыва)
+    # старый клиент шлёт голый ник, и он тоже может начинаться с «UNO»
+    if not (raw.startswith(HELLO_MAGIC) and len(raw) > len(HELLO_MAGIC)
+            and LEGACY_VERSION < raw[len(HELLO_MAGIC)] <= PROTOCOL_VERSION
+            and b"\0" in raw[len(HELLO_MAGIC) + 1:]):
+        return raw.decode("utf-8"), LEGACY_VERSION, None, None
+    version = raw[len(HELLO_MAGIC)]
+    nickname, _, rest = raw[len(HELLO_MAGIC) + 1:].partition(b"\0")
+    code, _, flag = rest.partition(b"\0")
+    token = flag[len(RESUME):].decode("ascii") if flag.startswith(RESUME) else None
+    return nickname.decode("utf-8"), version, code.decode("ascii") or None, token
+
+
+def welcome(version: int, token: str = "") -> bytes:
+    if version >= PROTOCOL_VERSION:
+        return WELCOME + bytes([version]) + token.encode("ascii").ljust(TOKEN_SIZE, b"\0")
+    return WELCOME
+
+
+def parse_welcome(raw: bytes) -> Tuple[bool, int, str, bytes]:
+    # (принят ли ник, версия, ключ места, байты следующих сообщений, пришедшие в том же recv)
+    if raw.startswith(INVALID_NICKNAME) or not raw.startswith(WELCOME):
+        return False, LEGACY_VERSION, "", b""
+    rest = raw[len(WELCOME):]
+    if rest and rest[0] == PROTOCOL_VERSION:
+        token = rest[1:1 + TOKEN_SIZE].rstrip(b"\0").decode("ascii")
+        return True, PROTOCOL_VERSION, token, rest[1 + TOKEN_SIZE:]
+    return True, LEGACY_VERSION, "", rest
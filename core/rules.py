@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import List, Optional
+
+from core.card import Card, WILD_VALUES
+
+DRAW_PENALTY = {"draw two": 2, "draw four": 4}
+
+
+@dataclass(frozen=True)
+class Turn:
+    queue: List[str]
+    next_player: str
+    victim: Optional[str] = None
+    penalty: int = 0
+
+
+def can_play(card: Card, top: Card | None) -> bool:
+    if top is None or card.action in WILD_VALUES or top.color == "black":
+        return True
+    return card.color == top.color or card.value == top.value
+
+
+def check_play(player: str, card: Card, current: str, top: Card | None, hand: list | None) -> str | None:
+    # None — ход допустим, иначе причина отказа
+    if player != current:
+        return f"сейчас ход {current}, а не {player}"
+    if hand is None or card.base not in hand:
+        return f"у {player} нет карты {card}"
+    if card.color == "black":
+        return "для wild не выбран цвет"
+    if not can_play(card, top):
+        return f"{card} нельзя положить на {top}"
+    return None
+
+
+def check_draw(player: str, current: str, deck_size: int) -> str | None:
+    if player != current:
+        return f"сейчас ход {current}, а не {player}"
+    if deck_size == 0:
+        return "колода закончилась"
+    return None
+
+
+def _after(queue: List[str], player: str, steps: int = 1) -> str:
+    return queue[(queue.index(player) + steps) % len(queue)]
+
+
+def resolve(queue: List[str], player: str, card: Card) -> Turn:
+    # эффекты сыгранной карты по правилам из assets/rules.html
+    queue = list(queue)
+    if card.action == "reverse":
+        if len(queue) == 2:
+            return Turn(queue, player)
+        queue.reverse()
+        return Turn(queue, _after(queue, player))
+    if card.action == "skip":
+        return Turn(queue, _after(queue, player, 2))
+    penalty = DRAW_PENALTY.get(card.value, 0)
+    if penalty:
+        victim = _after(queue, player)
+        return Turn(queue, _after(queue, player, 2), victim, penalty)
+    return Turn(queue, _after(queue, player))
@@ -1,20 +1,35 @@
-import json
-import socket
-import threading
+from __future__ import annotations
 
-from PyQt5.QtCore import QObject, pyqtSignal, Qt
+import argparse
+import asyncio
+import secrets
+import socket
+from typing import Callable
 
-from core.game_controller import GameController
-from core.network_utils import get_local_ip
-from logger import logger
+from core import bots
+from core import protocol as proto
+from core.checkpoint import RECONNECT_GRACE, Checkpointer
+from core.connection import StreamConnection, start_server
+from core.discovery import serve_discovery
+from core.game_controller import GameController, Snapshot
+from core.journal import Journal
+from core.lobby import LobbyServer, ANNOUNCE_INTERVAL, DEFAULT_PORT
+from core.network_utils import get_local_ip, broadcast_address
+from core.peer import Peer
+from logger import get_logger
 
+logger = get_logger(__name__)
 
-class Server(QObject):
-    gui_cmd = pyqtSignal(str)
 
-    def __init__(self, value_players=3, nickname=None):
-        super().__init__()
+class Server:
+    def __init__(self, value_players=3, nickname=None, on_state: Callable[[Snapshot], None] | None = None,
+                 on_lobby: Callable[[tuple], None] | None = None, journal: Journal | None = None):
         self.gui = None
+        # события контроллера приходят из сетевого потока срезами состояния; GUI подменяет on_state мостом в Qt
+        self.on_state = on_state or self.apply_state
+        # состав стола до начала игры: вызывается при каждом входе и выходе, а не по таймеру
+        self.on_lobby = on_lobby
+        self.journal = journal
         self.nickname = nickname
         self.game_started = False
         self.ctrl = GameController(
@@ -22,121 +37,346 @@ class Server(QObject):
             nickname=nickname,
             is_client=False,
             on_send=self._broadcast,
-            on_close=self.shutdown
+            on_close=self.shutdown,
+            on_send_to=self._send_to
         )
 
-        self.ctrl.state_ready = self.gui_cmd.emit
-        self.gui_cmd.connect(self._apply_state, Qt.QueuedConnection)
+        self.ctrl.state_ready = self._notify
+        self.ctrl.run_in_loop = self._call_in_loop
         self.game_started = False
         self.host = get_local_ip()
         # self.port = get_free_port()
         self.port = 8080
         self.session_code = str(self.port)
         self.value_players = value_players
-        self.clients = {}
-        self.broadcasting = True
+        self.clients: dict[str, Peer] = {}
+        # отключившиеся посреди партии: место ждёт их RECONNECT_GRACE секунд, потом партия прерывается
+        self.away: dict[str, asyncio.TimerHandle] = {}
+        # ключи мест: выдаются в приветствии, без ключа вернуться на место нельзя
+        self.tokens: dict[str, str] = {}
+        self.checkpoints = Checkpointer(self.ctrl, self.session_code)
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._stop: asyncio.Event | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self._announce_wake: asyncio.Event | None = None
+        self._closing = False
 
         self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_socket.bind((self.host, self.port))
+        # слушаем все интерфейсы: клиент подключается по адресу, с которого пришёл ответ на запрос обнаружения
+        self.server_socket.bind(("", self.port))
         self.server_socket.listen(self.value_players)
-        logger.info(f"Сервер запущен на {self.host}:{self.port} с кодом сессии: {self.session_code}")
-
-        self.broadcast_thread = threading.Thread(target=self.broadcast_session_code, daemon=True)
-        self.broadcast_thread.start()
-
-    def _broadcast(self, data: bytes):
-        for sock in self.clients.values():
-            try:
-                sock.sendall(data)
-            except OSError:
-                pass
-
-    def broadcast_session_code(self):
-        udp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-        udp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
-        message = f"{self.session_code}:{self.host}:{self.port}"
-        parts = self.host.split(".")
-        bcast = ".".join(parts[:3] + ["255"])
-        while True:
-            if len(self.clients) < self.value_players:
+        logger.info("Сервер запущен на %s:%s с кодом сессии: %s", self.host, self.port, self.session_code)
+
+    def _in_loop(self) -> bool:
+        try:
+            return asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            return False
+
+    def _call_in_loop(self, fn: Callable, *args):
+        # кнопки и ходы хоста жмутся в потоке GUI, а состояние стола и партии меняет только цикл событий
+        if self._loop is None or self._in_loop():
+            fn(*args)
+        else:
+            self._loop.call_soon_threadsafe(fn, *args)
+
+    def _broadcast(self, msg: dict, exclude: str | None = None):
+        # ходы хоста уже идут через цикл событий; вызов из чужого потока тоже переносим туда
+        if self.journal:
+            self.journal.record(self.session_code, msg)
+        self.checkpoints.record(msg)
+        if self._loop is None:
+            return
+        if self._in_loop():
+            self._broadcast_now(msg, exclude)
+        else:
+            self._loop.call_soon_threadsafe(self._broadcast_now, msg, exclude)
+
+    def _broadcast_now(self, msg: dict, exclude: str | None = None):
+        for nickname, peer in list(self.clients.items()):
+            if nickname == exclude:
+                continue
+            if not peer.send(msg):
+                logger.warning("Клиент %s не успевает читать — отключаем.", nickname)
+                peer.close()
+
+    def _send_to(self, nickname: str, msg: dict):
+        # отказ в ходе приходит из обработки сообщений клиента, то есть уже в цикле событий
+        peer = self.clients.get(nickname)
+        if peer and not peer.send(msg):
+            logger.warning("Клиент %s не успевает читать — отключаем.", nickname)
+            peer.close()
+
+    def new_game(self):
+        self._call_in_loop(self._new_game)
+
+    def _new_game(self):
+        # правила проверяет сервер, только если все клиенты понимают намерения (протокол v2)
+        self.ctrl.authoritative = all(p.codec.binary for p in self.clients.values())
+        self.game_started = True
+        self._lobby_changed()
+        self.ctrl.new_game([self.nickname, *self.clients])
+
+    def _receive(self, nickname: str, data: dict):
+        try:
+            logger.debug("Команда %s", data)
+            if not self.game_started:
+                logger.warning("%s прислал %s до начала игры — отклонено.", nickname, data["command"])
+                return
+            if self.ctrl.authoritative and data["command"] not in proto.INTENTS:
+                # ход и его последствия считает сервер: клиенту разрешено только заявить, что он кладёт или берёт
+                logger.warning("%s прислал %s — от клиента принимаются только намерения, отклонено.", nickname,
+                               data["command"])
+                return
+            if proto.forged(data, nickname):
+                logger.warning("%s прислал %s от имени %s — отклонено.", nickname, data["command"], data.get("player"))
+                return
+            self.ctrl.handle_command(data)
+            self._relay(nickname, data)
+        except Exception as e:
+            logger.error(e)
+
+    def add_bot(self, kind: str = "greedy"):
+        self._call_in_loop(self._add_bot, kind)
+
+    def _add_bot(self, kind: str) -> str | None:
+        # бот занимает свободное место сразу, без подключения по сети
+        if self.game_started or len(self.clients) >= self.value_players:
+            return None
+        nickname = bots.bot_name([self.nickname, *self.clients])
+        self.clients[nickname] = bots.BotPeer(nickname, lambda data: self._receive(nickname, data),
+                                              bots.make_policy(kind))
+        logger.info("За стол сел %s (%s).", nickname, kind)
+        self._lobby_changed()
+        return nickname
+
+    def _relay(self, sender: str, data: dict):
+        if data["command"] in proto.INTENTS:
+            return
+        if data["command"] == "take_card":
+            data = {**data, "deck_size": self.ctrl.deck_size}
+        self._broadcast(data, exclude=sender)
+
+    def _sessions(self):
+        if self.game_started or len(self.clients) >= self.value_players:
+            return []
+        return [(self.session_code, self.port)]
+
+    @property
+    def broadcasting(self) -> bool:
+        return bool(self._sessions())
+
+    def _lobby_changed(self):
+        # вход, выход, бот или начало игры: GUI обновляется сразу, анонс включается или засыпает
+        if self.on_lobby:
+            self.on_lobby(tuple(self.clients))
+        if self._announce_wake is None:
+            return
+        if self._in_loop():
+            self._announce_wake.set()
+        else:
+            self._loop.call_soon_threadsafe(self._announce_wake.set)
+
+    async def _announce(self):
+        # анонс для старых клиентов; пока стол заполнен или игра идёт, задача спит до следующего изменения
+        udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        udp.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        udp.setblocking(False)
+        message = f"{self.session_code}:{self.host}:{self.port}".encode()
+        bcast = broadcast_address(self.host)
+        try:
+            while True:
+                self._announce_wake.clear()
+                timeout = None
+                if self.broadcasting:
+                    timeout = ANNOUNCE_INTERVAL
+                    try:
+                        udp.sendto(message, (bcast, self.port))
+                        logger.debug("Отправлен код сессии %s по адресу %s:%s", self.session_code, bcast, self.port)
+                    except OSError as e:
+                        logger.error("Ошибка отправки broadcast: %s", e)
                 try:
-                    udp_socket.sendto(message.encode(), (bcast, self.port))
-                    logger.info(f"Отправлен код сессии {self.session_code} по адресу {bcast}:{self.port}")
-                except Exception as e:
-                    logger.error(f"Ошибка отправки broadcast: {e}")
-            threading.Event().wait(5)
-
-    def handle_client(self, client_socket, address):
-        logger.info(f"Клиент {address} подключился.")
+                    await asyncio.wait_for(self._announce_wake.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            udp.close()
+
+    async def handle_client(self, conn: StreamConnection):
+        logger.info("Клиент %s подключился.", conn.get_extra_info('peername'))
+        task = asyncio.current_task()
+        self._tasks.add(task)
+        nickname = None
+        write_task = None
         try:
-            nickname = client_socket.recv(1024).decode("utf-8")
-            if nickname == self.nickname or nickname in self.clients:
-                client_socket.send("INVALID_NICKNAME".encode("utf-8"))
-                client_socket.close()
+            raw = bytes(await conn.peek())
+            conn.consume(len(raw))
+            nickname, version, _, token = proto.parse_hello(raw)
+            resume = token is not None
+            if not (self._can_resume(nickname, token) if resume else self._can_join(nickname)):
+                conn.write(proto.INVALID_NICKNAME)
+                await conn.drain()
+                nickname = None
                 return
 
-            self.clients[nickname] = client_socket
-            client_socket.send("WELCOME".encode("utf-8"))
+            peer = Peer(nickname, conn, proto.Codec(binary=version >= proto.PROTOCOL_VERSION))
+            if resume:
+                self._resume(peer)
+            else:
+                self.clients[nickname] = peer
+                self.tokens[nickname] = proto.new_token()
+            # догоняющие сообщения вернувшегося игрока уже в очереди Peer и уйдут после приветствия
+            conn.write(proto.welcome(version, self.tokens[nickname]))
+            write_task = asyncio.create_task(peer.write_loop())
 
-            if len(self.clients) == self.value_players:
-                logger.info("Достигнуто максимальное количество игроков. Остановка broadcast.")
-                self.broadcasting = False
+            if not resume:
+                if len(self.clients) == self.value_players:
+                    logger.info("Достигнуто максимальное количество игроков. Остановка broadcast.")
+                self._lobby_changed()
 
             while True:
-                raw = client_socket.recv(8192)
-                if not raw:
+                messages = await conn.receive(peer.codec)
+                if not messages:
                     break
-                try:
-                    data = json.loads(raw.decode("utf-8"))
-                    logger.info(f"Команда {data}")
-                    self.ctrl.handle_command(data)
-                except Exception as e:
-                    logger.error(e)
-        except:
+                for data in messages:
+                    self._receive(nickname, data)
+        except asyncio.CancelledError:
             pass
+        except Exception as e:
+            logger.error("Ошибка соединения с %s: %s", nickname, e)
         finally:
-            self.remove_client(client_socket, nickname)
+            if write_task:
+                write_task.cancel()
+            self._tasks.discard(task)
+            self.remove_client(conn, nickname)
+
+    def _can_join(self, nickname: str) -> bool:
+        return nickname != self.nickname and nickname not in self.clients and nickname not in self.away
 
-    def remove_client(self, client_socket, nickname=None):
-        if nickname in self.clients:
+    def _can_resume(self, nickname: str, token: str) -> bool:
+        # вернуться можно только на место, которое числится свободным, и только с ключом этого места
+        if not self.game_started or self.ctrl.winner_player or nickname not in self.away:
+            return False
+        if not secrets.compare_digest(token, self.tokens.get(nickname, "")):
+            logger.warning("Попытка занять место %s с чужим ключом.", nickname)
+            return False
+        return True
+
+    def _resume(self, peer: Peer):
+        # игрок вернулся после обрыва: точка состояния и пропущенные события, потом обычная рассылка
+        self.away.pop(peer.nickname).cancel()
+        self.clients[peer.nickname] = peer
+        for msg in self.checkpoints.catch_up():
+            peer.send(msg)
+        logger.info("Игрок %s вернулся в игру.", peer.nickname)
+
+    def _abandon(self, nickname: str):
+        if self.away.pop(nickname, None) is None or self._closing:
+            return
+        if not self.ctrl.winner_player:
+            logger.info("Игрок %s не вернулся — аварийное завершение.", nickname)
+            self.ctrl.handle_error(nickname)
+
+    def remove_client(self, conn: StreamConnection, nickname=None):
+        peer = self.clients.get(nickname)
+        removed = peer is not None and peer.writer is conn
+        if removed:
             del self.clients[nickname]
-        client_socket.close()
-        logger.info(f"Клиент {nickname} отключился.")
+        conn.close()
+        logger.info("Клиент %s отключился.", nickname)
 
+        # отказ по нику партию не трогает
+        if self._closing or not removed:
+            return
         if not self.game_started:
-            if len(self.clients) < self.value_players:
-                logger.info("Игрок отключился. Возобновление broadcast.")
-                self.broadcasting = True
-        else:
-            logger.info("Отключение во время игры — аварийное завершение.")
-            self.ctrl.handle_error(nickname)
+            self.tokens.pop(nickname, None)
+            logger.info("Игрок отключился. Возобновление broadcast.")
+            self._lobby_changed()
+        elif not self.ctrl.winner_player:
+            logger.info("Отключение во время игры — ждём переподключения %s с.", RECONNECT_GRACE)
+            self.away[nickname] = self._loop.call_later(RECONNECT_GRACE, self._abandon, nickname)
 
     def start(self):
         logger.info("Для остановки сервера нажмите CTRL+C")
-        while True:
-            try:
-                client_socket, address = self.server_socket.accept()
-                threading.Thread(target=self.handle_client, args=(client_socket, address), daemon=True).start()
-            except OSError:
-                break
+        asyncio.run(self.serve())
+
+    async def serve(self):
+        self._stop = asyncio.Event()
+        self._loop = asyncio.get_running_loop()
+        if self._closing:
+            return
+        server = await start_server(self.handle_client, sock=self.server_socket)
+        responder = await serve_discovery(self._sessions)
+        self._announce_wake = asyncio.Event()
+        announce = asyncio.create_task(self._announce())
+        try:
+            await self._stop.wait()
+        finally:
+            if responder:
+                responder.close()
+            server.close()
+            tasks = [announce, *self._tasks]
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await server.wait_closed()
+            self.clients.clear()
 
     def shutdown(self, *_):
         logger.info("Завершаем сервер...")
+        self._closing = True
+        if self._loop and self._loop.is_running():
+            self._loop.call_soon_threadsafe(self._stop.set)
+            return
         try:
             self.server_socket.close()
         except OSError:
             pass
 
-        for sock in list(self.clients.values()):
-            try:
-                sock.close()
-            except OSError:
-                pass
-        self.clients.clear()
+    def _notify(self, cmd: str):
+        self.on_state(self.ctrl.snapshot(cmd))
 
-    def _apply_state(self, cmd: str):
-        if cmd == "start_game":
+    def apply_state(self, snapshot: Snapshot):
+        self.apply_states([snapshot])
+
+    def apply_states(self, snapshots: list[Snapshot], resync: bool = False):
+        if any(s.command == "start_game" for s in snapshots):
             self.game_started = True
         if not self.gui:
             return
-        self.gui.apply_state(cmd)
+        self.gui.apply_states(snapshots, resync)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m core.server", description="Сервер UNO без GUI")
+    parser.add_argument("--tables", type=int, default=1, help="количество столов")
+    parser.add_argument("--seats", type=int, default=2, choices=(2, 3, 4), help="игроков за столом")
+    parser.add_argument("--host", default="", help="адрес для прослушивания")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--stats", type=float, default=60, help="интервал вывода статистики, 0 — выключить")
+    parser.add_argument("--bots", type=int, default=0, help="сколько мест за каждым столом занять ботами")
+    parser.add_argument("--bot", default="greedy", choices=sorted(bots.POLICIES), help="стратегия ботов")
+    parser.add_argument("--journal", metavar="PATH", help="дописывать партии в журнал (см. python -m core.journal)")
+    parser.add_argument("--state", metavar="DIR",
+                        help="сохранять незаконченные партии и продолжать их после перезапуска сервера")
+    args = parser.parse_args(argv)
+    if not 0 <= args.bots < args.seats:
+        parser.error("хотя бы одно место за столом должно остаться для человека")
+
+    journal = Journal(args.journal) if args.journal else None
+    lobby = LobbyServer(tables=args.tables, seats=args.seats, host=args.host, port=args.port,
+                        stats_interval=args.stats, bot_seats=args.bots, bot_kind=args.bot, journal=journal,
+                        state_dir=args.state)
+    try:
+        lobby.start()
+    except KeyboardInterrupt:
+        logger.info("Сервер остановлен.")
+    finally:
+        if lobby.store:
+            lobby.store.close()
+        if journal:
+            journal.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,224 @@
+from __future__ import annotations
+
+import random
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence
+
+from core.card import Card, CARD_COLORS, CARD_COUNT
+from core.deck import build_ids, START_IDS
+from core.hand import Hand
+from core.rules import DRAW_PENALTY
+
+HAND_SIZE = 7
+MAX_TURNS = 1000
+
+# стратегия получает свою руку, верхнюю карту, размеры рук соперников (по порядку хода) и rng;
+# возвращает карту для хода (wild можно вернуть чёрной — цвет выберет best_color) или None, чтобы брать карту
+Strategy = Callable[[Hand, Card, List[int], random.Random], Optional[Card]]
+
+_BASE_IDS = build_ids()
+_CARDS = tuple(Card.from_id(card_id) for card_id in range(CARD_COUNT))
+
+
+def best_color(hand: Hand) -> str:
+    return max(CARD_COLORS, key=hand.count_color)
+
+
+def first_playable(hand: Hand, top: Card, others: List[int], rng: random.Random) -> Card | None:
+    playable = hand.playable(top)
+    return playable[0] if playable else None
+
+
+def random_strategy(hand: Hand, top: Card, others: List[int], rng: random.Random) -> Card | None:
+    playable = hand.playable(top)
+    return rng.choice(playable) if playable else None
+
+
+def greedy_strategy(hand: Hand, top: Card, others: List[int], rng: random.Random) -> Card | None:
+    # бьём штрафными, если следующий почти выиграл; иначе сбрасываем цвет, которого больше всего; wild — в последнюю очередь
+    playable = hand.playable(top)
+    if not playable:
+        return None
+    if others and others[0] <= 2:
+        attacks = [c for c in playable if c.action in ("draw four", "draw two", "skip")]
+        if attacks:
+            return attacks[0]
+    colored = [c for c in playable if c.color != "black"]
+    if colored:
+        return max(colored, key=lambda c: (hand.count_color(c.color), c.action is not None))
+    return playable[0]
+
+
+STRATEGIES: Dict[str, Strategy] = {
+    "first": first_playable,
+    "random": random_strategy,
+    "greedy": greedy_strategy,
+}
+
+
+@dataclass
+class GameResult:
+    winner: Optional[int]
+    turns: int
+    draws: int
+    cards_left: List[int]
+    actions: Counter
+
+
+def draw_card(deck: List[int], rand: Callable[[], float]) -> Card:
+    # тасуем лениво: случайная карта из оставшихся (Фишер–Йетс по одной карте за раз)
+    pos = int(rand() * len(deck))
+    deck[pos], deck[-1] = deck[-1], deck[pos]
+    return _CARDS[deck.pop()]
+
+
+def play_game(strategies: Sequence[Strategy], rng: random.Random | None = None,
+              seed: int | None = None, max_turns: int = MAX_TURNS) -> GameResult:
+    rng = rng or random.Random(seed)
+    rand = rng.random
+    n = len(strategies)
+    deck = _BASE_IDS[:]
+
+    while True:
+        pos = int(rand() * len(deck))
+        if deck[pos] in START_IDS:
+            top = _CARDS[deck.pop(pos)]
+            break
+
+    hands = [Hand() for _ in range(n)]
+    for hand in hands:
+        for _ in range(HAND_SIZE):
+            hand.append(draw_card(deck, rand))
+
+    return run_game(strategies, hands, deck, top, rng.randrange(n), rng, max_turns=max_turns)
+
+
+def run_game(strategies: Sequence[Strategy], hands: List[Hand], deck: List[int], top: Card, cur: int,
+             rng: random.Random, direction: int = 1, max_turns: int = MAX_TURNS) -> GameResult:
+    # доигрывает партию с любой позиции; hands и deck изменяются на месте, копий состояния нет.
+    # Сыгранные карты копятся в сбросе и возвращаются в колоду, когда она кончается
+    rand = rng.random
+    n = len(strategies)
+    turns = draws = passes = 0
+    actions: Counter = Counter()
+    pile: List[int] = []
+
+    def take(hand: Hand) -> bool:
+        nonlocal draws
+        if not deck:
+            # draw_card и так берёт случайную карту — сброс можно не перемешивать
+            deck.extend(pile)
+            pile.clear()
+            if not deck:
+                return False
+        hand.append(draw_card(deck, rand))
+        draws += 1
+        return True
+
+    while turns < max_turns:
+        turns += 1
+        hand = hands[cur]
+        strategy = strategies[cur]
+        others = [len(hands[(cur + direction * k) % n]) for k in range(1, n)]
+        card = strategy(hand, top, others, rng) if hand.has_playable(top) else None
+
+        if card is None:
+            # правила: берём до первой подходящей карты, её можно сыграть сразу
+            while not hand.has_playable(top) and take(hand):
+                pass
+            if hand.has_playable(top):
+                card = strategy(hand, top, others, rng)
+            if card is None:
+                # пас возможен, только когда на руках все карты: ни колоды, ни сброса
+                passes += 1
+                if passes >= n:
+                    return GameResult(None, turns, draws, [len(h) for h in hands], actions)
+                cur = (cur + direction) % n
+                continue
+
+        if card not in hand or not hand.playable_mask(top) >> card.base.id & 1:
+            raise ValueError(f"Стратегия {strategy.__name__} сыграла недопустимую карту {card} на {top}")
+        passes = 0
+        hand.remove(card)
+        if card.color == "black":
+            card = card.with_color(best_color(hand))
+        pile.append(top.base.id)
+        top = card
+
+        if not hand:
+            return GameResult(cur, turns, draws, [len(h) for h in hands], actions)
+
+        step = 1
+        if card.action:
+            actions[card.value] += 1
+            if card.action == "reverse":
+                if n == 2:
+                    step = 0
+                else:
+                    direction = -direction
+            elif card.action == "skip":
+                step = 2
+            elif card.value in DRAW_PENALTY:
+                victim = hands[(cur + direction) % n]
+                for _ in range(DRAW_PENALTY[card.value]):
+                    if not take(victim):
+                        break
+                step = 2
+        cur = (cur + direction * step) % n
+
+    return GameResult(None, turns, draws, [len(h) for h in hands], actions)
+
+
+@dataclass
+class BatchStats:
+    games: int = 0
+    wins: List[int] = field(default_factory=list)
+    stalemates: int = 0
+    lengths: Counter = field(default_factory=Counter)
+    actions: Counter = field(default_factory=Counter)
+    draws: int = 0
+    seconds: float = 0.0
+
+    @property
+    def decided(self) -> int:
+        return self.games - self.stalemates
+
+    @property
+    def win_rates(self) -> List[float]:
+        # доли побед среди доигранных партий; ничьи (лимит ходов, пас всех игроков) считаются отдельно
+        return [w / self.decided if self.decided else 0.0 for w in self.wins]
+
+    @property
+    def stalemate_rate(self) -> float:
+        return self.stalemates / self.games if self.games else 0.0
+
+    @property
+    def mean_turns(self) -> float:
+        return sum(t * c for t, c in self.lengths.items()) / self.games if self.games else 0.0
+
+    @property
+    def games_per_second(self) -> float:
+        return self.games / self.seconds if self.seconds else 0.0
+
+    def add(self, result: GameResult) -> None:
+        self.games += 1
+        if result.winner is None:
+            self.stalemates += 1
+        else:
+            self.wins[result.winner] += 1
+        self.lengths[result.turns] += 1
+        self.actions.update(result.actions)
+        self.draws += result.draws
+
+
+def simulate(strategies: Sequence[Strategy], games: int, seed: int | None = None,
+             max_turns: int = MAX_TURNS) -> BatchStats:
+    rng = random.Random(seed)
+    stats = BatchStats(wins=[0] * len(strategies))
+    started = time.perf_counter()
+    for _ in range(games):
+        stats.add(play_game(strategies, rng=rng, max_turns=max_turns))
+    stats.seconds = time.perf_counter() - started
+    return stats
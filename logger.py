@@ -1,13 +1,119 @@
+from __future__ import annotations
+
+import atexit
+import copy
+import json
 import logging
+import logging.handlers
+import os
+import queue
+
+# записи только кладутся в очередь, форматирует и пишет их на диск отдельный поток QueueListener.
+# Настройка через окружение:
+#   UNO_LOG_LEVEL=DEBUG                      — общий уровень игры (по умолчанию INFO)
+#   UNO_LOG_LEVELS="core.deck=DEBUG,GUI=WARNING" — уровни отдельных модулей и пакетов
+#   UNO_LOG_JSON=1                           — в файл писать JSON-строки
+#   UNO_LOG_FILE=path                        — файл журнала, пустое значение — без файла
+ROOT = "uno"
+LOG_FILE = "app.log"
+LOG_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+DATE_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # очередь внутри процесса: склеиваем только текст (аргументы могут поменяться до записи),
+        # время, формат и JSON — уже в потоке записи; трассировка остаётся отдельным полем
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage(),
+        }
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def _parse_levels(spec: str) -> dict:
+    levels = {}
+    for item in spec.split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+def get_logger(name: str) -> logging.Logger:
+    # логгеры модулей живут под общим корнем, поэтому их уровни настраиваются по имени модуля или пакета
+    if name == "__main__":
+        name = "main"
+    return logging.getLogger(f"{ROOT}.{name}")
+
+
+def configure(level: str | None = None, levels: dict | None = None, json_lines: bool | None = None,
+              path: str | None = None, console: bool = True):
+    global _listener
+    if _listener:
+        _listener.stop()
+
+    level = (level or os.environ.get("UNO_LOG_LEVEL") or "INFO").upper()
+    if levels is None:
+        levels = _parse_levels(os.environ.get("UNO_LOG_LEVELS", ""))
+    if json_lines is None:
+        json_lines = os.environ.get("UNO_LOG_JSON", "") not in ("", "0")
+    if path is None:
+        path = os.environ.get("UNO_LOG_FILE", LOG_FILE)
+
+    text = logging.Formatter(LOG_FORMAT, DATE_FORMAT)
+    handlers = []
+    if path:
+        file_handler = logging.FileHandler(path, encoding="utf-8")
+        file_handler.setFormatter(JsonFormatter() if json_lines else text)
+        handlers.append(file_handler)
+    if console:
+        console_handler = logging.StreamHandler()
+        console_handler.setFormatter(text)
+        handlers.append(console_handler)
+
+    records = queue.SimpleQueue()
+    root = logging.getLogger()
+    for handler in root.handlers[:]:
+        root.removeHandler(handler)
+    root.addHandler(_QueueHandler(records))
+    # сторонние библиотеки (asyncio и т.п.) — только предупреждения
+    root.setLevel(logging.WARNING)
+    logging.getLogger(ROOT).setLevel(level)
+    for name, module_level in levels.items():
+        logging.getLogger(f"{ROOT}.{name}").setLevel(module_level)
+
+    _listener = logging.handlers.QueueListener(records, *handlers, respect_handler_level=True)
+    _listener.start()
+
+
+def shutdown():
+    # дописывает очередь до конца; вызывается и автоматически при выходе
+    global _listener
+    if _listener:
+        _listener.stop()
+        _listener = None
+
+
+configure()
+atexit.register(shutdown)
 
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S',
-    handlers=[
-        logging.FileHandler("app.log"),
-        logging.StreamHandler()
-    ]
-)
-
-logger = logging.getLogger(__name__)
+logger = get_logger("app")
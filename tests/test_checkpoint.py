@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from core import protocol as proto
+from core.checkpoint import Checkpoint, CheckpointStore, Checkpointer, restore
+from core.game_controller import GameController
+from core.lobby import Table
+from core.peer import Peer
+
+
+class _Conn:
+    def close(self):
+        pass
+
+
+def _peer(nickname: str) -> Peer:
+    return Peer(nickname, _Conn(), proto.Codec(binary=True))
+
+
+def _received(peer: Peer) -> list:
+    data = b""
+    while not peer.queue.empty():
+        data += peer.queue.get_nowait()
+    return proto.FrameDecoder().feed(data)
+
+
+def _state(ctrl: GameController) -> tuple:
+    hands = {nickname: list(hand) for nickname, hand in ctrl.hands.items()}
+    return ctrl.queue, ctrl.current, ctrl.top_card, list(ctrl.deck.cards), hands, ctrl.authoritative
+
+
+def _server(nicknames=("Аня", "bob", "Вова")) -> GameController:
+    ctrl = GameController(value_player=len(nicknames), nickname=None, is_client=False)
+    ctrl.authoritative = True
+    ctrl.new_game(list(nicknames))
+    ctrl.handle_command(proto.draw(ctrl.current))
+    return ctrl
+
+
+def _table(store: CheckpointStore | None = None) -> Table:
+    table = Table("12345", seats=2, store=store)
+    for nickname in ("Аня", "bob"):
+        table.join(_peer(nickname))
+    table.start()
+    for peer in table.clients.values():
+        _received(peer)
+    return table
+
+
+def test_message_round_trip():
+    ctrl = _server()
+    checkpoint = Checkpoint.capture(ctrl, 7)
+    assert Checkpoint.from_message(checkpoint.start_message(), 7) == checkpoint
+
+
+def test_restore_rebuilds_server_state():
+    ctrl = _server()
+    copy = GameController(value_player=3, nickname=None, is_client=False)
+    restore(copy, Checkpoint.capture(ctrl, 1).start_message())
+    assert _state(copy) == _state(ctrl)
+    assert copy.hand_counts == {nickname: len(hand) for nickname, hand in ctrl.hands.items()}
+
+
+def test_checkpointer_follows_game():
+    ctrl = _server()
+    checkpoints = Checkpointer(ctrl, "12345")
+    assert checkpoints.catch_up() == []
+    checkpoints.record(ctrl.state_message())
+    assert checkpoints.seq == 0
+    player = ctrl.current
+    ctrl.handle_command(proto.draw(player))
+    checkpoints.record(proto.take_card(player, ctrl.hands[player][-1], ctrl.deck_size))
+    assert checkpoints.seq == 1
+    [msg] = checkpoints.catch_up()
+    assert Checkpoint.from_message(msg, 1) == Checkpoint.capture(ctrl, 1)
+    checkpoints.record(proto.end_game("Аня"))
+    assert checkpoints.checkpoint is None and checkpoints.catch_up() == []
+
+
+def test_store_save_load_discard(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+    checkpoint = Checkpoint.capture(_server(), 3)
+    meta = {"code": "12345", "tokens": {"Аня": proto.new_token()}}
+    store.save("12345", checkpoint, meta)
+    store.flush()
+    assert store.load() == [(meta, checkpoint)]
+    store.discard("12345")
+    store.flush()
+    assert store.load() == []
+    store.close()
+
+
+def test_store_skips_damaged_file(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+    store.save("12345", Checkpoint.capture(_server(), 3), {})
+    store.flush()
+    path = os.path.join(str(tmp_path), os.listdir(str(tmp_path))[0])
+    with open(path, "r+b") as f:
+        f.seek(-1, os.SEEK_END)
+        f.write(b"\xff")
+    assert store.load() == []
+    store.close()
+
+
+def test_resume_needs_away_seat_and_its_token():
+    table = _table()
+    anya = table.clients["Аня"]
+    token = table.tokens["Аня"]
+    # место занято — вернуться на него нельзя даже с верным ключом
+    assert not table.resume(_peer("Аня"), token)
+
+    assert table.leave("Аня", anya.writer)
+    assert "Аня" in table.away
+    assert not table.resume(_peer("Аня"), table.tokens["bob"])
+    assert not table.resume(_peer("Аня"), "")
+    back = _peer("Аня")
+    assert table.resume(back, token)
+    assert table.clients["Аня"] is back and not table.away
+    [msg] = _received(back)
+    assert msg["command"] == "start_game" and list(msg["players"]) == ["Аня"]
+
+
+def test_token_dropped_when_leaving_before_start():
+    table = Table("12345", seats=2)
+    peer = _peer("Аня")
+    table.join(peer)
+    assert "Аня" in table.tokens
+    assert not table.leave("Аня", peer.writer)
+    assert "Аня" not in table.tokens
+
+
+def test_restored_table_keeps_tokens(tmp_path):
+    store = CheckpointStore(str(tmp_path))
+    table = _table(store)
+    tokens = dict(table.tokens)
+    store.flush()
+    [(meta, checkpoint)] = store.load()
+    store.close()
+    assert meta["tokens"] == tokens
+
+    restored = Table(meta["code"], meta["seats"], bot_names=meta["bots"])
+    restored.restore(checkpoint, meta["tokens"])
+    assert set(restored.away) == {"Аня", "bob"}
+    assert _state(restored.ctrl) == _state(table.ctrl)
+    assert not restored.resume(_peer("bob"), tokens["Аня"])
+    assert restored.resume(_peer("bob"), tokens["bob"])
+
+
+@pytest.mark.parametrize("nickname", ["Аня", "bob"])
+def test_resume_after_game_over_is_refused(nickname):
+    table = _table()
+    peer = table.clients[nickname]
+    table.leave(nickname, peer.writer)
+    table.ctrl.end_game(proto.end_game("bob" if nickname == "Аня" else "Аня"))
+    assert table.finished
+    assert not table.resume(_peer(nickname), table.tokens[nickname])
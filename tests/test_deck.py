@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import random
+from collections import Counter
+
+from core.card import Card
+from core.deck import Deck, START_IDS, build_ids
+
+
+def _positions(deck: Deck) -> dict:
+    # индекс позиций, собранный заново по содержимому колоды
+    where = {}
+    for pos, cid in enumerate(deck.ids):
+        where.setdefault(cid, []).append(pos)
+    return where
+
+
+def _assert_indexed(deck: Deck):
+    expected = _positions(deck)
+    for cid, positions in enumerate(deck._where):
+        assert sorted(positions) == expected.get(cid, [])
+
+
+def test_full_deck():
+    deck = Deck()
+    assert len(deck) == 108
+    assert Counter(deck.ids) == Counter(build_ids())
+    assert deck.count(Card("red", "0")) == 1
+    assert deck.count(Card("red", "5")) == 2
+    assert deck.count(Card("black", "wild")) == 4
+    _assert_indexed(deck)
+
+
+def test_draw_card_takes_top():
+    deck = Deck()
+    top = deck.cards[-1]
+    assert deck.draw_card() is top
+    assert len(deck) == 107
+    _assert_indexed(deck)
+
+
+def test_pop_card_from_middle_keeps_index():
+    deck = Deck()
+    rng = random.Random(1)
+    for _ in range(60):
+        card = deck.cards[rng.randrange(len(deck))]
+        count = deck.count(card)
+        assert deck.pop_card(card) is card
+        assert deck.count(card) == count - 1
+        _assert_indexed(deck)
+    assert len(deck) == 48
+
+
+def test_pop_card_wild_with_color_takes_black_card():
+    deck = Deck()
+    assert deck.pop_card(Card("black", "wild").with_color("red")) is Card("black", "wild")
+    assert deck.count(Card("black", "wild")) == 3
+
+
+def test_pop_missing_card():
+    deck = Deck()
+    deck.cards = [Card("red", "1")]
+    assert deck.pop_card(Card("blue", "2")) is None
+    assert len(deck) == 1
+    assert Card("red", "1") in deck
+    assert Card("blue", "2") not in deck
+
+
+def test_cards_setter_and_view():
+    deck = Deck()
+    cards = [Card("red", "1"), Card("blue", "skip"), Card("red", "1")]
+    deck.cards = cards
+    assert deck.cards == cards
+    assert deck.cards[1:] == cards[1:]
+    deck.cards[0] = Card("green", "3")
+    assert deck.count(Card("red", "1")) == 1
+    assert Card("green", "3") in deck
+    _assert_indexed(deck)
+
+
+def test_shuffle_reindexes():
+    deck = Deck()
+    random.shuffle(deck.cards)
+    _assert_indexed(deck)
+    deck.shuffle()
+    _assert_indexed(deck)
+    assert Counter(deck.ids) == Counter(build_ids())
+
+
+def test_refill():
+    deck = Deck()
+    drawn = [deck.draw_card() for _ in range(100)]
+    deck.refill(drawn)
+    assert Counter(deck.ids) == Counter(build_ids())
+    _assert_indexed(deck)
+
+
+def test_pick_start_card_is_number():
+    for _ in range(20):
+        deck = Deck()
+        card = deck.pick_start_card()
+        assert card.id in START_IDS
+        assert len(deck) == 107
+        _assert_indexed(deck)
+
+
+def test_pick_start_card_without_numbers():
+    deck = Deck()
+    deck.cards = [Card("black", "wild"), Card("red", "skip")]
+    assert deck.pick_start_card() is Card("red", "skip")
+
+
+def test_deal_cards():
+    deck = Deck()
+    hands = deck.deal_cards(["a", "b"], hand_size=7)
+    assert [len(hand) for hand in hands.values()] == [7, 7]
+    assert len(deck) == 94
+    _assert_indexed(deck)
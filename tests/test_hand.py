@@ -0,0 +1,83 @@
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from core import rules
+from core.card import Card, CARD_COUNT
+from core.deck import Deck
+from core.hand import Hand, iter_ids
+
+RED_5 = Card("red", "5")
+WILD = Card("black", "wild")
+
+
+def _slow_playable(hand: Hand, top: Card | None) -> set:
+    return {card.id for card in hand if rules.can_play(card, top)}
+
+
+def test_counts():
+    hand = Hand([RED_5, RED_5, Card("blue", "5"), WILD])
+    assert len(hand) == 4
+    assert hand.count(RED_5) == 2
+    assert hand.count_color("red") == 2
+    assert hand.count_color("black") == 1
+    assert hand.count_value("5") == 3
+    assert list(hand) == [RED_5, RED_5, Card("blue", "5"), WILD]
+
+
+def test_wild_with_color_is_stored_as_black():
+    hand = Hand([WILD.with_color("red")])
+    assert hand[0] is WILD
+    assert WILD.with_color("green") in hand
+    assert hand.count_color("red") == 0
+
+
+def test_remove_keeps_mask_while_copies_left():
+    hand = Hand([RED_5, RED_5])
+    hand.remove(RED_5)
+    assert RED_5 in hand
+    assert hand.mask == 1 << RED_5.id
+    hand.remove(RED_5)
+    assert RED_5 not in hand
+    assert hand.mask == 0
+    with pytest.raises(ValueError):
+        hand.remove(RED_5)
+
+
+def test_iter_ids():
+    assert list(iter_ids(0)) == []
+    assert list(iter_ids(0b10110)) == [1, 2, 4]
+
+
+@pytest.mark.parametrize("top, playable", [
+    (Card("red", "9"), {RED_5, Card("red", "skip"), WILD}),
+    (Card("green", "7"), {Card("blue", "7"), WILD}),
+    (WILD.with_color("blue"), {Card("blue", "7"), WILD}),
+    (WILD, {RED_5, Card("red", "skip"), Card("blue", "7"), WILD}),
+    (None, {RED_5, Card("red", "skip"), Card("blue", "7"), WILD}),
+])
+def test_playable(top, playable):
+    hand = Hand([RED_5, Card("red", "skip"), Card("blue", "7"), WILD, RED_5])
+    assert set(hand.playable(top)) == playable
+    assert hand.has_playable(top)
+
+
+def test_nothing_playable():
+    hand = Hand([Card("blue", "1"), Card("green", "2")])
+    assert hand.playable_mask(Card("red", "9")) == 0
+    assert not hand.has_playable(Card("red", "9"))
+    assert hand.playable(Card("red", "9")) == []
+
+
+def test_mask_agrees_with_rules():
+    # битовая маска обязана совпадать с правилом, которым сервер проверяет ход
+    rng = random.Random(7)
+    tops = [Card.from_id(card_id) for card_id in range(CARD_COUNT - 1)]
+    for _ in range(200):
+        deck = Deck()
+        hand = Hand(deck.draw_card() for _ in range(rng.randint(0, 15)))
+        top = rng.choice(tops)
+        assert set(iter_ids(hand.playable_mask(top))) == _slow_playable(hand, top)
+        assert hand.has_playable(top) == bool(_slow_playable(hand, top))
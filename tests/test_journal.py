@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import pytest
+
+from core import protocol as proto
+from core.journal import MAGIC, Journal, JournalReader
+from core.lobby import Table
+from core.peer import Peer
+
+
+class _Seat(Peer):
+    # место без сокета: сообщения стола журналу не нужны
+    def send(self, msg: dict) -> bool:
+        return True
+
+
+def _state(ctrl) -> tuple:
+    hands = {nickname: sorted(card.id for card in hand) for nickname, hand in ctrl.hands.items()}
+    return ctrl.current, ctrl.top_card, hands, ctrl.deck_size, ctrl.winner_player
+
+
+def _play(table: Table, moves: int, states: dict, journal: Journal):
+    # ходит первой подходящей картой, иначе берёт; после каждого намерения запоминает состояние сервера
+    for _ in range(moves):
+        if table.finished:
+            return
+        ctrl = table.ctrl
+        player = ctrl.current
+        cards = ctrl.hands[player].playable(ctrl.top_card)
+        if cards:
+            card = cards[0]
+            if card.color == "black":
+                card = card.with_color("red")
+            table.handle(player, proto.play(player, card))
+        else:
+            table.handle(player, proto.draw(player))
+        states[journal.records - 1] = _state(ctrl)
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = Journal(str(tmp_path / "games.bin"), fsync=False)
+    yield journal
+    journal.close()
+
+
+def _table(journal: Journal, code: str = "12345") -> Table:
+    table = Table(code, seats=3, journal=journal)
+    for nickname in ("Аня", "bob", "Вова"):
+        table.join(_Seat(nickname, None, proto.Codec(binary=True)))
+    table.start()
+    return table
+
+
+def test_replay_matches_server(journal):
+    table = _table(journal)
+    states = {0: _state(table.ctrl)}
+    _play(table, 300, states, journal)
+    journal.close()
+
+    with JournalReader(journal.path) as reader:
+        assert reader.games() == [1]
+        events = reader.events(1)
+        assert [event.turn for event in events] == list(range(len(events)))
+        assert events[0].msg["command"] == "start_game"
+        for turn, state in states.items():
+            assert _state(reader.replay(1, turn)) == state
+        assert not reader.torn
+
+
+def test_games_are_numbered_per_table(journal):
+    first, second = _table(journal, "111"), _table(journal, "222")
+    first_states, second_states = {}, {}
+    for _ in range(5):
+        _play(first, 1, first_states, journal)
+        _play(second, 1, second_states, journal)
+    journal.flush()
+    with JournalReader(journal.path) as reader:
+        assert reader.games() == [1, 2]
+        # записи столов перемешаны в файле, но у каждой партии свой счёт событий
+        for game in (1, 2):
+            events = reader.events(game)
+            assert [event.turn for event in events] == list(range(len(events)))
+        assert _state(reader.replay(1)) == _state(first.ctrl)
+        assert _state(reader.replay(2)) == _state(second.ctrl)
+
+
+def test_torn_tail_is_cut(tmp_path):
+    path = str(tmp_path / "games.bin")
+    journal = Journal(path, fsync=False)
+    table = _table(journal)
+    _play(table, 10, {}, journal)
+    journal.close()
+    records = journal.records
+
+    with open(path, "ab") as f:
+        f.write(b"\x00\x00\x00\x01oops")
+    with JournalReader(path) as reader:
+        assert len(list(reader)) == records
+        assert reader.torn
+
+    # новый журнал отрезает хвост и продолжает нумерацию партий
+    journal = Journal(path, fsync=False)
+    _table(journal)
+    journal.close()
+    with JournalReader(path) as reader:
+        assert not reader.torn
+        assert reader.games() == [1, 2]
+
+
+def test_not_a_journal(tmp_path):
+    path = tmp_path / "other.bin"
+    path.write_bytes(b"nope" + MAGIC)
+    with pytest.raises(ValueError):
+        JournalReader(str(path))
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import pytest
+
+from core import protocol as proto
+from core.card import Card
+from core.deck import Deck
+
+RED_5 = Card("red", "5")
+BLUE_WILD = Card("black", "wild").with_color("blue")
+GREEN_DRAW_FOUR = Card("black", "draw four").with_color("green")
+
+
+def _start_game() -> dict:
+    deck = Deck()
+    hands = deck.deal_cards(["Аня", "bob", "Бот 1"])
+    return proto.start_game(
+        top=RED_5,
+        queue=["bob", "Аня", "Бот 1"],
+        hands=hands,
+        deck=list(deck.cards),
+        nicknames=["Аня", "bob", "Бот 1"],
+        authoritative=True,
+    )
+
+
+MESSAGES = {
+    proto.Op.START_GAME: _start_game(),
+    proto.Op.START_HAND: proto.view_for(_start_game(), "Аня"),
+    proto.Op.STEP: proto.step("Аня", BLUE_WILD, "bob"),
+    proto.Op.TAKE_CARD: proto.take_card("bob", GREEN_DRAW_FOUR, 42),
+    proto.Op.END_GAME: proto.end_game("Аня"),
+    proto.Op.DRAW: proto.draw("Бот 1"),
+    proto.Op.PLAY: proto.play("bob", Card("yellow", "reverse")),
+}
+
+
+def _op(frame: bytes) -> proto.Op:
+    return proto.Op(proto.HEADER.unpack_from(frame)[2])
+
+
+def test_every_op_is_covered():
+    assert set(MESSAGES) == set(proto.Op)
+
+
+@pytest.mark.parametrize("op", list(proto.Op), ids=lambda op: op.name)
+def test_round_trip(op):
+    msg = MESSAGES[op]
+    frame = proto.encode_frame(msg)
+    assert _op(frame) == op
+    assert proto.FrameDecoder().feed(frame) == [msg]
+
+
+def test_take_card_hidden_card_and_no_deck_size():
+    msg = proto.view_for(proto.take_card("bob", RED_5), "Аня")
+    assert msg["card"] is None
+    assert proto.FrameDecoder().feed(proto.encode_frame(msg)) == [msg]
+
+
+def test_start_hand_shows_only_own_hand():
+    full = _start_game()
+    view = proto.view_for(full, "Аня")
+    assert list(view["players"]) == ["Аня"]
+    assert view["players"]["Аня"] == full["players"]["Аня"]
+    assert view["hand_counts"] == {nickname: 7 for nickname in full["queue_players"]}
+    assert view["deck_size"] == len(full["deck"])
+
+
+def test_decoder_accepts_byte_by_byte_stream():
+    stream = b"".join(proto.encode_frame(msg) for msg in MESSAGES.values())
+    decoder = proto.FrameDecoder()
+    received = []
+    for i in range(len(stream)):
+        received += decoder.feed(stream[i:i + 1])
+    assert received == list(MESSAGES.values())
+
+
+@pytest.mark.parametrize("split", [1, proto.HEADER.size - 1, proto.HEADER.size, proto.HEADER.size + 3])
+def test_decoder_keeps_partial_frame(split):
+    first, second = proto.encode_frame(MESSAGES[proto.Op.STEP]), proto.encode_frame(MESSAGES[proto.Op.END_GAME])
+    decoder = proto.FrameDecoder()
+    assert decoder.feed(first + second[:split]) == [MESSAGES[proto.Op.STEP]]
+    assert decoder.feed(second[split:]) == [MESSAGES[proto.Op.END_GAME]]
+
+
+def test_decode_reports_used_bytes():
+    frame = proto.encode_frame(MESSAGES[proto.Op.DRAW])
+    messages, used = proto.FrameDecoder().decode(memoryview(frame + frame[:3]))
+    assert messages == [MESSAGES[proto.Op.DRAW]]
+    assert used == len(frame)
+
+
+def test_decoder_rejects_bad_frames():
+    frame = bytearray(proto.encode_frame(MESSAGES[proto.Op.DRAW]))
+    frame[4] = proto.LEGACY_VERSION
+    with pytest.raises(proto.ProtocolError):
+        proto.FrameDecoder().feed(bytes(frame))
+    with pytest.raises(proto.ProtocolError):
+        proto.FrameDecoder().feed(proto.HEADER.pack(proto.MAX_FRAME + 1, proto.PROTOCOL_VERSION, proto.Op.STEP))
+    with pytest.raises(proto.ProtocolError):
+        proto.FrameDecoder().feed(proto.HEADER.pack(1, proto.PROTOCOL_VERSION, proto.Op.STEP) + b"\x05")
+
+
+def test_json_stream_split_inside_utf8():
+    messages = [proto.step("Аня", RED_5, "Бот 1"), proto.end_game("Бот 1")]
+    stream = b"".join(proto.dumps(msg) for msg in messages)
+    codec = proto.Codec(binary=False)
+    received = []
+    for i in range(0, len(stream), 3):
+        received += codec.feed(stream[i:i + 3])
+    assert received == messages
+
+
+def test_hello_and_welcome():
+    assert proto.parse_hello(proto.hello("Аня")) == ("Аня", proto.PROTOCOL_VERSION, None, None)
+    assert proto.parse_hello(proto.hello("Аня", "12345")) == ("Аня", proto.PROTOCOL_VERSION, "12345", None)
+    token = proto.new_token()
+    assert proto.parse_hello(proto.hello("Аня", "12345", token)) == ("Аня", proto.PROTOCOL_VERSION, "12345", token)
+    assert proto.parse_hello("Аня".encode()) == ("Аня", proto.LEGACY_VERSION, None, None)
+
+    step = proto.encode_frame(MESSAGES[proto.Op.STEP])
+    assert proto.parse_welcome(proto.welcome(proto.PROTOCOL_VERSION, token) + step) == \
+        (True, proto.PROTOCOL_VERSION, token, step)
+    assert proto.parse_welcome(proto.welcome(proto.LEGACY_VERSION)) == (True, proto.LEGACY_VERSION, "", b"")
+    assert proto.parse_welcome(proto.INVALID_NICKNAME)[0] is False
+
+
+
+@pytest.mark.parametrize("nickname", ["UNOfan", "UNO", "UNO\x02без разделителя", "UNOчка"])
+def test_legacy_nickname_starting_with_magic(nickname):
+    assert proto.parse_hello(nickname.encode("utf-8")) == (nickname, proto.LEGACY_VERSION, None, None)
+
+
+def test_hello_for_magic_nickname():
+    assert proto.parse_hello(proto.hello("UNOfan")) == ("UNOfan", proto.PROTOCOL_VERSION, None, None)
+
+
+def test_forged():
+    assert not proto.forged(proto.play("Аня", RED_5), "Аня")
+    assert proto.forged(proto.play("Аня", RED_5), "bob")
+    assert proto.forged({"command": "draw"}, "bob")
+    assert proto.forged(proto.end_game("Аня"), "bob")
+    assert not proto.forged(proto.end_game("bob"), "bob")
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import pytest
+
+from core import rules
+from core.card import Card
+from core.hand import Hand
+
+QUEUE = ["a", "b", "c", "d"]
+
+
+def test_check_play_accepts_matching_color_and_value():
+    hand = Hand([Card("red", "5"), Card("blue", "7")])
+    assert rules.check_play("a", Card("red", "5"), "a", Card("red", "9"), hand) is None
+    assert rules.check_play("a", Card("blue", "7"), "a", Card("green", "7"), hand) is None
+
+
+@pytest.mark.parametrize("player, card, top, reason", [
+    ("b", Card("red", "5"), Card("red", "9"), "ход"),
+    ("a", Card("green", "5"), Card("red", "9"), "нет карты"),
+    ("a", Card("blue", "7"), Card("red", "9"), "нельзя"),
+    ("a", Card("black", "wild"), Card("red", "9"), "цвет"),
+])
+def test_check_play_rejects(player, card, top, reason):
+    hand = Hand([Card("red", "5"), Card("blue", "7"), Card("black", "wild")])
+    assert reason in rules.check_play(player, card, "a", top, hand)
+
+
+def test_wild_colors():
+    hand = Hand([Card("black", "wild"), Card("black", "draw four")])
+    # чёрная карта в руке, на стол она ложится уже с выбранным цветом
+    assert rules.check_play("a", Card("black", "wild").with_color("green"), "a", Card("red", "9"), hand) is None
+    assert rules.check_play("a", Card("black", "draw four").with_color("blue"), "a", Card("red", "9"), hand) is None
+    assert rules.check_play("a", Card("green", "1"), "a", Card("black", "wild").with_color("green"),
+                            Hand([Card("green", "1")])) is None
+    assert rules.check_play("a", Card("red", "1"), "a", Card("black", "wild").with_color("green"),
+                            Hand([Card("red", "1")])) is not None
+
+
+def test_check_draw():
+    assert rules.check_draw("a", "a", 10) is None
+    assert rules.check_draw("b", "a", 10) is not None
+    assert rules.check_draw("a", "a", 0) is not None
+
+
+def test_plain_card_passes_turn():
+    turn = rules.resolve(QUEUE, "d", Card("red", "5"))
+    assert turn == rules.Turn(QUEUE, "a")
+
+
+def test_skip():
+    assert rules.resolve(QUEUE, "a", Card("red", "skip")).next_player == "c"
+    assert rules.resolve(QUEUE, "c", Card("red", "skip")).next_player == "a"
+    assert rules.resolve(["a", "b"], "a", Card("red", "skip")).next_player == "a"
+
+
+def test_reverse():
+    turn = rules.resolve(QUEUE, "b", Card("red", "reverse"))
+    assert turn.queue == ["d", "c", "b", "a"]
+    assert turn.next_player == "a"
+    # очередь вызывающего не меняется
+    assert QUEUE == ["a", "b", "c", "d"]
+
+
+def test_reverse_with_two_players_acts_as_skip():
+    turn = rules.resolve(["a", "b"], "a", Card("blue", "reverse"))
+    assert turn.queue == ["a", "b"]
+    assert turn.next_player == "a"
+
+
+@pytest.mark.parametrize("card, penalty", [
+    (Card("red", "draw two"), 2),
+    (Card("black", "draw four").with_color("yellow"), 4),
+])
+def test_draw_penalty(card, penalty):
+    turn = rules.resolve(QUEUE, "d", card)
+    assert (turn.victim, turn.penalty, turn.next_player) == ("a", penalty, "b")
+    two = rules.resolve(["a", "b"], "a", card)
+    assert (two.victim, two.penalty, two.next_player) == ("b", penalty, "a")
+
+
+def test_wild_passes_turn():
+    turn = rules.resolve(QUEUE, "a", Card("black", "wild").with_color("red"))
+    assert turn == rules.Turn(QUEUE, "b")
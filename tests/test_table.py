@@ -0,0 +1,91 @@
+from __future__ import annotations
+
+import pytest
+
+from core import protocol as proto
+from core.lobby import Table
+from core.peer import Peer
+
+
+def _peer(nickname: str) -> Peer:
+    return Peer(nickname, None, proto.Codec(binary=True))
+
+
+def _received(peer: Peer) -> list:
+    data = b""
+    while not peer.queue.empty():
+        data += peer.queue.get_nowait()
+    return proto.FrameDecoder().feed(data)
+
+
+@pytest.fixture
+def table() -> Table:
+    table = Table("12345", seats=2)
+    for nickname in ("Аня", "bob"):
+        assert table.join(_peer(nickname))
+    table.start()
+    for peer in table.clients.values():
+        _received(peer)
+    return table
+
+
+def _playable(table: Table, nickname: str):
+    hand = table.ctrl.hands[nickname]
+    cards = hand.playable(table.ctrl.top_card)
+    return cards[0] if cards else None
+
+
+def test_table_is_authoritative(table):
+    assert table.ctrl.authoritative
+    assert table.game_started
+
+
+@pytest.mark.parametrize("command", ["end_game", "step", "take_card", "start_game"])
+def test_raw_events_from_client_are_dropped(table, command):
+    current = table.ctrl.current
+    messages = {
+        "end_game": proto.end_game(current),
+        "step": proto.step(current, table.ctrl.top_card, current),
+        "take_card": proto.take_card(current, table.ctrl.top_card, 1),
+        "start_game": table.ctrl.state_message(),
+    }
+    deck_size, top = table.ctrl.deck_size, table.ctrl.top_card
+    table.handle(current, messages[command])
+    assert not table.finished
+    assert (table.ctrl.deck_size, table.ctrl.top_card, table.ctrl.current) == (deck_size, top, current)
+    assert all(_received(peer) == [] for peer in table.clients.values())
+
+
+def test_intent_for_other_player_is_dropped(table):
+    current = table.ctrl.current
+    other = next(nickname for nickname in table.clients if nickname != current)
+    deck_size = table.ctrl.deck_size
+    table.handle(other, proto.draw(current))
+    assert table.ctrl.deck_size == deck_size
+
+
+def test_draw_intent_deals_card(table):
+    current = table.ctrl.current
+    size = len(table.ctrl.hands[current])
+    table.handle(current, proto.draw(current))
+    assert len(table.ctrl.hands[current]) == size + 1
+    taken = _received(table.clients[current])
+    assert taken[-1]["command"] == "take_card" and taken[-1]["card"] is not None
+
+
+def test_play_out_of_turn_resyncs_sender(table):
+    current = table.ctrl.current
+    other = next(nickname for nickname in table.clients if nickname != current)
+    card = table.ctrl.hands[other][0]
+    table.handle(other, proto.play(other, card))
+    assert len(table.ctrl.hands[other]) == 7
+    reply = _received(table.clients[other])
+    assert [msg["command"] for msg in reply] == ["start_game"]
+    assert reply[0]["current_player"] == current
+
+
+def test_messages_before_start_are_dropped():
+    table = Table("12345", seats=2)
+    table.join(_peer("Аня"))
+    table.handle("Аня", proto.end_game("Аня"))
+    assert not table.finished and table.ctrl.winner_player is None